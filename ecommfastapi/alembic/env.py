@@ -7,9 +7,9 @@ from sqlalchemy.ext.asyncio import async_engine_from_config
 
 from alembic import context
 
-from decouple import config as env_config
 from app.db.base import Base  # Import your Base model here 
 from app.db import models  # Import all models to register them with Base
+from app.settings import get_settings
 
 # this is the Alembic Config object, which provides
 # access to the values within the .ini file in use.
@@ -20,15 +20,9 @@ config = context.config
 if config.config_file_name is not None:
     fileConfig(config.config_file_name)
 
-DB_USER = env_config("DB_USER")
-DB_PASSWORD = env_config("DB_PASSWORD")
-DB_NAME = env_config("DB_NAME")
-DB_HOST = env_config("DB_HOST")
-DB_PORT = env_config("DB_PORT", cast=int)
-
-DATABASE_URL = f"mysql+aiomysql://{DB_USER}:{DB_PASSWORD}@{DB_HOST}:{DB_PORT}/{DB_NAME}"
-
-config.set_main_option("sqlalchemy.url", DATABASE_URL)
+# The app's database: DATABASE_URL, or the DB_* parts when it is unset.
+# "%" is doubled because the ini config interpolates it (e.g. in passwords).
+config.set_main_option("sqlalchemy.url", get_settings().database_url.replace("%", "%%"))
 
 # add your model's MetaData object here
 # for 'autogenerate' support
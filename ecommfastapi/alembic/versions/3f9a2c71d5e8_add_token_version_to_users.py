@@ -0,0 +1,28 @@
+"""add token_version to users
+
+Revision ID: 3f9a2c71d5e8
+Revises: 1adb194e4c50
+Create Date: 2026-10-18 09:12:41.204513
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '3f9a2c71d5e8'
+down_revision: Union[str, Sequence[str], None] = '1adb194e4c50'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.add_column('users', sa.Column('token_version', sa.Integer(), server_default='0', nullable=False))
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_column('users', 'token_version')
@@ -0,0 +1,28 @@
+"""add products created_at id index
+
+Revision ID: 7c4e1b9a0d23
+Revises: 3f9a2c71d5e8
+Create Date: 2026-10-18 11:02:17.583104
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '7c4e1b9a0d23'
+down_revision: Union[str, Sequence[str], None] = '3f9a2c71d5e8'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_index('ix_products_created_at_id', 'products', ['created_at', 'id'], unique=False)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index('ix_products_created_at_id', table_name='products')
@@ -0,0 +1,58 @@
+"""index hot lookup columns
+
+Revision ID: a4d9e2f7b610
+Revises: e8b3c5a1f7d4
+Create Date: 2026-10-18 19:12:07.460915
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'a4d9e2f7b610'
+down_revision: Union[str, Sequence[str], None] = 'e8b3c5a1f7d4'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # MySQL added unnamed indexes for these foreign keys when the tables were created, and
+    # drops them once these take over. Other databases never index foreign keys by themselves.
+    op.create_index(op.f('ix_refresh_tokens_user_id'), 'refresh_tokens', ['user_id'], unique=False)
+    op.create_index('ix_product_category_category_id_product_id', 'product_category', ['category_id', 'product_id'], unique=False)
+
+    bind = op.get_bind()
+    too_long = bind.execute(sa.text("SELECT COUNT(*) FROM products WHERE CHAR_LENGTH(slug) > 255")).scalar()
+    duplicates = bind.execute(sa.text(
+        "SELECT COUNT(*) FROM (SELECT slug FROM products WHERE slug IS NOT NULL AND slug <> '' GROUP BY slug HAVING COUNT(*) > 1) d"
+    )).scalar()
+    if too_long or duplicates:
+        raise RuntimeError(
+            f"products.slug needs cleanup before it can be a unique VARCHAR(255): "
+            f"{too_long} slugs over 255 characters, {duplicates} slugs used more than once"
+        )
+    # An empty slug means "none"; as NULLs they don't collide under the unique index.
+    op.execute("UPDATE products SET slug = NULL WHERE slug = ''")
+    op.alter_column('products', 'slug', existing_type=sa.Text(), type_=sa.String(length=255), existing_nullable=True)
+    op.create_index(op.f('ix_products_slug'), 'products', ['slug'], unique=True)
+
+    # The primary keys already index these.
+    op.drop_index(op.f('ix_users_id'), table_name='users')
+    op.drop_index(op.f('ix_refresh_tokens_id'), table_name='refresh_tokens')
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.create_index(op.f('ix_refresh_tokens_id'), 'refresh_tokens', ['id'], unique=False)
+    op.create_index(op.f('ix_users_id'), 'users', ['id'], unique=False)
+    op.drop_index(op.f('ix_products_slug'), table_name='products')
+    op.alter_column('products', 'slug', existing_type=sa.String(length=255), type_=sa.Text(), existing_nullable=True)
+    # MySQL won't drop the only index behind a foreign key; put back the ones it had generated.
+    op.create_index('category_id', 'product_category', ['category_id'], unique=False)
+    op.drop_index('ix_product_category_category_id_product_id', table_name='product_category')
+    op.create_index('user_id', 'refresh_tokens', ['user_id'], unique=False)
+    op.drop_index(op.f('ix_refresh_tokens_user_id'), table_name='refresh_tokens')
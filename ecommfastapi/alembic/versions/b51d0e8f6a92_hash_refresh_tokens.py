@@ -0,0 +1,40 @@
+"""hash refresh tokens
+
+Revision ID: b51d0e8f6a92
+Revises: 7c4e1b9a0d23
+Create Date: 2026-10-18 13:40:55.318027
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'b51d0e8f6a92'
+down_revision: Union[str, Sequence[str], None] = '7c4e1b9a0d23'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.add_column('refresh_tokens', sa.Column('token_hash', sa.BINARY(length=32), nullable=True))
+    # Existing sessions keep working: hash the stored plaintext tokens in place.
+    op.execute("UPDATE refresh_tokens SET token_hash = UNHEX(SHA2(token, 256))")
+    op.alter_column('refresh_tokens', 'token_hash', existing_type=sa.BINARY(length=32), nullable=False)
+    op.create_index(op.f('ix_refresh_tokens_token_hash'), 'refresh_tokens', ['token_hash'], unique=True)
+    op.create_index(op.f('ix_refresh_tokens_expires_at'), 'refresh_tokens', ['expires_at'], unique=False)
+    op.drop_column('refresh_tokens', 'token')
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    # Plaintext tokens can't be recovered from their hashes; existing sessions are dropped.
+    op.execute("DELETE FROM refresh_tokens")
+    op.add_column('refresh_tokens', sa.Column('token', sa.String(length=512), nullable=False))
+    op.create_unique_constraint('token', 'refresh_tokens', ['token'])
+    op.drop_index(op.f('ix_refresh_tokens_expires_at'), table_name='refresh_tokens')
+    op.drop_index(op.f('ix_refresh_tokens_token_hash'), table_name='refresh_tokens')
+    op.drop_column('refresh_tokens', 'token_hash')
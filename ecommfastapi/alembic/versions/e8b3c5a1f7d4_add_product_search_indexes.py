@@ -0,0 +1,33 @@
+"""add product search indexes
+
+Revision ID: e8b3c5a1f7d4
+Revises: d2a7f4c9e1b3
+Create Date: 2026-10-18 17:40:52.118306
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'e8b3c5a1f7d4'
+down_revision: Union[str, Sequence[str], None] = 'd2a7f4c9e1b3'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_index('ix_products_updated_at', 'products', ['updated_at'], unique=False)
+    if op.get_bind().dialect.name == 'mysql':
+        # Builds online on InnoDB, but the first FULLTEXT index on a table rebuilds it to add FTS_DOC_ID.
+        op.create_index('ft_products_title_description', 'products', ['title', 'description'], unique=False, mysql_prefix='FULLTEXT')
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    if op.get_bind().dialect.name == 'mysql':
+        op.drop_index('ft_products_title_description', table_name='products')
+    op.drop_index('ix_products_updated_at', table_name='products')
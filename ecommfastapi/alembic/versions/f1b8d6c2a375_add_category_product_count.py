@@ -0,0 +1,35 @@
+"""add category product_count
+
+Revision ID: f1b8d6c2a375
+Revises: c7e5a3d1b984
+Create Date: 2026-10-18 22:05:19.237604
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'f1b8d6c2a375'
+down_revision: Union[str, Sequence[str], None] = 'c7e5a3d1b984'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.add_column('categories', sa.Column('product_count', sa.Integer(), server_default='0', nullable=False))
+    # One pass over the (category_id, product_id) index. On a large catalog, deploy the code
+    # first and run `python -m app.product.category_counts --rebuild` after this instead,
+    # which recounts in small transactions and also fixes links written in between.
+    op.execute(
+        "UPDATE categories SET product_count = "
+        "(SELECT COUNT(*) FROM product_category WHERE product_category.category_id = categories.id)"
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_column('categories', 'product_count')
@@ -0,0 +1,207 @@
+from collections import OrderedDict
+from typing import Awaitable, Callable, Optional
+from decouple import config
+from app.account.principal import Principal, forget_token_version
+import asyncio
+import os
+import time
+
+USER_CACHE_ENABLED = config("USER_CACHE_ENABLED", default=False, cast=bool)
+USER_CACHE_TTL_SECONDS = config("USER_CACHE_TTL_SECONDS", default=60, cast=float)
+USER_CACHE_MAX_SIZE = config("USER_CACHE_MAX_SIZE", default=10_000, cast=int)
+
+# "local" keeps invalidations inside this worker, "file" shares them between the
+# workers of one host through an append-only file.
+USER_CACHE_INVALIDATION_CHANNEL = config("USER_CACHE_INVALIDATION_CHANNEL", default="local")
+USER_CACHE_INVALIDATION_FILE = config("USER_CACHE_INVALIDATION_FILE", default="/tmp/ecommfastapi-user-invalidations.log")
+USER_CACHE_INVALIDATION_POLL_SECONDS = config("USER_CACHE_INVALIDATION_POLL_SECONDS", default=1.0, cast=float)
+USER_CACHE_INVALIDATION_FILE_MAX_BYTES = config("USER_CACHE_INVALIDATION_FILE_MAX_BYTES", default=1_048_576, cast=int)
+
+
+class LocalInvalidationChannel:
+    """In-memory channel: delivers invalidations to subscribers in this process only."""
+
+    def __init__(self):
+        self._subscribers: list[Callable[[int], None]] = []
+
+    def subscribe(self, callback: Callable[[int], None]):
+        self._subscribers.append(callback)
+
+    def publish(self, user_id: int):
+        for callback in self._subscribers:
+            callback(user_id)
+
+    def poll(self):
+        pass
+
+
+class FileInvalidationChannel(LocalInvalidationChannel):
+    """Stand-in for a pub/sub broker: workers append user ids to a shared file and tail it."""
+
+    def __init__(self, path: str, poll_seconds: float, max_bytes: int):
+        super().__init__()
+        self.path = path
+        self.poll_seconds = poll_seconds
+        self.max_bytes = max_bytes
+        self._offset = self._size()
+        self._next_poll = 0.0
+
+    def _size(self) -> int:
+        try:
+            return os.stat(self.path).st_size
+        except FileNotFoundError:
+            return 0
+
+    def publish(self, user_id: int):
+        super().publish(user_id)
+        if self._size() > self.max_bytes:
+            open(self.path, "w").close()
+        fd = os.open(self.path, os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o644)
+        try:
+            os.write(fd, f"{user_id}\n".encode())
+        finally:
+            os.close(fd)
+
+    def poll(self):
+        now = time.monotonic()
+        if now < self._next_poll:
+            return
+        self._next_poll = now + self.poll_seconds
+        size = self._size()
+        if size < self._offset:
+            # Truncated by a publisher; anything missed is bounded by the cache TTL.
+            self._offset = 0
+        if size == self._offset:
+            return
+        with open(self.path, "rb") as f:
+            f.seek(self._offset)
+            chunk = f.read(size - self._offset)
+        # Only consume complete lines; a partial trailing write is read next time.
+        consumed = chunk.rfind(b"\n") + 1
+        self._offset += consumed
+        for line in chunk[:consumed].splitlines():
+            if line.strip().isdigit():
+                LocalInvalidationChannel.publish(self, int(line))
+
+
+class UserCache:
+    """Bounded LRU of user snapshots with a TTL and coalesced concurrent misses."""
+
+    def __init__(self, max_size: int, ttl_seconds: float):
+        self.max_size = max_size
+        self.ttl_seconds = ttl_seconds
+        self._entries: OrderedDict[int, tuple[Principal, float]] = OrderedDict()
+        self._inflight: dict[int, asyncio.Future] = {}
+        self.hits = 0
+        self.misses = 0
+        self.coalesced = 0
+        self.evictions = 0
+        self.expirations = 0
+        self.invalidations = 0
+
+    async def get_or_load(self, user_id: int, loader: Callable[[], Awaitable[Optional[Principal]]]) -> Optional[Principal]:
+        entry = self._entries.get(user_id)
+        if entry:
+            principal, expires_at = entry
+            if expires_at > time.monotonic():
+                self._entries.move_to_end(user_id)
+                self.hits += 1
+                return principal
+            del self._entries[user_id]
+            self.expirations += 1
+
+        pending = self._inflight.get(user_id)
+        if pending:
+            self.coalesced += 1
+            try:
+                return await asyncio.shield(pending)
+            except asyncio.CancelledError:
+                if not pending.cancelled():
+                    raise
+                # The request that owned the load was cancelled; load on our own.
+                return await loader()
+
+        self.misses += 1
+        future = asyncio.get_running_loop().create_future()
+        self._inflight[user_id] = future
+        try:
+            principal = await loader()
+        except asyncio.CancelledError:
+            future.cancel()
+            raise
+        except Exception as exc:
+            future.set_exception(exc)
+            # Mark retrieved so an un-awaited failure doesn't log "exception never retrieved".
+            future.exception()
+            raise
+        else:
+            # An invalidation that raced with the load drops the in-flight entry;
+            # don't cache what may already be stale.
+            if principal is not None and self._inflight.get(user_id) is future:
+                self._store(user_id, principal)
+            future.set_result(principal)
+            return principal
+        finally:
+            if self._inflight.get(user_id) is future:
+                del self._inflight[user_id]
+
+    def _store(self, user_id: int, principal: Principal):
+        self._entries[user_id] = (principal, time.monotonic() + self.ttl_seconds)
+        self._entries.move_to_end(user_id)
+        while len(self._entries) > self.max_size:
+            self._entries.popitem(last=False)
+            self.evictions += 1
+
+    def invalidate(self, user_id: int):
+        self._inflight.pop(user_id, None)
+        if self._entries.pop(user_id, None):
+            self.invalidations += 1
+
+    def clear(self):
+        self._entries.clear()
+        self._inflight.clear()
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.misses + self.coalesced
+        return {
+            "enabled": USER_CACHE_ENABLED,
+            "size": len(self._entries),
+            "max_size": self.max_size,
+            "ttl_seconds": self.ttl_seconds,
+            "hits": self.hits,
+            "misses": self.misses,
+            "coalesced": self.coalesced,
+            "evictions": self.evictions,
+            "expirations": self.expirations,
+            "invalidations": self.invalidations,
+            "hit_ratio": round((self.hits + self.coalesced) / lookups, 4) if lookups else 0.0,
+        }
+
+
+def _build_channel() -> LocalInvalidationChannel:
+    if USER_CACHE_INVALIDATION_CHANNEL == "file":
+        return FileInvalidationChannel(
+            USER_CACHE_INVALIDATION_FILE,
+            USER_CACHE_INVALIDATION_POLL_SECONDS,
+            USER_CACHE_INVALIDATION_FILE_MAX_BYTES,
+        )
+    return LocalInvalidationChannel()
+
+
+def _on_user_invalidated(user_id: int):
+    user_cache.invalidate(user_id)
+    forget_token_version(user_id)
+
+
+user_cache = UserCache(USER_CACHE_MAX_SIZE, USER_CACHE_TTL_SECONDS)
+invalidation_channel = _build_channel()
+invalidation_channel.subscribe(_on_user_invalidated)
+
+
+def invalidate_user(user_id: int):
+    invalidation_channel.publish(user_id)
+
+
+async def get_cached_user(user_id: int, loader: Callable[[], Awaitable[Optional[Principal]]]) -> Optional[Principal]:
+    invalidation_channel.poll()
+    return await user_cache.get_or_load(user_id, loader)
@@ -1,10 +1,27 @@
 from fastapi import HTTPException, status, Request, Depends
 from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+from decouple import config
 from app.db.config import SessionDep
+from app.db.replicas import ReadSessionDep
 from app.account.models import User
+from app.account.principal import Principal, get_token_version
+from app.account.cache import USER_CACHE_ENABLED, get_cached_user, invalidation_channel
 from app.account.utils import decode_token
 
-async def get_current_user(session: SessionDep, request: Request):
+# Opt-in: trust the claims signed into the access token instead of loading the user row.
+JWT_STATELESS_AUTH = config("JWT_STATELESS_AUTH", default=False, cast=bool)
+
+async def _load_user(session: AsyncSession, user_id: int):
+    stmt = select(User).where(User.id == user_id)
+    result = await session.scalars(stmt)
+    return result.first()
+
+async def _load_principal(session: AsyncSession, user_id: int):
+    user = await _load_user(session, user_id)
+    return Principal.from_user(user) if user else None
+
+async def get_current_user(session: ReadSessionDep, request: Request):
     token = request.cookies.get("access_token")
     if not token:
         raise HTTPException(
@@ -17,27 +34,67 @@ async def get_current_user(session: SessionDep, request: Request):
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Invalid or expired token",
-            header={"WWW-Authenticate": "Bearer"}
+            headers={"WWW-Authenticate": "Bearer"}
         )
     user_id = payload.get("sub")
     if not user_id:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Invalid token",
-            header={"WWW-Authenticate": "Bearer"}
+            headers={"WWW-Authenticate": "Bearer"}
         )
-    stmt = select(User).where(User.id == int(user_id))
-    result = await session.scalars(stmt)
-    user = result.first()
+    if JWT_STATELESS_AUTH:
+        principal = Principal.from_claims(payload)
+        if principal:
+            invalidation_channel.poll()
+            current_version = await get_token_version(session, principal.id)
+            if current_version is None:
+                raise HTTPException(
+                    status_code=status.HTTP_401_UNAUTHORIZED,
+                    detail="User not found",
+                    headers={"WWW-Authenticate": "Bearer"}
+                )
+            _check_token_version(payload, current_version)
+            return principal
+    if USER_CACHE_ENABLED:
+        user = await get_cached_user(int(user_id), lambda: _load_principal(session, int(user_id)))
+    else:
+        user = await _load_user(session, int(user_id))
     if not user:
        raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="User not found",
-            header={"WWW-Authenticate": "Bearer"}
-        ) 
+            headers={"WWW-Authenticate": "Bearer"}
+        )
+    # Password changes, logout-all and admin flag changes bump token_version; the
+    # loaded row (or cached principal, dropped on every bump) carries the current one.
+    _check_token_version(payload, user.token_version or 0)
     return user
 
-async def require_admin(user: User = Depends(get_current_user)):
+def _check_token_version(payload: dict, current_version: int):
+    # Tokens minted before the "ver" claim existed can't be checked and expire on their own.
+    if "ver" in payload and int(payload["ver"]) != current_version:
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Token has been revoked",
+            headers={"WWW-Authenticate": "Bearer"}
+        )
+
+async def get_current_db_user(session: SessionDep, user: User | Principal = Depends(get_current_user)):
+    # For handlers that mutate the user row and need the ORM object from the primary
+    # session, not claims or a row read from a replica.
+    if isinstance(user, User) and user in session:
+        return user
+    db_user = await session.get(User, user.id)
+    if not db_user:
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="User not found",
+            headers={"WWW-Authenticate": "Bearer"}
+        )
+    return db_user
+
+async def require_admin(user: User | Principal = Depends(get_current_user)):
     if not user.is_admin:
         raise HTTPException(
             status_code=status.HTTP_403_FORBIDDEN,
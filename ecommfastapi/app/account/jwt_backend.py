@@ -0,0 +1,131 @@
+from collections import OrderedDict
+from functools import lru_cache
+from typing import Optional
+from decouple import config
+import hashlib
+import time
+
+# "jose" (python-jose, the default) or "pyjwt" (PyJWT, if installed).
+JWT_BACKEND = config("JWT_BACKEND", default="jose")
+# Verified claims kept per token until its exp; 0 disables the cache.
+JWT_DECODE_CACHE_SIZE = config("JWT_DECODE_CACHE_SIZE", default=10_000, cast=int)
+
+
+class ExpiredTokenError(Exception):
+    pass
+
+
+class InvalidTokenError(Exception):
+    pass
+
+
+class JoseBackend:
+    def __init__(self):
+        from jose import jwt, ExpiredSignatureError, JWTError
+        self._jwt = jwt
+        self._expired = ExpiredSignatureError
+        self._invalid = JWTError
+
+    def encode(self, claims: dict, key: str, algorithm: str) -> str:
+        return self._jwt.encode(claims, key, algorithm=algorithm)
+
+    def decode(self, token: str, key: str, algorithm: str) -> dict:
+        try:
+            return self._jwt.decode(token, key, algorithms=[algorithm])
+        except self._expired as e:
+            raise ExpiredTokenError(str(e))
+        except self._invalid as e:
+            raise InvalidTokenError(str(e))
+
+
+class PyJWTBackend:
+    def __init__(self):
+        import jwt
+        self._jwt = jwt
+
+    def encode(self, claims: dict, key: str, algorithm: str) -> str:
+        return self._jwt.encode(claims, key, algorithm=algorithm)
+
+    def decode(self, token: str, key: str, algorithm: str) -> dict:
+        try:
+            return self._jwt.decode(token, key, algorithms=[algorithm])
+        except self._jwt.ExpiredSignatureError as e:
+            raise ExpiredTokenError(str(e))
+        except self._jwt.InvalidTokenError as e:
+            raise InvalidTokenError(str(e))
+
+
+JWT_BACKENDS = {"jose": JoseBackend, "pyjwt": PyJWTBackend}
+
+
+class DecodedTokenCache:
+    """LRU of verified claims keyed by a digest of the token, each valid until the token's exp.
+
+    Only successfully verified tokens are cached, so garbage tokens can't crowd
+    out real ones. Entries are tied to the signing key and dropped when it changes.
+    """
+
+    def __init__(self, max_size: int):
+        self.max_size = max_size
+        self._entries: OrderedDict[bytes, tuple[dict, float]] = OrderedDict()
+        self._key_id: Optional[tuple[str, str]] = None
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def _digest(token: str) -> bytes:
+        return hashlib.blake2b(token.encode(), digest_size=16).digest()
+
+    def get(self, token: str, key: str, algorithm: str) -> Optional[dict]:
+        if self._key_id != (key, algorithm):
+            self._entries.clear()
+            self._key_id = (key, algorithm)
+        digest = self._digest(token)
+        entry = self._entries.get(digest)
+        if entry is None:
+            self.misses += 1
+            return None
+        claims, exp = entry
+        # Same rule as the JWT libraries: expired once now passes exp (no leeway).
+        if time.time() > exp:
+            del self._entries[digest]
+            self.misses += 1
+            return None
+        self._entries.move_to_end(digest)
+        self.hits += 1
+        return claims
+
+    def set(self, token: str, claims: dict):
+        exp = claims.get("exp")
+        if not isinstance(exp, (int, float)):
+            return
+        self._entries[self._digest(token)] = (claims, exp)
+        while len(self._entries) > self.max_size:
+            self._entries.popitem(last=False)
+
+    def clear(self):
+        self._entries.clear()
+
+    def stats(self) -> dict:
+        return {"size": len(self._entries), "max_size": self.max_size, "hits": self.hits, "misses": self.misses}
+
+
+@lru_cache(maxsize=None)
+def get_jwt_backend():
+    # The JWT libraries pull in cryptography; built on first use rather than at import.
+    return JWT_BACKENDS[JWT_BACKEND]()
+
+
+decoded_token_cache = DecodedTokenCache(JWT_DECODE_CACHE_SIZE)
+
+
+def decode_jwt(token: str, key: str, algorithm: str) -> dict:
+    # Callers share the cached claims dict; treat it as read-only.
+    if JWT_DECODE_CACHE_SIZE:
+        claims = decoded_token_cache.get(token, key, algorithm)
+        if claims is not None:
+            return claims
+    claims = get_jwt_backend().decode(token, key, algorithm)
+    if JWT_DECODE_CACHE_SIZE:
+        decoded_token_cache.set(token, claims)
+    return claims
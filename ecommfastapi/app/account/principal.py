@@ -0,0 +1,87 @@
+from dataclasses import dataclass
+from typing import Optional
+from decouple import config
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.account.models import User
+import time
+
+TOKEN_VERSION_CHECK_TTL_SECONDS = config("TOKEN_VERSION_CHECK_TTL_SECONDS", default=30, cast=int)
+TOKEN_VERSION_CACHE_MAX_SIZE = config("TOKEN_VERSION_CACHE_MAX_SIZE", default=100_000, cast=int)
+
+# user_id -> (token_version, expires_at on the monotonic clock)
+_token_versions: dict[int, tuple[int, float]] = {}
+
+
+@dataclass(frozen=True)
+class Principal:
+    """Read-only snapshot of a user, rebuilt from token claims or a cached row."""
+    id: int
+    email: str
+    is_active: bool
+    is_admin: bool
+    is_verified: bool
+    token_version: int
+
+    @classmethod
+    def from_user(cls, user: User) -> "Principal":
+        return cls(
+            id=user.id,
+            email=user.email,
+            is_active=user.is_active,
+            is_admin=user.is_admin,
+            is_verified=user.is_verified,
+            token_version=user.token_version or 0,
+        )
+
+    @classmethod
+    def from_claims(cls, payload: dict) -> Optional["Principal"]:
+        # Tokens minted before the claims were added fall back to the DB lookup.
+        if "ver" not in payload or "email" not in payload:
+            return None
+        return cls(
+            id=int(payload["sub"]),
+            email=payload["email"],
+            is_active=bool(payload.get("act", True)),
+            is_admin=bool(payload.get("adm", False)),
+            is_verified=bool(payload.get("vrf", False)),
+            token_version=int(payload["ver"]),
+        )
+
+
+def access_token_claims(user: User) -> dict:
+    return {
+        "sub": str(user.id),
+        "email": user.email,
+        "act": user.is_active,
+        "adm": user.is_admin,
+        "vrf": user.is_verified,
+        "ver": user.token_version or 0,
+    }
+
+
+def remember_token_version(user_id: int, version: int):
+    if len(_token_versions) >= TOKEN_VERSION_CACHE_MAX_SIZE:
+        now = time.monotonic()
+        for key in [key for key, (_, expires_at) in _token_versions.items() if expires_at <= now]:
+            del _token_versions[key]
+        if len(_token_versions) >= TOKEN_VERSION_CACHE_MAX_SIZE:
+            _token_versions.clear()
+    _token_versions[user_id] = (version, time.monotonic() + TOKEN_VERSION_CHECK_TTL_SECONDS)
+
+
+def forget_token_version(user_id: int):
+    _token_versions.pop(user_id, None)
+
+
+async def get_token_version(session: AsyncSession, user_id: int) -> Optional[int]:
+    cached = _token_versions.get(user_id)
+    if cached and cached[1] > time.monotonic():
+        return cached[0]
+    result = await session.execute(select(User.token_version).where(User.id == user_id))
+    version = result.scalar_one_or_none()
+    if version is None:
+        forget_token_version(user_id)
+        return None
+    remember_token_version(user_id, version)
+    return version
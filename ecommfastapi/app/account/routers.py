@@ -1,25 +1,35 @@
 from fastapi import APIRouter, HTTPException, status, Depends, Request
-from fastapi.responses import JSONResponse
-from app.account.schemas import UserCreate, UserOut, UserLogin, PasswordChangeRequest, PasswordResetEmailRequest, PasswordResetRequest
-from app.account.services import create_user, authenticate_user, email_verification_send, verify_email_token, change_password, password_reset_email_send, verify_password_reset_token
+from app.account.schemas import UserCreate, UserOut, UserLogin, PasswordChangeRequest, PasswordResetEmailRequest, PasswordResetRequest, UserAdminUpdate
+from app.account.services import create_user, authenticate_user, email_verification_send, verify_email_token, change_password, password_reset_email_send, verify_password_reset_token, update_user_flags, logout_all_sessions
 from app.db.config import SessionDep
-from app.account.utils import create_tokens, success_response, error_response, verify_refresh_token, revoke_refresh_token
+from app.account.utils import create_tokens, rotate_refresh_token, success_response, verify_refresh_token, revoke_refresh_token
 from app.account.models import User
-from app.account.dep import get_current_user, require_admin
+from app.account.dep import get_current_user, get_current_db_user, require_admin
+from app.account.cache import user_cache
+from app.account.tasks import refresh_token_purger, refresh_token_table_size
+from app.ratelimit import RateLimitedRoute, rate_limit
+from decouple import config
 
-router = APIRouter()
+# "<count>/<second|minute|hour|day>" token buckets, checked before any DB or hashing work.
+LOGIN_RATE_LIMIT_PER_IP = config("LOGIN_RATE_LIMIT_PER_IP", default="20/minute")
+LOGIN_RATE_LIMIT_PER_EMAIL = config("LOGIN_RATE_LIMIT_PER_EMAIL", default="5/minute")
+REGISTER_RATE_LIMIT_PER_IP = config("REGISTER_RATE_LIMIT_PER_IP", default="10/minute")
+PASSWORD_RESET_RATE_LIMIT_PER_IP = config("PASSWORD_RESET_RATE_LIMIT_PER_IP", default="10/minute")
+PASSWORD_RESET_RATE_LIMIT_PER_EMAIL = config("PASSWORD_RESET_RATE_LIMIT_PER_EMAIL", default="3/hour")
 
-@router.post("/register")
+router = APIRouter(route_class=RateLimitedRoute)
+
+@router.post("/register", dependencies=[rate_limit("register", per_ip=REGISTER_RATE_LIMIT_PER_IP)])
 async def register(session: SessionDep, user: UserCreate):
     new_user = await create_user(session, user)
     user_out = UserOut.model_validate(new_user)
     return success_response(
         message="User registered successfully",
-        data=user_out.model_dump(),
+        data=user_out,
         status_code=201
     )
     
-@router.post("/login")
+@router.post("/login", dependencies=[rate_limit("login", per_ip=LOGIN_RATE_LIMIT_PER_IP, per_email=LOGIN_RATE_LIMIT_PER_EMAIL)])
 async def login(session: SessionDep, user: UserLogin):
     authenticated_user = await authenticate_user(session, user)
     if not authenticated_user:
@@ -34,7 +44,7 @@ async def login(session: SessionDep, user: UserLogin):
         message="Login successful",
         data={
             "tokens": tokens,
-            "user": user_out.model_dump()  
+            "user": user_out
         },
         status_code=200
     )
@@ -48,7 +58,7 @@ async def me(user: User = Depends(get_current_user)):
     response = success_response(
         message="Successful get user",
         data={
-            "user": user_out.model_dump()  
+            "user": user_out
         },
         status_code=200
     )
@@ -64,7 +74,9 @@ async def refresh_token(session: SessionDep, request: Request):
     if not user:
         raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Invalid or expired refresh token")
     
-    tokens = await create_tokens(session, user)
+    tokens = await rotate_refresh_token(session, token, user)
+    if not tokens:
+        raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Invalid or expired refresh token")
     response = success_response(
         message="Token refreshed successfully",
         data=None,
@@ -75,19 +87,19 @@ async def refresh_token(session: SessionDep, request: Request):
     return response
 
 @router.post("/send-verification-email")
-async def send_verification_email(user: User = Depends(get_current_user)):
-    return await email_verification_send(user)
+async def send_verification_email(session: SessionDep, user: User = Depends(get_current_user)):
+    return await email_verification_send(session, user)
 
 @router.get("/verify-email")
 async def verify_email(session: SessionDep, token: str):
         return await verify_email_token(session, token)
 
 @router.post("/change-password")
-async def password_change(session: SessionDep, data: PasswordChangeRequest, user: User = Depends(get_current_user)):
+async def password_change(session: SessionDep, data: PasswordChangeRequest, user: User = Depends(get_current_db_user)):
     await change_password(session, user, data)
     return {"msg": "Password changed successfully"}
 
-@router.post("/send-password-reset-email")
+@router.post("/send-password-reset-email", dependencies=[rate_limit("password-reset", per_ip=PASSWORD_RESET_RATE_LIMIT_PER_IP, per_email=PASSWORD_RESET_RATE_LIMIT_PER_EMAIL)])
 async def send_password_reset_email(session: SessionDep, data: PasswordResetEmailRequest):
     return await password_reset_email_send(session, data)
 
@@ -99,6 +111,35 @@ async def verify_password_reset_email(session: SessionDep, data: PasswordResetRe
 async def admin(user: User = Depends(require_admin)):
     return {"msg": f"Welcome Admin {user.email}"}
 
+@router.patch("/admin/users/{user_id}")
+async def admin_update_user(session: SessionDep, user_id: int, data: UserAdminUpdate, admin_user: User = Depends(require_admin)):
+    updated_user = await update_user_flags(session, user_id, data)
+    user_out = UserOut.model_validate(updated_user)
+    return success_response(
+        message="User updated successfully",
+        data=user_out,
+        status_code=200
+    )
+
+@router.get("/admin/user-cache/stats")
+async def admin_user_cache_stats(admin_user: User = Depends(require_admin)):
+    return success_response(
+        message="User cache stats",
+        data=user_cache.stats(),
+        status_code=200
+    )
+
+@router.get("/admin/refresh-tokens/stats")
+async def admin_refresh_token_stats(session: SessionDep, admin_user: User = Depends(require_admin)):
+    return success_response(
+        message="Refresh token stats",
+        data={
+            "table_rows": await refresh_token_table_size(session),
+            "purge": refresh_token_purger.stats(),
+        },
+        status_code=200
+    )
+
 @router.post("/logout")
 async def logout(session: SessionDep, request: Request, user: User = Depends(get_current_user)):
     refresh_token = request.cookies.get("refresh_token")
@@ -113,6 +154,15 @@ async def logout(session: SessionDep, request: Request, user: User = Depends(get
     response.delete_cookie("refresh_token")
     response.delete_cookie("access_token")
     return response
-    
 
-    
\ No newline at end of file
+@router.post("/logout-all")
+async def logout_all(session: SessionDep, user: User = Depends(get_current_user)):
+    revoked = await logout_all_sessions(session, user.id)
+    response = success_response(
+        message="Logged out of all sessions",
+        data={"revoked_sessions": revoked},
+        status_code=200
+    )
+    response.delete_cookie("refresh_token")
+    response.delete_cookie("access_token")
+    return response
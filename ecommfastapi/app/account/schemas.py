@@ -1,4 +1,5 @@
 from pydantic import BaseModel, EmailStr, Field, field_validator
+from typing import Optional
 class UserBase(BaseModel):
     email: EmailStr
     is_active: bool = True
@@ -12,6 +13,10 @@ class UserOut(UserBase):
     id: int
     model_config = {"from_attributes": True}
 
+class UserAdminUpdate(BaseModel):
+    is_active: Optional[bool] = None
+    is_admin: Optional[bool] = None
+
 class UserLogin(BaseModel):
     email: EmailStr
     password: str
@@ -1,9 +1,16 @@
 from app.account.models import User
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy import select
+from sqlalchemy import select, update
 from fastapi import HTTPException, status
-from app.account.schemas import UserCreate, UserLogin, PasswordChangeRequest, PasswordResetEmailRequest, PasswordResetRequest
-from app.account.utils import hash_password, verify_password, create_email_verification_token, verify_email_token_and_get_user_id, get_user_by_email, create_password_reset_token
+from app.account.schemas import UserCreate, UserLogin, PasswordChangeRequest, PasswordResetEmailRequest, PasswordResetRequest, UserAdminUpdate
+from app.account.utils import hash_password_async, verify_password_async, verify_and_update_password, create_email_verification_token, verify_email_token_and_get_user_id, get_user_by_email, create_password_reset_token, revoke_all_refresh_tokens
+from app.account.principal import remember_token_version
+from app.account.cache import invalidate_user
+from app.mail.outbox import enqueue_email, outbox_worker
+
+def bump_token_version(user: User):
+    # Invalidates every access token issued to the user before this change.
+    user.token_version = (user.token_version or 0) + 1
 
 async def create_user(session: AsyncSession, user: UserCreate):
     stmt = select(User).where(User.email == user.email)
@@ -13,7 +20,7 @@ async def create_user(session: AsyncSession, user: UserCreate):
     
     new_user = User(
         email = user.email,
-        hashed_password = hash_password(user.password)
+        hashed_password = await hash_password_async(user.password)
     )
     session.add(new_user)
     await session.commit()
@@ -24,14 +31,23 @@ async def authenticate_user(session: AsyncSession, user_login: UserLogin):
     stmt = select(User).where(User.email == user_login.email)
     result = await session.scalars(stmt)
     user = result.first()
-    if not user or not verify_password(user_login.password, user.hashed_password):
+    if not user:
+        return None
+    verified, new_hash = await verify_and_update_password(user_login.password, user.hashed_password)
+    if not verified:
         return None
+    if new_hash:
+        user.hashed_password = new_hash
+        session.add(user)
+        await session.commit()
     return user
 
-async def email_verification_send(user: User):
+async def email_verification_send(session: AsyncSession, user: User):
     token = create_email_verification_token(user.id)
     link = f"http://localhost:8000/account/verify?token={token}"
-    print("ABCD:", link)
+    enqueue_email(session, user.email, "Verify your email", f"Verify your email address: {link}")
+    await session.commit()
+    outbox_worker.notify()
     return {"msg": "Verification email sent"}
 
 async def verify_email_token(session:AsyncSession, token: str):
@@ -47,16 +63,23 @@ async def verify_email_token(session:AsyncSession, token: str):
         raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Email already verified")
     
     user.is_verified = True
+    # Stateless access tokens carry is_verified as a claim; make them re-login for the new one.
+    bump_token_version(user)
     session.add(user)
     await session.commit()
+    invalidate_user(user.id)
+    remember_token_version(user.id, user.token_version)
     return {"msg": "Email verified successfully"}
 
 async def change_password(session: AsyncSession, user: User, data: PasswordChangeRequest):
-    if not verify_password(data.old_password, user.hashed_password):
+    if not await verify_password_async(data.old_password, user.hashed_password):
         raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Old password is incorrect")
-    user.hashed_password = hash_password(data.new_password)
+    user.hashed_password = await hash_password_async(data.new_password)
+    bump_token_version(user)
     session.add(user)
     await session.commit()
+    invalidate_user(user.id)
+    remember_token_version(user.id, user.token_version)
 
 async def password_reset_email_send(session: AsyncSession, data: PasswordResetEmailRequest):
     user = await get_user_by_email(session, data.email)
@@ -64,7 +87,9 @@ async def password_reset_email_send(session: AsyncSession, data: PasswordResetEm
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="User not found")
     token = create_password_reset_token(user.id)
     link = f"http://localhost:8000/account/password-reset?token={token}"
-    print("Reset your password:", link)
+    enqueue_email(session, user.email, "Reset your password", f"Reset your password: {link}")
+    await session.commit()
+    outbox_worker.notify()
     return {"msg": "Password reset link sent"}
 
 async def verify_password_reset_token(session:AsyncSession, data: PasswordResetRequest):
@@ -77,7 +102,38 @@ async def verify_password_reset_token(session:AsyncSession, data: PasswordResetR
     if not user:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="User not found")
         
-    user.hashed_password = hash_password(data.new_password)
+    user.hashed_password = await hash_password_async(data.new_password)
+    bump_token_version(user)
     session.add(user)
     await session.commit()
-    return {"msg": "Password reset successfully"}
\ No newline at end of file
+    invalidate_user(user.id)
+    remember_token_version(user.id, user.token_version)
+    return {"msg": "Password reset successfully"}
+
+async def update_user_flags(session: AsyncSession, user_id: int, data: UserAdminUpdate):
+    user = await session.get(User, user_id)
+    if not user:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="User not found")
+    changes = data.model_dump(exclude_none=True)
+    for field, value in changes.items():
+        setattr(user, field, value)
+    if changes:
+        bump_token_version(user)
+        session.add(user)
+        await session.commit()
+        invalidate_user(user.id)
+        remember_token_version(user.id, user.token_version)
+    return user
+
+
+async def logout_all_sessions(session: AsyncSession, user_id: int):
+    # One UPDATE revokes every refresh token; bumping token_version in the same
+    # transaction makes get_current_user reject every access token issued before,
+    # in all auth modes. With USER_CACHE_ENABLED or JWT_STATELESS_AUTH, other workers
+    # see the bump when the invalidation reaches them, or at worst when their cached
+    # entry expires (USER_CACHE_TTL_SECONDS, TOKEN_VERSION_CHECK_TTL_SECONDS).
+    revoked = await revoke_all_refresh_tokens(session, user_id)
+    await session.execute(update(User).where(User.id == user_id).values(token_version=User.token_version + 1))
+    await session.commit()
+    invalidate_user(user_id)
+    return revoked
@@ -0,0 +1,118 @@
+from datetime import datetime, timedelta, timezone
+from typing import Optional
+from decouple import config
+from sqlalchemy import select, delete, func, text
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker
+from app.account.models import RefreshToken
+from app.db.config import async_session
+import asyncio
+import logging
+import random
+import time
+
+logger = logging.getLogger(__name__)
+
+# 0 disables the background purge (e.g. when it runs as a cron job instead).
+REFRESH_TOKEN_PURGE_INTERVAL_SECONDS = config("REFRESH_TOKEN_PURGE_INTERVAL_SECONDS", default=3600, cast=int)
+REFRESH_TOKEN_PURGE_BATCH_SIZE = config("REFRESH_TOKEN_PURGE_BATCH_SIZE", default=1000, cast=int)
+REFRESH_TOKEN_PURGE_PAUSE_SECONDS = config("REFRESH_TOKEN_PURGE_PAUSE_SECONDS", default=0.1, cast=float)
+# Revoked tokens are expired on revoke; keep them this long before deleting.
+REFRESH_TOKEN_PURGE_GRACE_HOURS = config("REFRESH_TOKEN_PURGE_GRACE_HOURS", default=24, cast=int)
+
+
+class RefreshTokenPurger:
+    """Deletes expired and revoked refresh tokens in small batches, each in its own short transaction."""
+
+    def __init__(self, sessionmaker: async_sessionmaker, batch_size: int, pause_seconds: float, grace: timedelta):
+        self.sessionmaker = sessionmaker
+        self.batch_size = batch_size
+        self.pause_seconds = pause_seconds
+        self.grace = grace
+        self._task: Optional[asyncio.Task] = None
+        self.runs = 0
+        self.batches = 0
+        self.rows_deleted = 0
+        self.last_run_at: Optional[datetime] = None
+        self.last_run_rows = 0
+        self.last_run_seconds = 0.0
+
+    async def purge_once(self) -> int:
+        started = time.perf_counter()
+        cutoff = datetime.now(timezone.utc) - self.grace
+        deleted = 0
+        while True:
+            async with self.sessionmaker() as session:
+                # Select a bounded set of ids through the expires_at index, then delete
+                # by primary key, so no statement holds locks on more than a batch.
+                ids = (await session.scalars(
+                    select(RefreshToken.id).where(RefreshToken.expires_at < cutoff).limit(self.batch_size)
+                )).all()
+                if not ids:
+                    break
+                await session.execute(delete(RefreshToken).where(RefreshToken.id.in_(ids)))
+                await session.commit()
+            deleted += len(ids)
+            self.batches += 1
+            self.rows_deleted += len(ids)
+            if len(ids) < self.batch_size:
+                break
+            await asyncio.sleep(self.pause_seconds)
+        self.runs += 1
+        self.last_run_at = datetime.now(timezone.utc)
+        self.last_run_rows = deleted
+        self.last_run_seconds = time.perf_counter() - started
+        return deleted
+
+    async def _run_forever(self, interval: int):
+        # Jitter keeps several workers from purging in lockstep.
+        await asyncio.sleep(random.uniform(0, min(interval, 60)))
+        while True:
+            try:
+                deleted = await self.purge_once()
+                logger.info("Purged %d refresh tokens in %.2fs", deleted, self.last_run_seconds)
+            except Exception:
+                logger.exception("Refresh token purge failed")
+            await asyncio.sleep(interval)
+
+    def start(self, interval: int = REFRESH_TOKEN_PURGE_INTERVAL_SECONDS):
+        if interval > 0 and self._task is None:
+            self._task = asyncio.create_task(self._run_forever(interval))
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    def stats(self) -> dict:
+        return {
+            "runs": self.runs,
+            "batches": self.batches,
+            "rows_deleted": self.rows_deleted,
+            "last_run_at": self.last_run_at,
+            "last_run_rows": self.last_run_rows,
+            "last_run_seconds": round(self.last_run_seconds, 3),
+            "last_run_rows_per_second": round(self.last_run_rows / self.last_run_seconds, 1) if self.last_run_seconds else 0.0,
+        }
+
+
+async def refresh_token_table_size(session: AsyncSession) -> int:
+    # COUNT(*) scans the whole table on InnoDB; information_schema has a cheap estimate.
+    if session.bind.dialect.name == "mysql":
+        result = await session.execute(text(
+            "SELECT TABLE_ROWS FROM information_schema.TABLES "
+            "WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = 'refresh_tokens'"
+        ))
+        return result.scalar_one_or_none() or 0
+    return (await session.execute(select(func.count()).select_from(RefreshToken))).scalar_one()
+
+
+refresh_token_purger = RefreshTokenPurger(
+    async_session,
+    REFRESH_TOKEN_PURGE_BATCH_SIZE,
+    REFRESH_TOKEN_PURGE_PAUSE_SECONDS,
+    timedelta(hours=REFRESH_TOKEN_PURGE_GRACE_HOURS),
+)
@@ -1,30 +1,72 @@
-from passlib.context import CryptContext
 from datetime import datetime, timedelta, timezone
-from decouple import config
-from jose import jwt, ExpiredSignatureError, JWTError
+from functools import lru_cache
+from app.account.jwt_backend import get_jwt_backend, decode_jwt, ExpiredTokenError, InvalidTokenError
+from app.settings import get_settings
 from sqlalchemy.ext.asyncio import AsyncSession
 import uuid
+import hashlib
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
 from app.account.models import User, RefreshToken
+from app.account.principal import access_token_claims
 from typing import Optional, Any
-from fastapi.responses import JSONResponse
-from fastapi import HTTPException
-from sqlalchemy import select
-
-JWT_SECRET_KEY = config("JWT_SECRET_KEY")
-JWT_ALGORITHM = config("JWT_ALGORITHM")
-JWT_ACCESS_TOKEN_EXPIRE_MINUTES = config("JWT_ACCESS_TOKEN_EXPIRE_MINUTES", default=30, cast=int)
-JWT_REFRESH_TOKEN_EXPIRE_DAYS = config("JWT_REFRESH_TOKEN_EXPIRE_DAYS", default=7, cast=int)
+from app.responses import FastJSONResponse
+from fastapi import HTTPException, status
+from sqlalchemy import select, update
+
+@lru_cache(maxsize=None)
+def get_pwd_context():
+    # passlib loads its hash backends on import; deferred until a password is first hashed.
+    from passlib.context import CryptContext
+    settings = get_settings()
+    return CryptContext(
+        schemes=["argon2", "bcrypt"],
+        deprecated="auto",
+        argon2__time_cost=settings.argon2_time_cost,
+        argon2__memory_cost=settings.argon2_memory_cost,
+        argon2__parallelism=settings.argon2_parallelism,
+    )
 
-EMAIL_VERIFICATION_TOKEN_TIME_HOUR = config("EMAIL_VERIFICATION_TOKEN_TIME_HOUR", default=1, cast=int)
-PASSWORD_RESET_TOKEN_TIME_HOUR = config("PASSWORD_RESET_TOKEN_TIME_HOUR", default=2, cast=int)
+@lru_cache(maxsize=None)
+def get_password_hash_executor() -> ThreadPoolExecutor:
+    return ThreadPoolExecutor(max_workers=get_settings().password_hash_workers, thread_name_prefix="password-hash")
 
-pwd_context = CryptContext(schemes=["argon2", "bcrypt"], deprecated="auto")
+_password_hash_inflight = 0
 
 def hash_password(password: str):
-    return pwd_context.hash(password)
+    return get_pwd_context().hash(password)
 
 def verify_password(plain_password: str, hashed_password: str):
-    return pwd_context.verify(plain_password, hashed_password)
+    return get_pwd_context().verify(plain_password, hashed_password)
+
+async def _run_password_hash(func, *args):
+    global _password_hash_inflight
+    settings = get_settings()
+    if _password_hash_inflight >= settings.password_hash_workers + settings.password_hash_max_queue:
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="Server is busy, please retry shortly",
+            headers={"Retry-After": "1"}
+        )
+    _password_hash_inflight += 1
+    try:
+        return await asyncio.get_running_loop().run_in_executor(get_password_hash_executor(), func, *args)
+    finally:
+        _password_hash_inflight -= 1
+
+async def hash_password_async(password: str):
+    return await _run_password_hash(get_pwd_context().hash, password)
+
+async def verify_password_async(plain_password: str, hashed_password: str):
+    return await _run_password_hash(get_pwd_context().verify, plain_password, hashed_password)
+
+async def verify_and_update_password(plain_password: str, hashed_password: str):
+    # Returns (verified, new_hash); new_hash is set when the stored hash uses outdated parameters.
+    return await _run_password_hash(get_pwd_context().verify_and_update, plain_password, hashed_password)
+
+def _encode_jwt(claims: dict) -> str:
+    settings = get_settings()
+    return get_jwt_backend().encode(claims, settings.jwt_secret_key, settings.jwt_algorithm)
 
 def create_access_token(data: dict, expires_delta: timedelta | None = None):
     
@@ -32,25 +74,53 @@ def create_access_token(data: dict, expires_delta: timedelta | None = None):
     if expires_delta:
         expires_delta = datetime.now(timezone.utc) + expires_delta
     else:
-        expires_delta = datetime.now(timezone.utc) + timedelta(minutes=JWT_ACCESS_TOKEN_EXPIRE_MINUTES)
+        expires_delta = datetime.now(timezone.utc) + timedelta(minutes=get_settings().jwt_access_token_expire_minutes)
     to_encode.update({"exp": expires_delta})
-    encoded_jwt = jwt.encode(to_encode, JWT_SECRET_KEY, algorithm=JWT_ALGORITHM)
+    encoded_jwt = _encode_jwt(to_encode)
     return encoded_jwt
 
-async def create_tokens(session: AsyncSession, user: User):
-    access_token = create_access_token(data={"sub": str(user.id)})
-    
+def hash_refresh_token(token: str) -> bytes:
+    return hashlib.sha256(token.encode()).digest()
+
+def _issue_tokens(session: AsyncSession, user: User):
+    access_token = create_access_token(data=access_token_claims(user))
+
     refresh_token_str = str(uuid.uuid4())
-    expires_at = datetime.now(timezone.utc) + timedelta(days=JWT_REFRESH_TOKEN_EXPIRE_DAYS)
+    expires_at = datetime.now(timezone.utc) + timedelta(days=get_settings().jwt_refresh_token_expire_days)
     refresh_token = RefreshToken(
         user_id=user.id,
-        token=refresh_token_str,
+        token_hash=hash_refresh_token(refresh_token_str),
         expires_at=expires_at
     )
     session.add(refresh_token)
-    await session.commit()
     return {"access_token": access_token, "refresh_token": refresh_token_str, "token_type": "bearer"}
 
+async def create_tokens(session: AsyncSession, user: User):
+    tokens = _issue_tokens(session, user)
+    await session.commit()
+    return tokens
+
+async def rotate_refresh_token(session: AsyncSession, token: str, user: User):
+    # Revoking the presented token and issuing its successor commit together. The
+    # conditional UPDATE lets exactly one of several concurrent refreshes with the
+    # same token win; the rest get None.
+    now = datetime.now(timezone.utc)
+    result = await session.execute(
+        update(RefreshToken)
+        .where(
+            RefreshToken.token_hash == hash_refresh_token(token),
+            RefreshToken.revoked == False,
+            RefreshToken.expires_at > now,
+        )
+        .values(revoked=True, expires_at=now)
+    )
+    if result.rowcount != 1:
+        await session.rollback()
+        return None
+    tokens = _issue_tokens(session, user)
+    await session.commit()
+    return tokens
+
 def success_response(message: str, data: Optional[Any] = None, status_code: int = 200):
     response = {
         "success": True,
@@ -60,7 +130,7 @@ def success_response(message: str, data: Optional[Any] = None, status_code: int
     if data is not None:
         response["data"] = data
 
-    return JSONResponse(
+    return FastJSONResponse(
         content=response,
         status_code=status_code
     )
@@ -75,39 +145,38 @@ def error_response(message: str, status_code: int = 400, errors: Optional[Any] =
     if errors is not None:
         response["errors"] = errors
 
-    return JSONResponse(
+    return FastJSONResponse(
         content=response,
         status_code=status_code
     )
 
 def decode_token(token: str):
+    settings = get_settings()
     try:
-        return jwt.decode(token, JWT_SECRET_KEY, algorithms=JWT_ALGORITHM)
-    except ExpiredSignatureError:
+        return decode_jwt(token, settings.jwt_secret_key, settings.jwt_algorithm)
+    except ExpiredTokenError:
         raise HTTPException(status_code=401, detail="Token has expired")
-    except JWTError:
+    except InvalidTokenError:
         raise HTTPException(status_code=401, detail="Invalid token")
     
 async def verify_refresh_token(session: AsyncSession, token: str):
-    stmt = select(RefreshToken).where(RefreshToken.token == token)
+    # Token validity and the owning user come back in one round-trip.
+    stmt = (
+        select(User)
+        .join(RefreshToken, RefreshToken.user_id == User.id)
+        .where(
+            RefreshToken.token_hash == hash_refresh_token(token),
+            RefreshToken.revoked == False,
+            RefreshToken.expires_at > datetime.now(timezone.utc),
+        )
+    )
     result = await session.scalars(stmt)
-    db_refresh_token = result.first()
-
-    if db_refresh_token and not db_refresh_token.revoked:
-        expires_at = db_refresh_token.expires_at
-        if expires_at.tzinfo is None:
-            expires_at = expires_at.replace(tzinfo=timezone.utc)
-        if expires_at > datetime.now(timezone.utc):
-            user_stmt = select(User).where(User.id == db_refresh_token.user_id)
-            user_result = await session.scalars(user_stmt)
-            return user_result.first()
-        
-    return None
+    return result.first()
 
 def create_email_verification_token(user_id: int):
-    expire = datetime.now(timezone.utc) + timedelta(hours=EMAIL_VERIFICATION_TOKEN_TIME_HOUR)
+    expire = datetime.now(timezone.utc) + timedelta(hours=get_settings().email_verification_token_time_hour)
     to_encode = {"sub": str(user_id), "type": "verify_email", "exp": expire}
-    return jwt.encode(to_encode, JWT_SECRET_KEY, algorithm=JWT_ALGORITHM)
+    return _encode_jwt(to_encode)
 
 def verify_email_token_and_get_user_id(token: str, token_type: str):
     payload = decode_token(token)
@@ -121,15 +190,23 @@ async def get_user_by_email(session: AsyncSession, email: str):
     return result.first() 
 
 def create_password_reset_token(user_id: int):
-    expire = datetime.now(timezone.utc) + timedelta(hours=PASSWORD_RESET_TOKEN_TIME_HOUR)
+    expire = datetime.now(timezone.utc) + timedelta(hours=get_settings().password_reset_token_time_hour)
     to_encode = {"sub": str(user_id), "type": "password_reset", "exp": expire}
-    return jwt.encode(to_encode, JWT_SECRET_KEY, algorithm=JWT_ALGORITHM)
+    return _encode_jwt(to_encode)
 
 async def revoke_refresh_token(session: AsyncSession, token: str):
-    stmt = select(RefreshToken).where(RefreshToken.token == token)
-    result = await session.scalars(stmt)
-    db_refresh_token = result.first()
+    # Expiring on revoke lets the purge job find revoked rows through the expires_at index.
+    await session.execute(
+        update(RefreshToken)
+        .where(RefreshToken.token_hash == hash_refresh_token(token), RefreshToken.revoked == False)
+        .values(revoked=True, expires_at=datetime.now(timezone.utc))
+    )
+    await session.commit()
 
-    if db_refresh_token.token:
-        db_refresh_token.revoked = True
-        await session.commit()
+async def revoke_all_refresh_tokens(session: AsyncSession, user_id: int):
+    result = await session.execute(
+        update(RefreshToken)
+        .where(RefreshToken.user_id == user_id, RefreshToken.revoked == False)
+        .values(revoked=True, expires_at=datetime.now(timezone.utc))
+    )
+    return result.rowcount
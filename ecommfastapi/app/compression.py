@@ -0,0 +1,378 @@
+"""Response compression: gzip, brotli or zstd, negotiated from Accept-Encoding.
+
+brotli and zstd are used when their packages (`brotli`, `zstandard`) are installed;
+gzip always is. Bodies under COMPRESSION_MIN_SIZE go out as they are, and bodies
+from COMPRESSION_THREAD_MIN_SIZE up are compressed on a small thread pool so the
+event loop keeps serving. Streaming responses are compressed chunk by chunk, each
+chunk flushed so clients still see it when it is sent.
+
+A compressed response gets the encoding appended to its strong ETag ("abc" ->
+"abc-br"), as the compressed bytes are a different representation. Incoming
+If-None-Match tags are mapped back, so routes keep comparing their own ETags and
+answering 304. Compressed bodies of ETagged responses are kept in a small LRU:
+an already cached response (the category list) is compressed once per version
+and encoding, not once per request.
+"""
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache
+from typing import Callable, Optional
+from decouple import config, Csv
+from starlette.datastructures import MutableHeaders
+from app.instrumentation import _escape, route_template
+import asyncio
+import os
+import time
+import zlib
+
+try:
+    import brotli
+except ImportError:  # optional backend
+    brotli = None
+
+try:
+    import zstandard
+except ImportError:  # optional backend
+    zstandard = None
+
+COMPRESSION_ENABLED = config("COMPRESSION_ENABLED", default=True, cast=bool)
+# Below this, headers and compressor setup cost more than the bytes saved.
+COMPRESSION_MIN_SIZE = config("COMPRESSION_MIN_SIZE", default=1024, cast=int)
+# From this size up, compression moves off the event loop; a thread hop costs tens of microseconds.
+COMPRESSION_THREAD_MIN_SIZE = config("COMPRESSION_THREAD_MIN_SIZE", default=64 * 1024, cast=int)
+COMPRESSION_WORKERS = config("COMPRESSION_WORKERS", default=min(4, os.cpu_count() or 1), cast=int)
+# Server preference when the client weighs several encodings equally.
+COMPRESSION_ENCODINGS = config("COMPRESSION_ENCODINGS", default="br,zstd,gzip", cast=Csv())
+COMPRESSION_GZIP_LEVEL = config("COMPRESSION_GZIP_LEVEL", default=6, cast=int)
+# Brotli's default quality (11) is meant for static assets; 4-5 is the usual pick for dynamic responses.
+COMPRESSION_BROTLI_QUALITY = config("COMPRESSION_BROTLI_QUALITY", default=4, cast=int)
+COMPRESSION_ZSTD_LEVEL = config("COMPRESSION_ZSTD_LEVEL", default=3, cast=int)
+COMPRESSION_CACHE_MAX_BYTES = config("COMPRESSION_CACHE_MAX_BYTES", default=16 * 1024 * 1024, cast=int)
+
+COMPRESSIBLE_TYPES = frozenset({
+    "application/json", "application/x-ndjson", "application/problem+json",
+    "application/javascript", "application/xml", "image/svg+xml",
+})
+
+
+def _available_encodings() -> tuple[str, ...]:
+    available = {"gzip"}
+    if brotli is not None:
+        available.add("br")
+    if zstandard is not None:
+        available.add("zstd")
+    return tuple(encoding for encoding in COMPRESSION_ENCODINGS if encoding in available)
+
+
+def _compress_gzip(body: bytes) -> bytes:
+    # wbits=31 writes the gzip container; zlib.compress alone would be the zlib one.
+    compressor = zlib.compressobj(COMPRESSION_GZIP_LEVEL, zlib.DEFLATED, 31)
+    return compressor.compress(body) + compressor.flush()
+
+
+def _compress_brotli(body: bytes) -> bytes:
+    return brotli.compress(body, quality=COMPRESSION_BROTLI_QUALITY)
+
+
+def _compress_zstd(body: bytes) -> bytes:
+    return zstandard.ZstdCompressor(level=COMPRESSION_ZSTD_LEVEL).compress(body)
+
+
+_COMPRESSORS: dict[str, Callable[[bytes], bytes]] = {"gzip": _compress_gzip, "br": _compress_brotli, "zstd": _compress_zstd}
+
+
+class _StreamCompressor:
+    """Incremental compressor whose every chunk is flushed, so it can be sent right away."""
+
+    def __init__(self, encoding: str):
+        self.encoding = encoding
+        if encoding == "gzip":
+            self._compressor = zlib.compressobj(COMPRESSION_GZIP_LEVEL, zlib.DEFLATED, 31)
+        elif encoding == "br":
+            self._compressor = brotli.Compressor(quality=COMPRESSION_BROTLI_QUALITY)
+        else:
+            self._compressor = zstandard.ZstdCompressor(level=COMPRESSION_ZSTD_LEVEL).compressobj()
+
+    def compress(self, chunk: bytes, last: bool) -> bytes:
+        if self.encoding == "gzip":
+            return self._compressor.compress(chunk) + self._compressor.flush(zlib.Z_FINISH if last else zlib.Z_SYNC_FLUSH)
+        if self.encoding == "br":
+            return self._compressor.process(chunk) + (self._compressor.finish() if last else self._compressor.flush())
+        flush_mode = zstandard.COMPRESSOBJ_FLUSH_FINISH if last else zstandard.COMPRESSOBJ_FLUSH_BLOCK
+        return self._compressor.compress(chunk) + self._compressor.flush(flush_mode)
+
+
+def _timed(func, *args):
+    # Thread CPU time, so time spent waiting for the GIL or the pool isn't counted.
+    started = time.thread_time()
+    result = func(*args)
+    return result, time.thread_time() - started
+
+
+@lru_cache(maxsize=None)
+def get_compression_executor() -> ThreadPoolExecutor:
+    # zlib, brotli and zstandard release the GIL while compressing.
+    return ThreadPoolExecutor(max_workers=COMPRESSION_WORKERS, thread_name_prefix="compression")
+
+
+async def _run(func, *args, size: int):
+    if size >= COMPRESSION_THREAD_MIN_SIZE:
+        return await asyncio.get_running_loop().run_in_executor(get_compression_executor(), _timed, func, *args)
+    return _timed(func, *args)
+
+
+def negotiate(accept_encoding: str, available: tuple[str, ...]) -> Optional[str]:
+    """The available encoding the client weighs highest, ties going to the server's order."""
+    weights: dict[str, float] = {}
+    for part in accept_encoding.lower().split(","):
+        coding, _, params = part.strip().partition(";")
+        weight = 1.0
+        for param in params.split(";"):
+            name, _, value = param.strip().partition("=")
+            if name == "q":
+                try:
+                    weight = float(value)
+                except ValueError:
+                    weight = 0.0
+        if coding:
+            weights[coding.strip()] = weight
+    best, best_weight = None, 0.0
+    for encoding in available:
+        weight = weights.get(encoding, weights.get("*", 0.0))
+        if weight > best_weight:
+            best, best_weight = encoding, weight
+    return best
+
+
+class CompressedBodyCache:
+    """LRU of compressed bodies keyed by (path and query, ETag, encoding), bounded by total size."""
+
+    def __init__(self, max_bytes: int):
+        self.max_bytes = max_bytes
+        self.size = 0
+        self._entries: OrderedDict[tuple[bytes, str, str], bytes] = OrderedDict()
+
+    def get(self, key: tuple[bytes, str, str]) -> Optional[bytes]:
+        body = self._entries.get(key)
+        if body is not None:
+            self._entries.move_to_end(key)
+        return body
+
+    def set(self, key: tuple[bytes, str, str], body: bytes):
+        if len(body) > self.max_bytes // 4:
+            # One huge body would push everything else out.
+            return
+        previous = self._entries.pop(key, None)
+        if previous is not None:
+            self.size -= len(previous)
+        self._entries[key] = body
+        self.size += len(body)
+        while self.size > self.max_bytes:
+            _, evicted = self._entries.popitem(last=False)
+            self.size -= len(evicted)
+
+
+class RouteCompressionMetrics:
+    __slots__ = ("responses", "bytes_in", "bytes_out", "cpu_seconds", "cache_hits")
+
+    def __init__(self):
+        self.responses = 0
+        self.bytes_in = 0
+        self.bytes_out = 0
+        self.cpu_seconds = 0.0
+        self.cache_hits = 0
+
+
+class CompressionMetrics:
+    """Per (method, route, encoding) byte counts and CPU time; ratio = output / input bytes."""
+
+    def __init__(self):
+        self.routes: dict[tuple[str, str, str], RouteCompressionMetrics] = {}
+        self.skipped_small = 0
+
+    def route(self, method: str, template: str, encoding: str) -> RouteCompressionMetrics:
+        key = (method, template, encoding)
+        metrics = self.routes.get(key)
+        if metrics is None:
+            metrics = self.routes[key] = RouteCompressionMetrics()
+        return metrics
+
+    def prometheus(self) -> str:
+        lines = [
+            "# HELP http_response_compression_skipped_total Compressible responses sent as-is for being under the minimum size.",
+            "# TYPE http_response_compression_skipped_total counter",
+            f"http_response_compression_skipped_total {self.skipped_small}",
+        ]
+        routes = sorted(self.routes.items())
+        for name, attr, help_text in (
+            ("http_response_compression_responses_total", "responses", "Compressed responses."),
+            ("http_response_compression_input_bytes_total", "bytes_in", "Response bytes before compression."),
+            ("http_response_compression_output_bytes_total", "bytes_out", "Response bytes after compression."),
+            ("http_response_compression_cpu_seconds_total", "cpu_seconds", "CPU time spent compressing."),
+            ("http_response_compression_cache_hits_total", "cache_hits", "Responses served from the compressed body cache."),
+        ):
+            lines += [f"# HELP {name} {help_text}", f"# TYPE {name} counter"]
+            for (method, template, encoding), metrics in routes:
+                labels = f'method="{method}",route="{_escape(template)}",encoding="{encoding}"'
+                value = getattr(metrics, attr)
+                lines.append(f"{name}{{{labels}}} {value:.6f}" if isinstance(value, float) else f"{name}{{{labels}}} {value}")
+        return "\n".join(lines) + "\n"
+
+
+compression_metrics = CompressionMetrics()
+
+
+def _tagged(etag: str, encoding: str) -> str:
+    return f'{etag[:-1]}-{encoding}"'
+
+
+def _untag_if_none_match(value: str, encodings: tuple[str, ...]) -> tuple[str, Optional[str]]:
+    """If-None-Match with our encoding suffixes removed, and the encoding of the last one removed."""
+    tags = []
+    matched = None
+    for tag in value.split(","):
+        tag = tag.strip()
+        if tag.startswith('"') and tag.endswith('"'):
+            for encoding in encodings:
+                if tag.endswith(f'-{encoding}"'):
+                    tag = tag[:-len(encoding) - 2] + '"'
+                    matched = encoding
+                    break
+        tags.append(tag)
+    return ", ".join(tags), matched
+
+
+class CompressionMiddleware:
+    """Compresses compressible responses for clients that accept it; see the module docstring."""
+
+    def __init__(
+        self,
+        app,
+        minimum_size: int = COMPRESSION_MIN_SIZE,
+        metrics: CompressionMetrics = compression_metrics,
+        cache: Optional[CompressedBodyCache] = None,
+    ):
+        self.app = app
+        self.minimum_size = minimum_size
+        self.metrics = metrics
+        self.cache = cache if cache is not None else CompressedBodyCache(COMPRESSION_CACHE_MAX_BYTES)
+        self.encodings = _available_encodings()
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not COMPRESSION_ENABLED or scope["method"] == "HEAD":
+            await self.app(scope, receive, send)
+            return
+        accept_encoding = ""
+        revalidated_as = None
+        headers = scope["headers"]
+        for index, (name, value) in enumerate(headers):
+            if name == b"accept-encoding":
+                accept_encoding = value.decode("latin-1")
+            elif name == b"if-none-match":
+                untagged, revalidated_as = _untag_if_none_match(value.decode("latin-1"), self.encodings)
+                if revalidated_as is not None:
+                    headers = list(headers)
+                    headers[index] = (name, untagged.encode("latin-1"))
+        # Updated in place rather than copied: the router records the matched route on this
+        # scope, and the metrics middleware outside reads it from there.
+        scope["headers"] = headers
+        encoding = negotiate(accept_encoding, self.encodings)
+        start = None
+        response_headers: Optional[MutableHeaders] = None
+        stream: Optional[_StreamCompressor] = None
+        metrics: Optional[RouteCompressionMetrics] = None
+        passthrough = False
+
+        async def send_wrapper(message):
+            nonlocal start, response_headers, stream, metrics, passthrough
+            if passthrough:
+                await send(message)
+                return
+            if message["type"] == "http.response.start":
+                response_headers = MutableHeaders(raw=list(message.get("headers", [])))
+                status_code = message["status"]
+                etag = response_headers.get("etag")
+                if status_code == 304:
+                    passthrough = True
+                    if revalidated_as is not None and etag and etag.startswith('"'):
+                        # The 304 must carry the tag of the representation the client holds.
+                        response_headers["etag"] = _tagged(etag, revalidated_as)
+                        response_headers.add_vary_header("Accept-Encoding")
+                    await send({**message, "headers": response_headers.raw})
+                    return
+                if not _compressible(status_code, response_headers):
+                    passthrough = True
+                    await send(message)
+                    return
+                response_headers.add_vary_header("Accept-Encoding")
+                start = {**message, "headers": response_headers.raw}
+                if encoding is None:
+                    passthrough = True
+                    await send(start)
+                return
+            if message["type"] != "http.response.body" or start is None:
+                await send(message)
+                return
+            body = message.get("body", b"")
+            more_body = message.get("more_body", False)
+            if stream is None:
+                etag = response_headers.get("etag")
+                strong_etag = etag is not None and etag.startswith('"')
+                if not more_body:
+                    await send_whole(body, etag if strong_etag else None)
+                    return
+                metrics = route_metrics()
+                stream = _StreamCompressor(encoding)
+                del response_headers["content-length"]
+                response_headers["content-encoding"] = encoding
+                if strong_etag:
+                    response_headers["etag"] = _tagged(etag, encoding)
+                metrics.responses += 1
+                await send({**start, "headers": response_headers.raw})
+            chunk, cpu_seconds = await _run(stream.compress, body, not more_body, size=len(body))
+            metrics.bytes_in += len(body)
+            metrics.bytes_out += len(chunk)
+            metrics.cpu_seconds += cpu_seconds
+            if chunk or not more_body:
+                await send({"type": "http.response.body", "body": chunk, "more_body": more_body})
+
+        def route_metrics() -> RouteCompressionMetrics:
+            # Routing has happened by the time the body is sent.
+            return self.metrics.route(scope["method"], route_template(scope), encoding)
+
+        async def send_whole(body: bytes, etag: Optional[str]):
+            if len(body) < self.minimum_size:
+                self.metrics.skipped_small += 1
+                await send(start)
+                await send({"type": "http.response.body", "body": body})
+                return
+            metrics = route_metrics()
+            key = (scope["path"].encode() + b"?" + scope.get("query_string", b""), etag, encoding)
+            compressed = self.cache.get(key) if etag else None
+            if compressed is not None:
+                metrics.cache_hits += 1
+            else:
+                compressed, cpu_seconds = await _run(_COMPRESSORS[encoding], body, size=len(body))
+                metrics.cpu_seconds += cpu_seconds
+                if etag:
+                    self.cache.set(key, compressed)
+            metrics.responses += 1
+            metrics.bytes_in += len(body)
+            metrics.bytes_out += len(compressed)
+            response_headers["content-encoding"] = encoding
+            response_headers["content-length"] = str(len(compressed))
+            if etag:
+                response_headers["etag"] = _tagged(etag, encoding)
+            await send({**start, "headers": response_headers.raw})
+            await send({"type": "http.response.body", "body": compressed})
+
+        await self.app(scope, receive, send_wrapper)
+
+
+def _compressible(status_code: int, headers: MutableHeaders) -> bool:
+    if status_code < 200 or status_code == 204 or "content-encoding" in headers:
+        return False
+    if "no-transform" in headers.get("cache-control", ""):
+        return False
+    media_type = headers.get("content-type", "").split(";")[0].strip().lower()
+    return media_type in COMPRESSIBLE_TYPES or media_type.startswith("text/")
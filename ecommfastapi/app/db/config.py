@@ -1,21 +1,45 @@
-from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine, async_sessionmaker
-from sqlalchemy.orm import declarative_base
+from sqlalchemy.ext.asyncio import AsyncEngine, AsyncSession, create_async_engine, async_sessionmaker
 from fastapi import Depends
-from typing import AsyncGenerator, Annotated
-from decouple import config
+from functools import lru_cache
+from typing import AsyncGenerator, Annotated, Optional
+from app.db.pool import InstrumentedQueuePool
+from app.db.slow_queries import attach_slow_query_log
+from app.instrumentation import instrument_engine
+from app.settings import get_settings
 
-DB_USER = config("DB_USER")
-DB_PASSWORD = config("DB_PASSWORD")
-DB_NAME = config("DB_NAME")
-DB_HOST = config("DB_HOST")
-DB_PORT = config("DB_PORT", cast=int)
+def create_engine_from_settings(url: Optional[str] = None, **overrides) -> AsyncEngine:
+    settings = get_settings()
+    url = url or settings.database_url
+    options = {
+        "echo": settings.db_echo,
+        "poolclass": InstrumentedQueuePool,
+        "pool_size": settings.db_pool_size,
+        "max_overflow": settings.db_max_overflow,
+        "pool_timeout": settings.db_pool_timeout,
+        "pool_recycle": settings.db_pool_recycle,
+        "pool_pre_ping": settings.db_pool_pre_ping,
+    }
+    if url.startswith("mysql"):
+        connect_args = {"connect_timeout": settings.db_connect_timeout}
+        if settings.db_statement_timeout_ms:
+            connect_args["init_command"] = f"SET SESSION max_execution_time={settings.db_statement_timeout_ms}"
+        options["connect_args"] = connect_args
+    options.update(overrides)
+    return create_async_engine(url, **options)
 
-DATABASE_URL = f"mysql+aiomysql://{DB_USER}:{DB_PASSWORD}@{DB_HOST}:{DB_PORT}/{DB_NAME}"
+# Bound by get_engine(); creating the engine imports the DB driver, so it waits for first use.
+async_session = async_sessionmaker(expire_on_commit=False)
+
+@lru_cache(maxsize=None)
+def get_engine() -> AsyncEngine:
+    engine = create_engine_from_settings()
+    instrument_engine(engine)
+    attach_slow_query_log(engine)
+    async_session.configure(bind=engine)
+    return engine
 
-engine = create_async_engine(DATABASE_URL, echo=True)
-async_session = async_sessionmaker(bind=engine, expire_on_commit=False)
 async def get_session() -> AsyncGenerator[AsyncSession, None]:
+    get_engine()
     async with async_session() as session:
         yield session
 SessionDep = Annotated[AsyncSession, Depends(get_session)]
-
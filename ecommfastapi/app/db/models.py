@@ -1,2 +1,3 @@
 from app.account import models as account_models  # Import account models to register them with Base
-from app.product import models as product_category_models  # Import product and category models to register them with Base
\ No newline at end of file
+from app.product import models as product_category_models  # Import product and category models to register them with Base
+from app.mail import models as mail_models  # Import the email outbox model to register it with Base
@@ -0,0 +1,63 @@
+from sqlalchemy.pool import AsyncAdaptedQueuePool
+from sqlalchemy import exc
+from app.metrics import Histogram
+from app.instrumentation import record_pool_wait
+import time
+
+
+class InstrumentedQueuePool(AsyncAdaptedQueuePool):
+    """AsyncAdaptedQueuePool that records checkout wait time, overflow and timeouts."""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.checkout_wait_ms = Histogram()
+        self.checkouts = 0
+        self.overflow_events = 0
+        self.timeouts = 0
+
+    def recreate(self):
+        # Engine.dispose() swaps in a fresh pool; keep the counters going.
+        new_pool = super().recreate()
+        new_pool.checkout_wait_ms = self.checkout_wait_ms
+        new_pool.checkouts = self.checkouts
+        new_pool.overflow_events = self.overflow_events
+        new_pool.timeouts = self.timeouts
+        return new_pool
+
+    def connect(self):
+        overflow_before = self._overflow
+        started = time.perf_counter()
+        try:
+            connection = super().connect()
+        except exc.TimeoutError:
+            self.timeouts += 1
+            raise
+        finally:
+            wait_ms = (time.perf_counter() - started) * 1000
+            self.checkout_wait_ms.observe(wait_ms)
+            record_pool_wait(wait_ms)
+        self.checkouts += 1
+        if self._overflow > overflow_before and self._overflow > 0:
+            self.overflow_events += 1
+        return connection
+
+    def stats(self) -> dict:
+        return {
+            "pool_size": self.size(),
+            "max_overflow": self._max_overflow,
+            "max_connections": self.size() + max(self._max_overflow, 0),
+            "checked_out": self.checkedout(),
+            "checked_in": self.checkedin(),
+            "overflow": self.overflow(),
+            "checkouts": self.checkouts,
+            "overflow_events": self.overflow_events,
+            "timeouts": self.timeouts,
+            "checkout_wait_ms": self.checkout_wait_ms.snapshot(),
+        }
+
+
+def pool_stats(engine) -> dict:
+    pool = engine.pool
+    if isinstance(pool, InstrumentedQueuePool):
+        return pool.stats()
+    return {"status": pool.status()}
@@ -0,0 +1,40 @@
+from contextlib import contextmanager
+from typing import Iterator
+from sqlalchemy import event
+from sqlalchemy.ext.asyncio import AsyncEngine
+
+
+class QueryCounter:
+    def __init__(self):
+        self.statements: list[str] = []
+
+    @property
+    def count(self) -> int:
+        return len(self.statements)
+
+    def _record(self, conn, cursor, statement, parameters, context, executemany):
+        self.statements.append(statement)
+
+
+@contextmanager
+def count_queries(engine: AsyncEngine) -> Iterator[QueryCounter]:
+    counter = QueryCounter()
+    event.listen(engine.sync_engine, "before_cursor_execute", counter._record)
+    try:
+        yield counter
+    finally:
+        event.remove(engine.sync_engine, "before_cursor_execute", counter._record)
+
+
+@contextmanager
+def assert_max_queries(engine: AsyncEngine, expected: int) -> Iterator[QueryCounter]:
+    """Fail if the block runs more than `expected` statements, e.g. to catch N+1 loads in tests.
+
+        with assert_max_queries(engine, 2):
+            await get_products_page(session, 50, loading="selectin")
+    """
+    with count_queries(engine) as counter:
+        yield counter
+    if counter.count > expected:
+        listing = "\n".join(f"  {i}. {statement}" for i, statement in enumerate(counter.statements, 1))
+        raise AssertionError(f"Expected at most {expected} queries, got {counter.count}:\n{listing}")
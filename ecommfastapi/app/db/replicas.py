@@ -0,0 +1,185 @@
+from contextvars import ContextVar
+from functools import lru_cache
+from http.cookies import SimpleCookie
+from itertools import count
+from typing import AsyncGenerator, Annotated, Optional
+from decouple import config, Csv
+from fastapi import Depends, Request
+from sqlalchemy import event, exc, text
+from sqlalchemy.ext.asyncio import AsyncEngine, AsyncSession, async_sessionmaker
+from sqlalchemy.orm import Session
+from app.db.config import SessionDep, async_session, create_engine_from_settings, get_engine
+from app.db.pool import pool_stats
+from app.db.slow_queries import attach_slow_query_log
+from app.instrumentation import instrument_engine
+import asyncio
+import time
+
+DATABASE_REPLICA_URLS = config("DATABASE_REPLICA_URLS", default="", cast=Csv())
+DB_REPLICA_POOL_SIZE = config("DB_REPLICA_POOL_SIZE", default=10, cast=int)
+DB_REPLICA_HEALTH_CHECK_SECONDS = config("DB_REPLICA_HEALTH_CHECK_SECONDS", default=5, cast=float)
+DB_REPLICA_HEALTH_CHECK_TIMEOUT = config("DB_REPLICA_HEALTH_CHECK_TIMEOUT", default=1, cast=float)
+DB_REPLICA_RETRY_SECONDS = config("DB_REPLICA_RETRY_SECONDS", default=30, cast=float)
+# After a client writes, its reads stay on the primary this long to hide replica lag.
+DB_READ_YOUR_WRITES_SECONDS = config("DB_READ_YOUR_WRITES_SECONDS", default=5, cast=int)
+
+READ_PRIMARY_COOKIE = "db_read_primary_until"
+
+# Per-request flag set when a primary session commits; read by ReadYourWritesMiddleware.
+_request_wrote: ContextVar[Optional[dict]] = ContextVar("request_wrote", default=None)
+
+
+@event.listens_for(Session, "after_commit")
+def _mark_request_wrote(session: Session):
+    state = _request_wrote.get()
+    if state is not None and not session.info.get("read_only"):
+        state["wrote"] = True
+
+
+class Replica:
+    def __init__(self, url: str, engine: AsyncEngine):
+        self.url = url
+        self.engine = engine
+        self.sessionmaker = async_sessionmaker(bind=engine, expire_on_commit=False, info={"read_only": True})
+        self.down_until = 0.0
+        self.checked_at = 0.0
+        self.failures = 0
+        self.sessions = 0
+
+    @property
+    def healthy(self) -> bool:
+        return self.down_until <= time.monotonic()
+
+
+class ReplicaRouter:
+    """Round-robins read sessions over healthy replicas, falling back to the primary."""
+
+    def __init__(self, urls: list[str]):
+        self.replicas = [
+            Replica(url, create_engine_from_settings(url, pool_size=DB_REPLICA_POOL_SIZE))
+            for url in urls
+        ]
+        for replica in self.replicas:
+            instrument_engine(replica.engine)
+            attach_slow_query_log(replica.engine)
+        self._next = count()
+        self.primary_fallbacks = 0
+
+    async def _check(self, replica: Replica) -> bool:
+        replica.checked_at = time.monotonic()
+        try:
+            async with replica.engine.connect() as connection:
+                await asyncio.wait_for(connection.execute(text("SELECT 1")), DB_REPLICA_HEALTH_CHECK_TIMEOUT)
+        except (exc.DBAPIError, OSError, asyncio.TimeoutError):
+            self.mark_down(replica)
+            return False
+        return True
+
+    def mark_down(self, replica: Replica):
+        replica.failures += 1
+        replica.down_until = time.monotonic() + DB_REPLICA_RETRY_SECONDS
+
+    async def pick(self) -> Optional[Replica]:
+        start = next(self._next)
+        for offset in range(len(self.replicas)):
+            replica = self.replicas[(start + offset) % len(self.replicas)]
+            if not replica.healthy:
+                continue
+            if time.monotonic() - replica.checked_at > DB_REPLICA_HEALTH_CHECK_SECONDS and not await self._check(replica):
+                continue
+            return replica
+        return None
+
+    def stats(self) -> list[dict]:
+        return [
+            {
+                "url": replica.engine.url.render_as_string(hide_password=True),
+                "healthy": replica.healthy,
+                "failures": replica.failures,
+                "sessions": replica.sessions,
+                "pool": pool_stats(replica.engine),
+            }
+            for replica in self.replicas
+        ]
+
+    async def dispose(self):
+        for replica in self.replicas:
+            await replica.engine.dispose()
+
+
+@lru_cache(maxsize=None)
+def get_replica_router() -> ReplicaRouter:
+    # Like get_engine(): replica engines import the DB driver, so they wait for first use.
+    return ReplicaRouter(DATABASE_REPLICA_URLS)
+
+
+def _reads_from_primary(request: Request) -> bool:
+    until = request.cookies.get(READ_PRIMARY_COOKIE)
+    try:
+        return until is not None and float(until) > time.time()
+    except ValueError:
+        return False
+
+
+async def pick_read_sessionmaker() -> async_sessionmaker:
+    # For work that outlives the request's dependencies, e.g. streaming responses.
+    replica = await get_replica_router().pick() if DATABASE_REPLICA_URLS else None
+    if replica is None:
+        get_engine()
+        return async_session
+    replica.sessions += 1
+    return replica.sessionmaker
+
+
+async def get_read_session(request: Request, primary_session: SessionDep) -> AsyncGenerator[AsyncSession, None]:
+    # Without a usable replica, share the request's primary session (and connection).
+    replica = None
+    if DATABASE_REPLICA_URLS and not _reads_from_primary(request):
+        replica_router = get_replica_router()
+        replica = await replica_router.pick()
+        if replica is None:
+            replica_router.primary_fallbacks += 1
+    if replica is None:
+        yield primary_session
+        return
+    replica.sessions += 1
+    async with replica.sessionmaker() as session:
+        try:
+            yield session
+        except exc.DBAPIError as e:
+            if e.connection_invalidated or isinstance(e, exc.OperationalError):
+                get_replica_router().mark_down(replica)
+            raise
+ReadSessionDep = Annotated[AsyncSession, Depends(get_read_session)]
+
+
+class ReadYourWritesMiddleware:
+    """Pins a client's reads to the primary for a short window after it writes."""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not DATABASE_REPLICA_URLS:
+            await self.app(scope, receive, send)
+            return
+        state = {"wrote": False}
+        token = _request_wrote.set(state)
+
+        async def send_wrapper(message):
+            if message["type"] == "http.response.start" and state["wrote"]:
+                cookie = SimpleCookie()
+                cookie[READ_PRIMARY_COOKIE] = str(time.time() + DB_READ_YOUR_WRITES_SECONDS)
+                cookie[READ_PRIMARY_COOKIE]["max-age"] = DB_READ_YOUR_WRITES_SECONDS
+                cookie[READ_PRIMARY_COOKIE]["path"] = "/"
+                cookie[READ_PRIMARY_COOKIE]["httponly"] = True
+                cookie[READ_PRIMARY_COOKIE]["samesite"] = "Lax"
+                headers = list(message.get("headers", []))
+                headers.append((b"set-cookie", cookie.output(header="").strip().encode("latin-1")))
+                message = {**message, "headers": headers}
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            _request_wrote.reset(token)
@@ -0,0 +1,47 @@
+from typing import Literal
+from fastapi import APIRouter, Depends, Query
+from app.account.dep import require_admin
+from app.account.models import User
+from app.account.utils import success_response
+from app.db.config import get_engine
+from app.db.pool import pool_stats
+from app.db.replicas import get_replica_router
+from app.db.slow_queries import slow_query_log
+
+router = APIRouter()
+
+@router.get("/pool")
+async def db_pool_stats(admin_user: User = Depends(require_admin)):
+    return success_response(
+        message="Database pool stats",
+        data={
+            "primary": pool_stats(get_engine()),
+            "replicas": get_replica_router().stats(),
+            "primary_fallbacks": get_replica_router().primary_fallbacks,
+        },
+        status_code=200
+    )
+
+@router.get("/slow-queries")
+async def slow_queries(
+    limit: int = Query(20, ge=1, le=200),
+    sort: Literal["total_ms", "count", "slow_count", "max_ms", "p99_ms"] = "total_ms",
+    admin_user: User = Depends(require_admin),
+):
+    return success_response(
+        message="Top query fingerprints",
+        data={
+            "log_threshold_ms": slow_query_log.log_ms,
+            "fingerprints": slow_query_log.top(limit, sort),
+        },
+        status_code=200
+    )
+
+@router.delete("/slow-queries")
+async def reset_slow_queries(admin_user: User = Depends(require_admin)):
+    slow_query_log.reset()
+    return success_response(
+        message="Query stats reset",
+        data=None,
+        status_code=200
+    )
@@ -0,0 +1,220 @@
+"""Flags lookups that no index supports, and indexes nothing needs.
+
+    python -m app.db.schema_lint              # against the models
+    python -m app.db.schema_lint --database   # against the live schema (DATABASE_URL / DB_*)
+
+Checks every foreign key column, and every column the app filters or joins on in a
+`.where(...)`, `.filter(...)` or `.join(...)` call. A call passes when at least one
+of its columns leads an index (primary keys and unique constraints count), since one
+index is enough to avoid a table scan. Also flags indexes that repeat the leading
+columns of another one. Add `# schema-lint: ignore` to a line to accept a known scan.
+Exits with status 1 when anything is flagged.
+"""
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Optional
+from sqlalchemy import Table, UniqueConstraint, inspect
+from app.db.base import Base
+from app.db import models  # noqa: F401
+import argparse
+import ast
+import asyncio
+import sys
+
+APP_ROOT = Path(__file__).resolve().parent.parent
+FILTER_METHODS = frozenset({"where", "filter", "join"})
+IGNORE_MARKER = "schema-lint: ignore"
+
+
+@dataclass(frozen=True)
+class TableIndex:
+    name: str
+    columns: tuple[str, ...]
+    unique: bool = False
+
+
+@dataclass
+class Finding:
+    location: str
+    message: str
+
+    def __str__(self):
+        return f"{self.location}: {self.message}"
+
+
+def metadata_indexes() -> dict[str, list[TableIndex]]:
+    """Indexes per table as the models declare them, primary keys and unique constraints included."""
+    indexes: dict[str, list[TableIndex]] = {}
+    for table in Base.metadata.sorted_tables:
+        entries = indexes.setdefault(table.name, [])
+        if table.primary_key.columns:
+            entries.append(TableIndex("PRIMARY", tuple(column.name for column in table.primary_key.columns), unique=True))
+        for index in table.indexes:
+            if index.dialect_kwargs.get("mysql_prefix"):
+                # FULLTEXT and SPATIAL indexes don't serve comparisons.
+                continue
+            entries.append(TableIndex(index.name, tuple(column.name for column in index.columns), unique=bool(index.unique)))
+        for constraint in table.constraints:
+            if isinstance(constraint, UniqueConstraint):
+                columns = tuple(column.name for column in constraint.columns)
+                # MySQL names an unnamed unique constraint after its first column.
+                entries.append(TableIndex(constraint.name or columns[0], columns, unique=True))
+    return indexes
+
+
+def _inspect_indexes(connection) -> dict[str, list[TableIndex]]:
+    inspector = inspect(connection)
+    indexes: dict[str, list[TableIndex]] = {}
+    for table_name in inspector.get_table_names():
+        if table_name == "alembic_version":
+            continue
+        entries = indexes.setdefault(table_name, [])
+        primary_key = inspector.get_pk_constraint(table_name)
+        if primary_key.get("constrained_columns"):
+            entries.append(TableIndex("PRIMARY", tuple(primary_key["constrained_columns"]), unique=True))
+        for index in inspector.get_indexes(table_name):
+            if index.get("dialect_options", {}).get("mysql_prefix"):
+                continue
+            entries.append(TableIndex(index["name"], tuple(index["column_names"]), unique=bool(index.get("unique"))))
+        for constraint in inspector.get_unique_constraints(table_name):
+            entries.append(TableIndex(constraint["name"], tuple(constraint["column_names"]), unique=True))
+    return indexes
+
+
+async def database_indexes(url: Optional[str] = None) -> dict[str, list[TableIndex]]:
+    """Indexes per table as the database actually has them, to catch models and migrations drifting apart."""
+    from app.db.config import create_engine_from_settings
+    engine = create_engine_from_settings(url)
+    try:
+        async with engine.connect() as connection:
+            return await connection.run_sync(_inspect_indexes)
+    finally:
+        await engine.dispose()
+
+
+def _leads(indexes: list[TableIndex], columns: set[str]) -> bool:
+    return any(index.columns and index.columns[0] in columns for index in indexes)
+
+
+def _covers(indexes: list[TableIndex], columns: tuple[str, ...]) -> bool:
+    return any(set(index.columns[:len(columns)]) == set(columns) for index in indexes)
+
+
+def check_foreign_keys(indexes: dict[str, list[TableIndex]]) -> list[Finding]:
+    # Deletes on the parent and joins from it look rows up by these columns.
+    findings = []
+    for table in Base.metadata.sorted_tables:
+        if table.name not in indexes:
+            continue
+        for constraint in table.foreign_key_constraints:
+            columns = tuple(column.name for column in constraint.columns)
+            if not _covers(indexes.get(table.name, []), columns):
+                findings.append(Finding(
+                    f"{table.name}({', '.join(columns)})",
+                    f"foreign key to {constraint.referred_table.name} has no index leading with its columns",
+                ))
+    return findings
+
+
+def check_redundant(indexes: dict[str, list[TableIndex]]) -> list[Finding]:
+    # Each extra index costs on every write; one whose columns lead another index buys nothing.
+    findings = []
+    for table_name, entries in indexes.items():
+        for index in entries:
+            if index.name == "PRIMARY":
+                continue
+            for other in entries:
+                if other.name == index.name or other.columns[:len(index.columns)] != index.columns:
+                    continue
+                if index.unique and not (other.unique and other.columns == index.columns):
+                    # A unique index enforces something a wider index doesn't.
+                    continue
+                if other.columns == index.columns and other.name != "PRIMARY" and other.name < index.name:
+                    # Two identical indexes: report only one of them.
+                    continue
+                findings.append(Finding(f"{table_name}.{index.name}", f"redundant with {other.name} ({', '.join(other.columns)})"))
+                break
+    return findings
+
+
+def _mapped_names() -> dict[str, Table]:
+    """Names the app refers to tables by: mapped class names and module-level Table variables."""
+    names: dict[str, Table] = {}
+    for mapper in Base.registry.mappers:
+        names[mapper.class_.__name__] = mapper.local_table
+        for name, value in vars(sys.modules[mapper.class_.__module__]).items():
+            if isinstance(value, Table):
+                names[name] = value
+    return names
+
+
+def _column_refs(node: ast.AST, names: dict[str, Table]) -> set[tuple[str, str]]:
+    """(table, column) pairs for `Model.column` and `table.c.column` inside `node`."""
+    refs = set()
+    for child in ast.walk(node):
+        if not isinstance(child, ast.Attribute):
+            continue
+        owner = child.value
+        if isinstance(owner, ast.Attribute) and owner.attr == "c":
+            owner = owner.value
+        if isinstance(owner, ast.Name) and owner.id in names:
+            table = names[owner.id]
+            if child.attr in table.columns:
+                refs.add((table.name, child.attr))
+    return refs
+
+
+def filter_columns(root: Path = APP_ROOT) -> list[tuple[str, set[tuple[str, str]]]]:
+    """Every filter or join call in the app, as (location, columns it compares per table)."""
+    names = _mapped_names()
+    calls = []
+    for path in sorted(root.rglob("*.py")):
+        source = path.read_text()
+        lines = source.splitlines()
+        for node in ast.walk(ast.parse(source, str(path))):
+            if not (isinstance(node, ast.Call) and isinstance(node.func, ast.Attribute) and node.func.attr in FILTER_METHODS):
+                continue
+            if IGNORE_MARKER in lines[node.lineno - 1]:
+                continue
+            refs = set()
+            for argument in [*node.args, *(keyword.value for keyword in node.keywords)]:
+                refs |= _column_refs(argument, names)
+            if refs:
+                calls.append((f"{path.relative_to(root.parent)}:{node.lineno}", refs))
+    return calls
+
+
+def check_filters(indexes: dict[str, list[TableIndex]], root: Path = APP_ROOT) -> list[Finding]:
+    findings = []
+    for location, refs in filter_columns(root):
+        by_table: dict[str, set[str]] = {}
+        for table_name, column in refs:
+            by_table.setdefault(table_name, set()).add(column)
+        if any(table_name not in indexes or _leads(indexes[table_name], columns) for table_name, columns in by_table.items()):
+            continue
+        described = ", ".join(f"{table_name}.{column}" for table_name, column in sorted(refs))
+        findings.append(Finding(location, f"no index leads with any of {described}"))
+    return findings
+
+
+def lint(indexes: dict[str, list[TableIndex]], root: Path = APP_ROOT) -> list[Finding]:
+    # Only possible against a database; its lookups are skipped rather than all flagged.
+    missing = [Finding(table.name, "table is missing") for table in Base.metadata.sorted_tables if table.name not in indexes]
+    return [*missing, *check_foreign_keys(indexes), *check_filters(indexes, root), *check_redundant(indexes)]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Check that the app's lookups are backed by indexes.")
+    parser.add_argument("--database", action="store_true", help="inspect the live schema instead of the models")
+    parser.add_argument("--url", help="database to inspect with --database; defaults to the app's")
+    args = parser.parse_args()
+    indexes = asyncio.run(database_indexes(args.url)) if args.database else metadata_indexes()
+    findings = lint(indexes)
+    for finding in findings:
+        print(finding)
+    print(f"schema lint: {len(findings)} finding(s) in {len(indexes)} tables")
+    sys.exit(1 if findings else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,184 @@
+from datetime import datetime, timezone
+from functools import lru_cache
+from typing import Optional
+from decouple import config
+from sqlalchemy import event
+from sqlalchemy.ext.asyncio import AsyncEngine
+from app.instrumentation import current_route
+from app.metrics import Histogram
+import asyncio
+import hashlib
+import logging
+import re
+import time
+
+logger = logging.getLogger(__name__)
+
+SLOW_QUERY_STATS_ENABLED = config("SLOW_QUERY_STATS_ENABLED", default=True, cast=bool)
+# Statements slower than this are logged (fingerprint, duration, route; never parameters).
+SLOW_QUERY_LOG_MS = config("SLOW_QUERY_LOG_MS", default=200, cast=float)
+# Slow SELECTs over this also get an EXPLAIN captured in the background; 0 disables.
+SLOW_QUERY_EXPLAIN_MS = config("SLOW_QUERY_EXPLAIN_MS", default=0, cast=float)
+SLOW_QUERY_EXPLAIN_INTERVAL_SECONDS = config("SLOW_QUERY_EXPLAIN_INTERVAL_SECONDS", default=600, cast=int)
+SLOW_QUERY_MAX_FINGERPRINTS = config("SLOW_QUERY_MAX_FINGERPRINTS", default=1000, cast=int)
+
+# Distinct routes remembered per fingerprint.
+_MAX_ROUTES = 20
+_OTHER = "<other>"
+
+_STRING = re.compile(r"'(?:[^']|'')*'")
+_NUMBER = re.compile(r"\b\d+(?:\.\d+)?\b")
+_PLACEHOLDER = re.compile(r"%\(\w+\)s|%s|\?|(?<!:):\w+")
+_LIST = re.compile(r"\(\s*\?(?:\s*,\s*\?)*\s*\)")
+_ROWS = re.compile(r"\(\.\.\.\)(?:\s*,\s*\(\.\.\.\))+")
+_SPACE = re.compile(r"\s+")
+
+
+@lru_cache(maxsize=4096)
+def fingerprint(statement: str) -> str:
+    """Statement shape with every literal and bind parameter replaced, so `IN (?, ?)` and `IN (?)` agree."""
+    normalized = _STRING.sub("?", statement)
+    normalized = _NUMBER.sub("?", normalized)
+    normalized = _PLACEHOLDER.sub("?", normalized)
+    normalized = _LIST.sub("(...)", normalized)
+    normalized = _ROWS.sub("(...)", normalized)
+    return _SPACE.sub(" ", normalized).strip()
+
+
+class FingerprintStats:
+    __slots__ = ("fingerprint", "id", "count", "slow_count", "total_ms", "max_ms", "latency", "routes", "explain", "explained_at")
+
+    def __init__(self, fingerprint: str):
+        self.fingerprint = fingerprint
+        self.id = hashlib.blake2b(fingerprint.encode(), digest_size=6).hexdigest()
+        self.count = 0
+        self.slow_count = 0
+        self.total_ms = 0.0
+        self.max_ms = 0.0
+        self.latency = Histogram()
+        self.routes: dict[str, int] = {}
+        self.explain: Optional[list] = None
+        self.explained_at: Optional[datetime] = None
+
+    def snapshot(self) -> dict:
+        top_routes = sorted(self.routes.items(), key=lambda item: item[1], reverse=True)[:5]
+        return {
+            "id": self.id,
+            "fingerprint": self.fingerprint,
+            "count": self.count,
+            "slow_count": self.slow_count,
+            "total_ms": round(self.total_ms, 3),
+            "mean_ms": round(self.total_ms / self.count, 3) if self.count else 0.0,
+            "p50_ms": self.latency.percentile(0.5),
+            "p95_ms": self.latency.percentile(0.95),
+            "p99_ms": self.latency.percentile(0.99),
+            "max_ms": round(self.max_ms, 3),
+            "routes": dict(top_routes),
+            "explain": self.explain,
+            "explained_at": self.explained_at,
+        }
+
+
+class SlowQueryLog:
+    """Per-fingerprint timing for every statement on the attached engines, plus a log of slow ones."""
+
+    def __init__(self, log_ms: float, explain_ms: float, max_fingerprints: int):
+        self.log_ms = log_ms
+        self.explain_ms = explain_ms
+        self.max_fingerprints = max_fingerprints
+        self.fingerprints: dict[str, FingerprintStats] = {}
+        self._explaining: set[str] = set()
+        self._tasks: set[asyncio.Task] = set()
+        # Sync engine (what the hooks see) -> async engine (what EXPLAIN runs on).
+        self._engines: dict = {}
+
+    def attach(self, engine: AsyncEngine):
+        sync_engine = engine.sync_engine
+        if event.contains(sync_engine, "before_cursor_execute", self._before):
+            return
+        event.listen(sync_engine, "before_cursor_execute", self._before)
+        event.listen(sync_engine, "after_cursor_execute", self._after)
+        self._engines[sync_engine] = engine
+
+    def _before(self, conn, cursor, statement, parameters, context, executemany):
+        conn.info["slow_query_started"] = time.perf_counter()
+
+    def _after(self, conn, cursor, statement, parameters, context, executemany):
+        started = conn.info.pop("slow_query_started", None)
+        if started is None:
+            return
+        elapsed_ms = (time.perf_counter() - started) * 1000
+        stats = self._stats_for(fingerprint(statement))
+        route = current_route() or "<background>"
+        stats.count += 1
+        stats.total_ms += elapsed_ms
+        stats.latency.observe(elapsed_ms)
+        if elapsed_ms > stats.max_ms:
+            stats.max_ms = elapsed_ms
+        if route in stats.routes or len(stats.routes) < _MAX_ROUTES:
+            stats.routes[route] = stats.routes.get(route, 0) + 1
+        if elapsed_ms < self.log_ms:
+            return
+        stats.slow_count += 1
+        logger.warning("Slow query %.1fms [%s] on %s: %s", elapsed_ms, stats.id, route, stats.fingerprint)
+        if self.explain_ms and elapsed_ms >= self.explain_ms and not executemany:
+            self._maybe_explain(conn, stats, statement, parameters)
+
+    def _stats_for(self, key: str) -> FingerprintStats:
+        stats = self.fingerprints.get(key)
+        if stats is None:
+            if len(self.fingerprints) >= self.max_fingerprints:
+                # Past the cap, new shapes share one bucket instead of growing memory without bound.
+                key = _OTHER
+                stats = self.fingerprints.get(key)
+                if stats is not None:
+                    return stats
+            stats = self.fingerprints[key] = FingerprintStats(key)
+        return stats
+
+    def _maybe_explain(self, conn, stats: FingerprintStats, statement: str, parameters):
+        if not statement.lstrip()[:6].upper() == "SELECT" or stats.id in self._explaining:
+            return
+        if stats.explained_at and (datetime.now(timezone.utc) - stats.explained_at).total_seconds() < SLOW_QUERY_EXPLAIN_INTERVAL_SECONDS:
+            return
+        engine = self._engines.get(conn.engine)
+        if engine is None:
+            return
+        self._explaining.add(stats.id)
+        # The hook runs inside the request; EXPLAIN goes to a background task so it adds no latency there.
+        task = asyncio.get_running_loop().create_task(self._explain(engine, stats, statement, parameters))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    async def _explain(self, engine: AsyncEngine, stats: FingerprintStats, statement: str, parameters):
+        prefix = "EXPLAIN QUERY PLAN " if engine.dialect.name == "sqlite" else "EXPLAIN "
+        try:
+            async with engine.connect() as connection:
+                result = await connection.exec_driver_sql(prefix + statement, parameters)
+                stats.explain = [dict(row._mapping) for row in result]
+                stats.explained_at = datetime.now(timezone.utc)
+        except Exception:
+            logger.exception("EXPLAIN failed for query %s", stats.id)
+        finally:
+            self._explaining.discard(stats.id)
+
+    def top(self, limit: int = 20, sort: str = "total_ms") -> list[dict]:
+        key = {
+            "total_ms": lambda stats: stats.total_ms,
+            "count": lambda stats: stats.count,
+            "slow_count": lambda stats: stats.slow_count,
+            "max_ms": lambda stats: stats.max_ms,
+            "p99_ms": lambda stats: stats.latency.percentile(0.99),
+        }[sort]
+        return [stats.snapshot() for stats in sorted(self.fingerprints.values(), key=key, reverse=True)[:limit]]
+
+    def reset(self):
+        self.fingerprints.clear()
+
+
+slow_query_log = SlowQueryLog(SLOW_QUERY_LOG_MS, SLOW_QUERY_EXPLAIN_MS, SLOW_QUERY_MAX_FINGERPRINTS)
+
+
+def attach_slow_query_log(engine: AsyncEngine):
+    if SLOW_QUERY_STATS_ENABLED:
+        slow_query_log.attach(engine)
@@ -0,0 +1,197 @@
+from contextvars import ContextVar
+from typing import Optional
+from decouple import config
+from sqlalchemy import event
+from sqlalchemy.ext.asyncio import AsyncEngine
+from app.metrics import Histogram
+import re
+import time
+
+REQUEST_METRICS_ENABLED = config("REQUEST_METRICS_ENABLED", default=True, cast=bool)
+# Exposes DB timings to clients; keep off in production unless responses are internal.
+SERVER_TIMING_ENABLED = config("SERVER_TIMING_ENABLED", default=False, cast=bool)
+
+_PATH_PARAM = re.compile(r"{(\w+)(?::\w+)?}")
+
+
+class RequestStats:
+    """DB work attributed to the request being served; filled in by engine and pool hooks."""
+
+    __slots__ = ("scope", "route", "queries", "db_ms", "pool_wait_ms")
+
+    def __init__(self, scope=None):
+        self.scope = scope
+        self.route: Optional[str] = None
+        self.queries = 0
+        self.db_ms = 0.0
+        self.pool_wait_ms = 0.0
+
+    def server_timing(self, total_ms: float) -> bytes:
+        return (
+            f'app;dur={total_ms:.1f}, db;dur={self.db_ms:.1f};desc="{self.queries} queries", '
+            f"pool;dur={self.pool_wait_ms:.1f}"
+        ).encode("latin-1")
+
+
+_current_request: ContextVar[Optional[RequestStats]] = ContextVar("current_request", default=None)
+
+
+def current_route() -> Optional[str]:
+    """Route template of the request being served, or None outside a request."""
+    stats = _current_request.get()
+    if stats is None or stats.scope is None:
+        return None
+    if stats.route is None and "route" in stats.scope:
+        # Resolved once per request, on the first query after routing.
+        stats.route = route_template(stats.scope)
+    return stats.route
+
+
+def record_pool_wait(wait_ms: float):
+    stats = _current_request.get()
+    if stats is not None:
+        stats.pool_wait_ms += wait_ms
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    # A connection runs one statement at a time, so a single slot in conn.info is enough.
+    conn.info["query_started"] = time.perf_counter()
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    stats = _current_request.get()
+    if stats is not None:
+        stats.queries += 1
+        stats.db_ms += (time.perf_counter() - conn.info.pop("query_started", time.perf_counter())) * 1000
+
+
+def instrument_engine(engine: AsyncEngine):
+    # Engine events fire inside SQLAlchemy's greenlet, which shares the request task's contextvars.
+    if REQUEST_METRICS_ENABLED and not event.contains(engine.sync_engine, "before_cursor_execute", _before_cursor_execute):
+        event.listen(engine.sync_engine, "before_cursor_execute", _before_cursor_execute)
+        event.listen(engine.sync_engine, "after_cursor_execute", _after_cursor_execute)
+
+
+class RouteMetrics:
+    __slots__ = ("latency", "statuses", "queries", "db_ms", "pool_wait_ms")
+
+    def __init__(self):
+        self.latency = Histogram()
+        self.statuses: dict[int, int] = {}
+        self.queries = 0
+        self.db_ms = 0.0
+        self.pool_wait_ms = 0.0
+
+
+class RequestMetrics:
+    """Per-route counters keyed by (method, route template), so label cardinality stays bounded."""
+
+    def __init__(self):
+        self.routes: dict[tuple[str, str], RouteMetrics] = {}
+        self.in_flight = 0
+
+    def route(self, method: str, template: str) -> RouteMetrics:
+        key = (method, template)
+        metrics = self.routes.get(key)
+        if metrics is None:
+            metrics = self.routes[key] = RouteMetrics()
+        return metrics
+
+    def observe(self, method: str, template: str, status_code: int, elapsed_ms: float, stats: RequestStats):
+        metrics = self.route(method, template)
+        metrics.latency.observe(elapsed_ms)
+        metrics.statuses[status_code] = metrics.statuses.get(status_code, 0) + 1
+        metrics.queries += stats.queries
+        metrics.db_ms += stats.db_ms
+        metrics.pool_wait_ms += stats.pool_wait_ms
+
+    def prometheus(self) -> str:
+        lines = [
+            "# HELP http_requests_in_flight Requests currently being served.",
+            "# TYPE http_requests_in_flight gauge",
+            f"http_requests_in_flight {self.in_flight}",
+            "# HELP http_request_duration_seconds Request latency by route.",
+            "# TYPE http_request_duration_seconds histogram",
+        ]
+        routes = sorted(self.routes.items())
+        for (method, template), metrics in routes:
+            labels = f'method="{method}",route="{_escape(template)}"'
+            cumulative = 0
+            for bound, count in zip(metrics.latency.buckets, metrics.latency.counts):
+                cumulative += count
+                lines.append(f'http_request_duration_seconds_bucket{{{labels},le="{bound / 1000:g}"}} {cumulative}')
+            lines.append(f'http_request_duration_seconds_bucket{{{labels},le="+Inf"}} {metrics.latency.count}')
+            lines.append(f"http_request_duration_seconds_sum{{{labels}}} {metrics.latency.sum / 1000:.6f}")
+            lines.append(f"http_request_duration_seconds_count{{{labels}}} {metrics.latency.count}")
+        lines += ["# HELP http_requests_total Responses by route and status.", "# TYPE http_requests_total counter"]
+        for (method, template), metrics in routes:
+            for status_code, count in sorted(metrics.statuses.items()):
+                lines.append(f'http_requests_total{{method="{method}",route="{_escape(template)}",status="{status_code}"}} {count}')
+        for name, attr, scale, help_text in (
+            ("http_request_db_queries_total", "queries", 1, "SQL statements executed while serving the route."),
+            ("http_request_db_seconds_total", "db_ms", 1000, "Time spent in SQL statements while serving the route."),
+            ("http_request_pool_wait_seconds_total", "pool_wait_ms", 1000, "Time spent waiting for a pooled connection."),
+        ):
+            lines += [f"# HELP {name} {help_text}", f"# TYPE {name} counter"]
+            for (method, template), metrics in routes:
+                lines.append(f'{name}{{method="{method}",route="{_escape(template)}"}} {getattr(metrics, attr) / scale:g}')
+        return "\n".join(lines) + "\n"
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace('"', '\\"')
+
+
+def route_template(scope) -> str:
+    route = scope.get("route")
+    if route is None:
+        # Unmatched paths share one label; raw paths would let clients create unbounded series.
+        return "<unmatched>"
+    template = route.path
+    params = scope.get("path_params")
+    rendered = _PATH_PARAM.sub(lambda m: str(params.get(m.group(1), m.group(0))), template) if params else template
+    path = scope["path"]
+    # Depending on the FastAPI version, routes added with include_router(prefix=...) report
+    # their path with or without the prefix; recover it from the request path.
+    if path.endswith(rendered):
+        return path[:len(path) - len(rendered)] + template
+    return template
+
+
+request_metrics = RequestMetrics()
+
+
+class RequestMetricsMiddleware:
+    """Records latency, status and DB work per route, and optionally a Server-Timing header."""
+
+    def __init__(self, app, metrics: RequestMetrics = request_metrics, server_timing: bool = SERVER_TIMING_ENABLED):
+        self.app = app
+        self.metrics = metrics
+        self.server_timing = server_timing
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not REQUEST_METRICS_ENABLED:
+            await self.app(scope, receive, send)
+            return
+        stats = RequestStats(scope)
+        token = _current_request.set(stats)
+        started = time.perf_counter()
+        status_code = 500
+        self.metrics.in_flight += 1
+
+        async def send_wrapper(message):
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+                if self.server_timing:
+                    headers = list(message.get("headers", []))
+                    headers.append((b"server-timing", stats.server_timing((time.perf_counter() - started) * 1000)))
+                    message = {**message, "headers": headers}
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            self.metrics.in_flight -= 1
+            self.metrics.observe(scope["method"], stats.route or route_template(scope), status_code, (time.perf_counter() - started) * 1000, stats)
+            _current_request.reset(token)
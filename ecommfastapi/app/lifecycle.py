@@ -0,0 +1,213 @@
+from contextlib import AsyncExitStack
+from typing import Optional
+from decouple import config
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import AsyncEngine
+from app.account.jwt_backend import get_jwt_backend
+from app.account.utils import get_pwd_context
+from app.db.pool import pool_stats
+from app.settings import get_settings
+import asyncio
+import logging
+import signal
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+# Connections opened at startup so the first requests after a deploy don't pay for the connect.
+DB_POOL_WARMUP_CONNECTIONS = config("DB_POOL_WARMUP_CONNECTIONS", default=4, cast=int)
+DB_POOL_WARMUP_TIMEOUT_SECONDS = config("DB_POOL_WARMUP_TIMEOUT_SECONDS", default=10, cast=float)
+# /readyz runs its DB check at most this often; probes in between get the cached result.
+READINESS_CACHE_SECONDS = config("READINESS_CACHE_SECONDS", default=2, cast=float)
+READINESS_TIMEOUT_SECONDS = config("READINESS_TIMEOUT_SECONDS", default=1, cast=float)
+# After SIGTERM, keep serving this long while /readyz fails, so the load balancer stops
+# routing here before the server stops accepting connections.
+SHUTDOWN_DRAIN_DELAY_SECONDS = config("SHUTDOWN_DRAIN_DELAY_SECONDS", default=5, cast=float)
+# Upper bound on waiting for in-flight requests before the engines are disposed.
+SHUTDOWN_TIMEOUT_SECONDS = config("SHUTDOWN_TIMEOUT_SECONDS", default=25, cast=float)
+
+PROBE_PATHS = frozenset({"/healthz", "/readyz"})
+
+
+async def warm_pool(engine: AsyncEngine, connections: int) -> int:
+    """Opens up to `connections` pooled connections at once and returns them to the pool; returns how many opened."""
+    connections = min(connections, engine.pool.size())
+    opened = 0
+
+    async def open_connections():
+        nonlocal opened
+        # Held together, otherwise the pool would hand the same connection back each time.
+        async with AsyncExitStack() as stack:
+            for _ in range(connections):
+                connection = await stack.enter_async_context(engine.connect())
+                await connection.execute(text("SELECT 1"))
+                opened += 1
+
+    try:
+        await asyncio.wait_for(open_connections(), DB_POOL_WARMUP_TIMEOUT_SECONDS)
+    except Exception:
+        # Not fatal: requests connect on demand, and /readyz reports the database as down.
+        logger.warning("Pool warmup opened %d of %d connections", opened, connections, exc_info=True)
+    return opened
+
+
+def warm_auth():
+    # Loads the argon2 backend and the JWT library's signing path without hashing a password.
+    get_pwd_context().handler().get_backend()
+    settings = get_settings()
+    backend = get_jwt_backend()
+    token = backend.encode({"sub": "warmup", "exp": int(time.time()) + 60}, settings.jwt_secret_key, settings.jwt_algorithm)
+    backend.decode(token, settings.jwt_secret_key, settings.jwt_algorithm)
+
+
+class Lifecycle:
+    """Serving state for one worker: in-flight requests and whether it is draining."""
+
+    def __init__(self):
+        self.in_flight = 0
+        self.draining = False
+        self.accepting = True
+        self.drain_started_at: Optional[float] = None
+        self._idle = asyncio.Event()
+        self._idle.set()
+        self._previous_handler = None
+
+    def begin_drain(self):
+        if not self.draining:
+            self.draining = True
+            self.drain_started_at = time.monotonic()
+            logger.info("Draining: readiness now fails, %d requests in flight", self.in_flight)
+
+    def stop_accepting(self):
+        self.begin_drain()
+        self.accepting = False
+
+    def request_started(self):
+        self.in_flight += 1
+        self._idle.clear()
+
+    def request_finished(self):
+        self.in_flight -= 1
+        if self.in_flight == 0:
+            self._idle.set()
+
+    async def wait_idle(self, timeout: float) -> bool:
+        try:
+            await asyncio.wait_for(self._idle.wait(), timeout)
+            return True
+        except asyncio.TimeoutError:
+            logger.warning("Shutdown timed out with %d requests still in flight", self.in_flight)
+            return False
+
+    def install_signal_handler(self, delay: float = SHUTDOWN_DRAIN_DELAY_SECONDS):
+        """Wraps the server's SIGTERM handler: drain first, then hand over after `delay` seconds.
+
+        The server (uvicorn installs its handlers before the lifespan starts) then
+        closes its listeners and finishes in-flight requests as usual.
+        """
+        if threading.current_thread() is not threading.main_thread():
+            return
+        loop = asyncio.get_running_loop()
+        previous = signal.getsignal(signal.SIGTERM)
+        if not callable(previous):
+            return
+        self._previous_handler = previous
+
+        def handler(signum, frame):
+            if self.draining:
+                # A second SIGTERM skips the rest of the delay.
+                previous(signum, frame)
+                return
+            loop.call_soon_threadsafe(self.begin_drain)
+            loop.call_soon_threadsafe(loop.call_later, delay, self._hand_over, previous, signum)
+
+        signal.signal(signal.SIGTERM, handler)
+
+    def _hand_over(self, previous, signum):
+        self.accepting = False
+        previous(signum, None)
+
+    def restore_signal_handler(self):
+        if self._previous_handler is not None and threading.current_thread() is threading.main_thread():
+            signal.signal(signal.SIGTERM, self._previous_handler)
+            self._previous_handler = None
+
+
+lifecycle = Lifecycle()
+
+
+class ReadinessProbe:
+    """Checks the primary database, caching the verdict so frequent probes cost no extra queries."""
+
+    def __init__(self, cache_seconds: float, timeout: float):
+        self.cache_seconds = cache_seconds
+        self.timeout = timeout
+        self._result: Optional[dict] = None
+        self._checked_at = 0.0
+        self._lock = asyncio.Lock()
+        self.checks = 0
+
+    async def check(self, engine: AsyncEngine) -> dict:
+        if lifecycle.draining:
+            return {"ready": False, "reason": "draining", "in_flight": lifecycle.in_flight}
+        if self._result is not None and time.monotonic() - self._checked_at < self.cache_seconds:
+            return self._result
+        async with self._lock:
+            # Probes that queued behind a running check share its result.
+            if self._result is None or time.monotonic() - self._checked_at >= self.cache_seconds:
+                self._result = await self._check(engine)
+                self._checked_at = time.monotonic()
+            return self._result
+
+    @staticmethod
+    async def _ping(engine: AsyncEngine):
+        async with engine.connect() as connection:
+            await connection.execute(text("SELECT 1"))
+
+    async def _check(self, engine: AsyncEngine) -> dict:
+        self.checks += 1
+        started = time.perf_counter()
+        try:
+            await asyncio.wait_for(self._ping(engine), self.timeout)
+        except Exception as e:
+            logger.warning("Readiness check failed: %s", e)
+            return {"ready": False, "reason": f"database: {type(e).__name__}", "pool": pool_stats(engine)}
+        return {"ready": True, "database_ms": round((time.perf_counter() - started) * 1000, 2), "pool": pool_stats(engine)}
+
+
+readiness_probe = ReadinessProbe(READINESS_CACHE_SECONDS, READINESS_TIMEOUT_SECONDS)
+
+
+class LifecycleMiddleware:
+    """Counts in-flight requests for shutdown, and steers clients away while draining."""
+
+    def __init__(self, app, state: Lifecycle = lifecycle):
+        self.app = app
+        self.state = state
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope["path"] in PROBE_PATHS:
+            await self.app(scope, receive, send)
+            return
+        state = self.state
+        if not state.accepting:
+            await send({
+                "type": "http.response.start",
+                "status": 503,
+                "headers": [(b"content-type", b"application/json"), (b"connection", b"close"), (b"retry-after", b"1")],
+            })
+            await send({"type": "http.response.body", "body": b'{"detail":"Server is shutting down"}'})
+            return
+
+        async def send_wrapper(message):
+            if message["type"] == "http.response.start" and state.draining:
+                # Keep-alive clients reconnect, and land on a worker that isn't going away.
+                message = {**message, "headers": [*message.get("headers", []), (b"connection", b"close")]}
+            await send(message)
+
+        state.request_started()
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            state.request_finished()
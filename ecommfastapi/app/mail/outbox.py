@@ -0,0 +1,199 @@
+from datetime import datetime, timedelta, timezone
+from typing import Optional
+from decouple import config
+from sqlalchemy import select, update, delete, func
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker
+from app.db.config import async_session
+from app.mail.models import EmailOutbox
+from app.mail.senders import build_message, create_sender
+from app.metrics import Histogram
+import asyncio
+import logging
+import random
+import time
+
+logger = logging.getLogger(__name__)
+
+# 0 disables the in-process worker (e.g. when a separate process drains the outbox).
+EMAIL_OUTBOX_POLL_SECONDS = config("EMAIL_OUTBOX_POLL_SECONDS", default=1.0, cast=float)
+EMAIL_OUTBOX_BATCH_SIZE = config("EMAIL_OUTBOX_BATCH_SIZE", default=50, cast=int)
+EMAIL_OUTBOX_CONCURRENCY = config("EMAIL_OUTBOX_CONCURRENCY", default=5, cast=int)
+EMAIL_OUTBOX_MAX_ATTEMPTS = config("EMAIL_OUTBOX_MAX_ATTEMPTS", default=8, cast=int)
+EMAIL_OUTBOX_BACKOFF_BASE_SECONDS = config("EMAIL_OUTBOX_BACKOFF_BASE_SECONDS", default=5, cast=float)
+EMAIL_OUTBOX_BACKOFF_MAX_SECONDS = config("EMAIL_OUTBOX_BACKOFF_MAX_SECONDS", default=3600, cast=float)
+# A claimed row becomes due again after this long, so a crashed worker's batch is retried.
+EMAIL_OUTBOX_LEASE_SECONDS = config("EMAIL_OUTBOX_LEASE_SECONDS", default=120, cast=int)
+
+# Enqueue-to-delivered time includes retries, so it needs wider buckets than request latency.
+DELIVERY_LATENCY_BUCKETS_MS = (100, 250, 500, 1000, 2500, 5000, 10000, 30000, 60000, 300000, 900000, 3600000)
+
+
+def enqueue_email(session: AsyncSession, to_address: str, subject: str, body: str) -> EmailOutbox:
+    # Added to the caller's transaction: the email exists only if the request's writes commit.
+    message = EmailOutbox(to_address=to_address, subject=subject, body=body)
+    session.add(message)
+    return message
+
+
+def backoff_delay(attempts: int, base: float = EMAIL_OUTBOX_BACKOFF_BASE_SECONDS, cap: float = EMAIL_OUTBOX_BACKOFF_MAX_SECONDS) -> float:
+    # Exponential with full jitter, so a relay outage doesn't produce synchronized retry waves.
+    return random.uniform(0, min(cap, base * 2 ** (attempts - 1)))
+
+
+class OutboxWorker:
+    """Drains the email outbox in batches, sending with bounded concurrency and retrying with backoff."""
+
+    def __init__(self, sessionmaker: async_sessionmaker, sender, batch_size: int, concurrency: int, max_attempts: int, lease_seconds: int,
+                 backoff_base: float = EMAIL_OUTBOX_BACKOFF_BASE_SECONDS, backoff_max: float = EMAIL_OUTBOX_BACKOFF_MAX_SECONDS):
+        self.sessionmaker = sessionmaker
+        self.sender = sender
+        self.batch_size = batch_size
+        self.concurrency = concurrency
+        self.max_attempts = max_attempts
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.lease = timedelta(seconds=lease_seconds)
+        self._task: Optional[asyncio.Task] = None
+        self._wakeup = asyncio.Event()
+        self.sent = 0
+        self.failed_attempts = 0
+        self.dead = 0
+        self.send_latency = Histogram()
+        self.delivery_latency = Histogram(DELIVERY_LATENCY_BUCKETS_MS)
+
+    def notify(self):
+        # Called after a commit that enqueued mail, so it goes out without waiting for the next poll.
+        self._wakeup.set()
+
+    async def _claim(self) -> list[EmailOutbox]:
+        now = datetime.now(timezone.utc)
+        async with self.sessionmaker() as session:
+            # SKIP LOCKED lets several workers claim disjoint batches (ignored on SQLite).
+            rows = (await session.scalars(
+                select(EmailOutbox)
+                .where(EmailOutbox.status == "pending", EmailOutbox.next_attempt_at <= now)
+                .order_by(EmailOutbox.next_attempt_at)
+                .limit(self.batch_size)
+                .with_for_update(skip_locked=True)
+            )).all()
+            if rows:
+                await session.execute(
+                    update(EmailOutbox)
+                    .where(EmailOutbox.id.in_([row.id for row in rows]))
+                    .values(next_attempt_at=now + self.lease, attempts=EmailOutbox.attempts + 1)
+                )
+                await session.commit()
+            for row in rows:
+                row.attempts += 1
+            return rows
+
+    async def _send(self, row: EmailOutbox, semaphore: asyncio.Semaphore) -> Optional[str]:
+        async with semaphore:
+            started = time.perf_counter()
+            try:
+                await self.sender.send(build_message(row.to_address, row.subject, row.body))
+            except Exception as e:
+                return f"{type(e).__name__}: {e}"[:1000]
+            finally:
+                self.send_latency.observe((time.perf_counter() - started) * 1000)
+        return None
+
+    async def process_batch(self) -> int:
+        rows = await self._claim()
+        if not rows:
+            return 0
+        semaphore = asyncio.Semaphore(self.concurrency)
+        errors = await asyncio.gather(*(self._send(row, semaphore) for row in rows))
+        now = datetime.now(timezone.utc)
+        sent_ids = []
+        async with self.sessionmaker() as session:
+            for row, error in zip(rows, errors):
+                if error is None:
+                    sent_ids.append(row.id)
+                    created_at = row.created_at if row.created_at.tzinfo else row.created_at.replace(tzinfo=timezone.utc)
+                    self.delivery_latency.observe((now - created_at).total_seconds() * 1000)
+                    continue
+                self.failed_attempts += 1
+                if row.attempts >= self.max_attempts:
+                    self.dead += 1
+                    logger.error("Giving up on email %d to %s after %d attempts: %s", row.id, row.to_address, row.attempts, error)
+                    values = {"status": "failed", "last_error": error}
+                else:
+                    values = {"next_attempt_at": now + timedelta(seconds=backoff_delay(row.attempts, self.backoff_base, self.backoff_max)), "last_error": error}
+                await session.execute(update(EmailOutbox).where(EmailOutbox.id == row.id).values(**values))
+            # Delivered mail has nothing left to do; failed rows stay for inspection.
+            if sent_ids:
+                await session.execute(delete(EmailOutbox).where(EmailOutbox.id.in_(sent_ids)))
+            await session.commit()
+        self.sent += len(sent_ids)
+        return len(rows)
+
+    async def drain(self) -> int:
+        processed = 0
+        while True:
+            count = await self.process_batch()
+            processed += count
+            if count < self.batch_size:
+                return processed
+
+    async def _run_forever(self, poll_seconds: float):
+        while True:
+            self._wakeup.clear()
+            try:
+                await self.drain()
+            except Exception:
+                logger.exception("Email outbox batch failed")
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), poll_seconds)
+            except asyncio.TimeoutError:
+                pass
+
+    def start(self, poll_seconds: float = EMAIL_OUTBOX_POLL_SECONDS):
+        if poll_seconds > 0 and self._task is None:
+            self._task = asyncio.create_task(self._run_forever(poll_seconds))
+
+    async def stop(self):
+        # A batch interrupted mid-send is retried once its lease runs out (at-least-once delivery).
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    def stats(self) -> dict:
+        return {
+            "sent": self.sent,
+            "failed_attempts": self.failed_attempts,
+            "dead": self.dead,
+            "send_latency_ms": self.send_latency.snapshot(),
+            "delivery_latency_ms": self.delivery_latency.snapshot(),
+        }
+
+
+async def outbox_depth(session: AsyncSession) -> dict:
+    # Both counts read the (status, next_attempt_at) index; the table only holds undelivered mail.
+    counts = dict((await session.execute(
+        select(EmailOutbox.status, func.count()).group_by(EmailOutbox.status)
+    )).all())
+    oldest = (await session.execute(
+        select(func.min(EmailOutbox.created_at)).where(EmailOutbox.status == "pending")
+    )).scalar_one_or_none()
+    if oldest is not None and oldest.tzinfo is None:
+        oldest = oldest.replace(tzinfo=timezone.utc)
+    return {
+        "pending": counts.get("pending", 0),
+        "failed": counts.get("failed", 0),
+        "oldest_pending_age_seconds": round((datetime.now(timezone.utc) - oldest).total_seconds(), 1) if oldest else 0.0,
+    }
+
+
+outbox_worker = OutboxWorker(
+    async_session,
+    create_sender(EMAIL_OUTBOX_CONCURRENCY),
+    EMAIL_OUTBOX_BATCH_SIZE,
+    EMAIL_OUTBOX_CONCURRENCY,
+    EMAIL_OUTBOX_MAX_ATTEMPTS,
+    EMAIL_OUTBOX_LEASE_SECONDS,
+)
@@ -0,0 +1,19 @@
+from fastapi import APIRouter, Depends
+from app.account.dep import require_admin
+from app.account.models import User
+from app.account.utils import success_response
+from app.db.config import SessionDep
+from app.mail.outbox import outbox_worker, outbox_depth
+
+router = APIRouter()
+
+@router.get("/outbox")
+async def email_outbox_stats(session: SessionDep, admin_user: User = Depends(require_admin)):
+    return success_response(
+        message="Email outbox stats",
+        data={
+            "queue": await outbox_depth(session),
+            "worker": outbox_worker.stats(),
+        },
+        status_code=200
+    )
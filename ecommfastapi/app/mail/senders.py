@@ -0,0 +1,62 @@
+from concurrent.futures import ThreadPoolExecutor
+from email.message import EmailMessage
+from decouple import config
+import asyncio
+
+# "console" prints messages instead of sending them (local development); "smtp" delivers them.
+EMAIL_BACKEND = config("EMAIL_BACKEND", default="console")
+EMAIL_FROM = config("EMAIL_FROM", default="no-reply@localhost")
+SMTP_HOST = config("SMTP_HOST", default="localhost")
+SMTP_PORT = config("SMTP_PORT", default=25, cast=int)
+SMTP_USERNAME = config("SMTP_USERNAME", default="")
+SMTP_PASSWORD = config("SMTP_PASSWORD", default="")
+SMTP_STARTTLS = config("SMTP_STARTTLS", default=False, cast=bool)
+SMTP_TIMEOUT_SECONDS = config("SMTP_TIMEOUT_SECONDS", default=10, cast=float)
+
+
+def build_message(to_address: str, subject: str, body: str) -> EmailMessage:
+    message = EmailMessage()
+    message["From"] = EMAIL_FROM
+    message["To"] = to_address
+    message["Subject"] = subject
+    message.set_content(body)
+    return message
+
+
+class ConsoleSender:
+    async def send(self, message: EmailMessage):
+        # Straight to stdout: `fastapi dev` leaves logging at WARNING, which would hide the links.
+        print(f"Email to {message['To']}: {message['Subject']}\n{message.get_content()}", flush=True)
+
+
+class SMTPSender:
+    """Delivers through an SMTP relay; smtplib is blocking, so each send runs on a worker thread."""
+
+    def __init__(self, host: str, port: int, username: str = "", password: str = "", starttls: bool = False, timeout: float = 10, max_workers: int = 5):
+        self.host = host
+        self.port = port
+        self.username = username
+        self.password = password
+        self.starttls = starttls
+        self.timeout = timeout
+        # Its own pool, sized to the outbox concurrency: the default executor is shared and
+        # may have fewer threads than sends in flight.
+        self.executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="smtp")
+
+    def _send_sync(self, message: EmailMessage):
+        import smtplib
+        with smtplib.SMTP(self.host, self.port, timeout=self.timeout) as smtp:
+            if self.starttls:
+                smtp.starttls()
+            if self.username:
+                smtp.login(self.username, self.password)
+            smtp.send_message(message)
+
+    async def send(self, message: EmailMessage):
+        await asyncio.get_running_loop().run_in_executor(self.executor, self._send_sync, message)
+
+
+def create_sender(max_workers: int):
+    if EMAIL_BACKEND == "smtp":
+        return SMTPSender(SMTP_HOST, SMTP_PORT, SMTP_USERNAME, SMTP_PASSWORD, SMTP_STARTTLS, SMTP_TIMEOUT_SECONDS, max_workers)
+    return ConsoleSender()
@@ -1,12 +1,85 @@
+from contextlib import asynccontextmanager
 from fastapi import FastAPI
+from fastapi.responses import PlainTextResponse
 from app.account.routers import router as account_router
 from app.product.routers.category import router as category_router
+from app.product.routers.product import router as product_router
+from app.product.routers.reservation import router as reservation_router
+from app.db.routers import router as db_router
+from app.mail.routers import router as mail_router
+from app.db.config import get_engine
+from app.db.replicas import ReadYourWritesMiddleware, get_replica_router
+from app.compression import CompressionMiddleware, compression_metrics
+from app.instrumentation import RequestMetricsMiddleware, request_metrics
+from app.lifecycle import DB_POOL_WARMUP_CONNECTIONS, SHUTDOWN_TIMEOUT_SECONDS, LifecycleMiddleware, lifecycle, readiness_probe, warm_auth, warm_pool
+from app.responses import FastJSONResponse
+from app.account.utils import success_response, error_response
+from app.account.tasks import refresh_token_purger
+from app.mail.outbox import outbox_worker
+from app.product.search import get_search_backend
+from app.product.inventory import hot_stock, reservation_sweeper
 
-app = FastAPI(title="FastAPI E-commerce Backend")
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Engines, password context and JWT backend are built lazily; doing it here keeps
+    # that cost out of import time and out of the first requests after a deploy.
+    engine = get_engine()
+    replica_router = get_replica_router()
+    warm_auth()
+    await warm_pool(engine, DB_POOL_WARMUP_CONNECTIONS)
+    lifecycle.install_signal_handler()
+    refresh_token_purger.start()
+    outbox_worker.start()
+    get_search_backend().start()
+    reservation_sweeper.start()
+    hot_stock.start()
+    yield
+    lifecycle.stop_accepting()
+    await lifecycle.wait_idle(SHUTDOWN_TIMEOUT_SECONDS)
+    # Hands leased stock back to the product rows before the connections go away.
+    await hot_stock.stop()
+    await reservation_sweeper.stop()
+    await get_search_backend().stop()
+    await outbox_worker.stop()
+    await refresh_token_purger.stop()
+    lifecycle.restore_signal_handler()
+    # Closes pooled connections cleanly instead of leaving the server to drop them.
+    await replica_router.dispose()
+    await engine.dispose()
+
+app = FastAPI(title="FastAPI E-commerce Backend", default_response_class=FastJSONResponse, lifespan=lifespan)
+app.add_middleware(ReadYourWritesMiddleware)
+app.add_middleware(LifecycleMiddleware)
+# Inside the metrics middleware, so compression time shows up in route latency.
+app.add_middleware(CompressionMiddleware)
+# Outermost, so its timings cover the other middleware too.
+app.add_middleware(RequestMetricsMiddleware)
 
 @app.get("/")
 async def root():
     return {"message": "Welcome to the FastAPI E-commerce Backend!"}
 
+@app.get("/healthz", include_in_schema=False)
+async def healthz():
+    # Liveness: the process serves requests. Never touches the database, so a DB outage
+    # fails readiness instead of getting every worker restarted.
+    return {"status": "ok"}
+
+@app.get("/readyz", include_in_schema=False)
+async def readyz():
+    result = await readiness_probe.check(get_engine())
+    if not result["ready"]:
+        return error_response(message="Not ready", status_code=503, errors=result)
+    return success_response(message="Ready", data=result, status_code=200)
+
+@app.get("/metrics", include_in_schema=False)
+async def metrics():
+    # Prometheus text exposition; per worker process, so scrape each worker (or aggregate upstream).
+    return PlainTextResponse(request_metrics.prometheus() + compression_metrics.prometheus(), media_type="text/plain; version=0.0.4")
+
 app.include_router(account_router, prefix="/app/account", tags=["Account"])
-app.include_router(category_router, prefix="/app/product", tags=["Categories"])
\ No newline at end of file
+app.include_router(category_router, prefix="/app/product", tags=["Categories"])
+app.include_router(product_router, prefix="/app/product", tags=["Products"])
+app.include_router(reservation_router, prefix="/app/product", tags=["Reservations"])
+app.include_router(db_router, prefix="/internal/db", tags=["Internal"])
+app.include_router(mail_router, prefix="/internal/mail", tags=["Internal"])
\ No newline at end of file
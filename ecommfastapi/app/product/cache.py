@@ -0,0 +1,82 @@
+from dataclasses import dataclass
+from datetime import datetime, timezone
+from email.utils import format_datetime, parsedate_to_datetime
+from typing import Optional
+from decouple import config
+from fastapi import Request
+import hashlib
+import time
+
+CATEGORY_CACHE_TTL_SECONDS = config("CATEGORY_CACHE_TTL_SECONDS", default=60, cast=float)
+CATEGORY_CACHE_CONTROL = config("CATEGORY_CACHE_CONTROL", default="public, max-age=60")
+
+
+@dataclass(frozen=True)
+class CachedBody:
+    body: bytes
+    etag: str
+    last_modified: str
+    expires_at: float
+
+    def headers(self) -> dict:
+        return {
+            "ETag": self.etag,
+            "Last-Modified": self.last_modified,
+            "Cache-Control": CATEGORY_CACHE_CONTROL,
+        }
+
+    def matches(self, request: Request) -> bool:
+        # If-None-Match takes precedence over If-Modified-Since (RFC 9110 13.2.2).
+        if_none_match = request.headers.get("if-none-match")
+        if if_none_match is not None:
+            tags = [tag.strip() for tag in if_none_match.split(",")]
+            return "*" in tags or self.etag in tags
+        if_modified_since = request.headers.get("if-modified-since")
+        if if_modified_since:
+            try:
+                return parsedate_to_datetime(self.last_modified) <= parsedate_to_datetime(if_modified_since)
+            except (TypeError, ValueError):
+                return False
+        return False
+
+
+class ResponseBodyCache:
+    """Holds one serialized response body with its validators until invalidated or expired."""
+
+    def __init__(self, ttl_seconds: float):
+        self.ttl_seconds = ttl_seconds
+        self._entry: Optional[CachedBody] = None
+        # Bumped by invalidate(); a body built from rows read before then must not be stored.
+        self.generation = 0
+        self._last_modified = datetime.now(timezone.utc)
+
+    def get(self) -> Optional[CachedBody]:
+        entry = self._entry
+        if entry and entry.expires_at > time.monotonic():
+            return entry
+        return None
+
+    def set(self, body: bytes, generation: int) -> CachedBody:
+        """Caches body, read at `generation`; a stale one is returned to its caller but not stored."""
+        etag = f'"{hashlib.sha256(body).hexdigest()[:32]}"'
+        previous = self._entry
+        last_modified = self._last_modified
+        if previous is None or previous.etag != etag:
+            last_modified = datetime.now(timezone.utc).replace(microsecond=0)
+        entry = CachedBody(
+            body=body,
+            etag=etag,
+            last_modified=format_datetime(last_modified, usegmt=True),
+            expires_at=time.monotonic() + self.ttl_seconds,
+        )
+        if generation == self.generation:
+            self._entry = entry
+            self._last_modified = last_modified
+        return entry
+
+    def invalidate(self):
+        self.generation += 1
+        self._entry = None
+
+
+category_list_cache = ResponseBodyCache(CATEGORY_CACHE_TTL_SECONDS)
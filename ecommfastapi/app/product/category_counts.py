@@ -0,0 +1,154 @@
+"""Keeps Category.product_count in step with product_category, in the same transaction.
+
+Every ORM flush that links or unlinks products adds the net change per category
+with one `product_count = product_count + n` UPDATE each. Writes that bypass the
+ORM (Core inserts into product_category, raw SQL, imports) leave the counts
+behind; repair them with
+
+    python -m app.product.category_counts --check     # report drift
+    python -m app.product.category_counts --rebuild   # recount and fix
+"""
+from collections import defaultdict
+from typing import Optional
+from decouple import config
+from sqlalchemy import event, func, inspect, select, update
+from sqlalchemy.ext.asyncio import AsyncEngine
+from sqlalchemy.orm import Session
+from app.product.models import Category, Product, product_category_table
+import argparse
+import asyncio
+import time
+
+# Categories recounted per transaction by rebuild_counts; each batch holds its links' locks until it commits.
+CATEGORY_COUNT_REBUILD_BATCH_SIZE = config("CATEGORY_COUNT_REBUILD_BATCH_SIZE", default=200, cast=int)
+
+
+def _count_links():
+    # Correlated per category, so it reads only the (category_id, product_id) index range.
+    return (
+        select(func.count())
+        .select_from(product_category_table)
+        .where(product_category_table.c.category_id == Category.id)
+        .scalar_subquery()
+    )
+
+
+def _collection_changes(obj, attribute: str, deleted: bool):
+    """(other side, +1/-1) for each link this flush adds or removes through obj's collection."""
+    if deleted:
+        # Loads the collection if needed: the flush deletes these links too.
+        getattr(obj, attribute)
+    history = inspect(obj).attrs[attribute].history
+    if not deleted:
+        for other in history.added or ():
+            yield other, 1
+    for other in history.deleted or ():
+        yield other, -1
+    if deleted:
+        for other in history.unchanged or ():
+            yield other, -1
+
+
+@event.listens_for(Session, "before_flush")
+def _collect_count_changes(session: Session, flush_context, instances):
+    # Keyed by link, so a change seen from both sides (through back_populates) counts once.
+    links = session.info.setdefault("category_count_changes", {})
+    for state, deleted in ((session.new, False), (session.dirty, False), (session.deleted, True)):
+        for obj in state:
+            if isinstance(obj, Product):
+                for category, delta in _collection_changes(obj, "categories", deleted):
+                    links[(obj, category)] = delta
+            elif isinstance(obj, Category) and not deleted:
+                # A deleted category takes its count with it.
+                for product, delta in _collection_changes(obj, "products", deleted):
+                    links.setdefault((product, obj), delta)
+
+
+@event.listens_for(Session, "after_flush")
+def _apply_count_changes(session: Session, flush_context):
+    links = session.info.pop("category_count_changes", None)
+    if not links:
+        return
+    deltas: dict[int, int] = defaultdict(int)
+    for (product, category), delta in links.items():
+        # New categories have their ids by now.
+        if category.id is not None and category not in session.deleted:
+            deltas[category.id] += delta
+    connection = session.connection()
+    # In id order, so two flushes touching the same categories can't deadlock.
+    for category_id in sorted(deltas):
+        if deltas[category_id]:
+            connection.execute(
+                update(Category.__table__)
+                .where(Category.__table__.c.id == category_id)
+                .values(product_count=Category.__table__.c.product_count + deltas[category_id])
+            )
+
+
+@event.listens_for(Session, "after_rollback")
+def _discard_count_changes(session: Session):
+    session.info.pop("category_count_changes", None)
+
+
+async def count_drift(engine: AsyncEngine) -> list[tuple[int, int, int]]:
+    """(category id, stored count, actual count) for every category whose count is off."""
+    actual = _count_links().label("actual")
+    async with engine.connect() as connection:
+        rows = await connection.execute(
+            select(Category.id, Category.product_count, actual).where(Category.product_count != actual).order_by(Category.id)  # schema-lint: ignore (full check on purpose)
+        )
+        return [tuple(row) for row in rows]
+
+
+async def rebuild_counts(engine: AsyncEngine, batch_size: int = CATEGORY_COUNT_REBUILD_BATCH_SIZE) -> int:
+    """Recounts every category from product_category, a batch of categories per transaction; returns how many changed."""
+    changed = 0
+    last_id = 0
+    while True:
+        async with engine.begin() as connection:
+            ids = (await connection.scalars(
+                select(Category.id).where(Category.id > last_id).order_by(Category.id).limit(batch_size)
+            )).all()
+            if not ids:
+                break
+            result = await connection.execute(
+                update(Category.__table__)
+                .where(Category.__table__.c.id.in_(ids), Category.__table__.c.product_count != _count_links())
+                .values(product_count=_count_links())
+            )
+            changed += result.rowcount
+        last_id = ids[-1]
+    return changed
+
+
+async def _main(args):
+    from app.db.config import create_engine_from_settings
+    engine = create_engine_from_settings(args.url)
+    try:
+        started = time.perf_counter()
+        if args.rebuild:
+            changed = await rebuild_counts(engine, args.batch_size)
+            print(f"rebuilt category product counts: {changed} corrected in {time.perf_counter() - started:.1f}s")
+            return 0
+        drift = await count_drift(engine)
+        for category_id, stored, actual in drift[:args.show]:
+            print(f"category {category_id}: stored {stored}, actual {actual}")
+        print(f"{len(drift)} categories with a wrong product count ({time.perf_counter() - started:.1f}s)")
+        return 1 if drift else 0
+    finally:
+        await engine.dispose()
+
+
+def main(argv: Optional[list[str]] = None):
+    parser = argparse.ArgumentParser(description="Check or repair Category.product_count.")
+    mode = parser.add_mutually_exclusive_group(required=True)
+    mode.add_argument("--check", action="store_true", help="report categories whose count has drifted; exit 1 if any")
+    mode.add_argument("--rebuild", action="store_true", help="recount every category")
+    parser.add_argument("--batch-size", type=int, default=CATEGORY_COUNT_REBUILD_BATCH_SIZE)
+    parser.add_argument("--show", type=int, default=20, help="drifted categories to list with --check")
+    parser.add_argument("--url", help="database to use; defaults to the app's")
+    raise SystemExit(asyncio.run(_main(parser.parse_args(argv))))
+
+
+if __name__ == "__main__":
+    main()
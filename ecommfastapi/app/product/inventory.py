@@ -0,0 +1,432 @@
+from collections import defaultdict
+from datetime import datetime, timedelta, timezone
+from typing import Iterable, Optional
+from decouple import Csv, config
+from fastapi import HTTPException, status
+from sqlalchemy import select, update
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker
+from app.db.config import async_session
+from app.product.models import Product, StockReservation
+import asyncio
+import itertools
+import logging
+import random
+import time
+
+logger = logging.getLogger(__name__)
+
+INVENTORY_RESERVATION_TTL_SECONDS = config("INVENTORY_RESERVATION_TTL_SECONDS", default=600, cast=int)
+INVENTORY_MAX_RESERVATION_QUANTITY = config("INVENTORY_MAX_RESERVATION_QUANTITY", default=100, cast=int)
+# 0 disables the in-process sweeper (e.g. when a separate process runs it).
+INVENTORY_SWEEP_INTERVAL_SECONDS = config("INVENTORY_SWEEP_INTERVAL_SECONDS", default=15, cast=float)
+INVENTORY_SWEEP_BATCH_SIZE = config("INVENTORY_SWEEP_BATCH_SIZE", default=500, cast=int)
+# Products reserved through the in-memory counter, e.g. for a flash sale: comma-separated ids.
+INVENTORY_HOT_PRODUCT_IDS = config("INVENTORY_HOT_PRODUCT_IDS", default="", cast=Csv(int))
+# Leases each worker holds per hot product; reservations spread their row locks across them.
+INVENTORY_HOT_SHARDS = config("INVENTORY_HOT_SHARDS", default=4, cast=int)
+# Units moved from the product row per lease: the product row is locked once per this many.
+INVENTORY_HOT_LEASE_SIZE = config("INVENTORY_HOT_LEASE_SIZE", default=50, cast=int)
+INVENTORY_HOT_LEASE_SECONDS = config("INVENTORY_HOT_LEASE_SECONDS", default=300, cast=int)
+# Leased stock nobody reserved for this long goes back, so other workers can sell it.
+INVENTORY_HOT_IDLE_SECONDS = config("INVENTORY_HOT_IDLE_SECONDS", default=10, cast=float)
+INVENTORY_HOT_FLUSH_INTERVAL_SECONDS = config("INVENTORY_HOT_FLUSH_INTERVAL_SECONDS", default=2, cast=float)
+
+ACTIVE = "active"
+CONFIRMED = "confirmed"
+RELEASED = "released"
+EXPIRED = "expired"
+
+
+def _now() -> datetime:
+    return datetime.now(timezone.utc)
+
+
+async def take_stock(session: AsyncSession, product_id: int, quantity: int) -> bool:
+    # One conditional UPDATE: it can't oversell, and the row lock lasts only until the caller commits.
+    result = await session.execute(
+        update(Product)
+        .where(Product.id == product_id, Product.stock_quantity >= quantity)
+        .values(stock_quantity=Product.stock_quantity - quantity)
+    )
+    return result.rowcount == 1
+
+
+async def return_stock(session: AsyncSession, quantities: dict[int, int]):
+    # In product id order, so two transactions returning stock can't deadlock on each other.
+    for product_id in sorted(quantities):
+        await session.execute(
+            update(Product).where(Product.id == product_id).values(stock_quantity=Product.stock_quantity + quantities[product_id])
+        )
+
+
+async def _not_reservable(session: AsyncSession, product_id: int) -> HTTPException:
+    if await session.scalar(select(Product.id).where(Product.id == product_id)) is None:
+        return HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Product not found")
+    return HTTPException(status_code=status.HTTP_409_CONFLICT, detail="Not enough stock")
+
+
+async def _not_active(session: AsyncSession, reservation_id: int, user_id: int) -> HTTPException:
+    row = (await session.execute(
+        select(StockReservation.status, StockReservation.expires_at)
+        .where(StockReservation.id == reservation_id, StockReservation.user_id == user_id)
+    )).first()
+    if row is None:
+        return HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Reservation not found")
+    return HTTPException(status_code=status.HTTP_409_CONFLICT, detail=f"Reservation is {row.status if row.status != ACTIVE else EXPIRED}")
+
+
+async def reserve_stock(session: AsyncSession, product_id: int, user_id: int, quantity: int,
+                        ttl: timedelta = timedelta(seconds=INVENTORY_RESERVATION_TTL_SECONDS)) -> StockReservation:
+    if hot_stock.handles(product_id):
+        reservation = await hot_stock.reserve(session, product_id, user_id, quantity, ttl)
+        if reservation is not None:
+            return reservation
+    if not await take_stock(session, product_id, quantity):
+        await session.rollback()
+        raise await _not_reservable(session, product_id)
+    reservation = StockReservation(product_id=product_id, user_id=user_id, quantity=quantity, expires_at=_now() + ttl)
+    session.add(reservation)
+    await session.commit()
+    return reservation
+
+
+async def confirm_reservation(session: AsyncSession, reservation_id: int, user_id: int):
+    # The stock was taken when reserving; confirming keeps it sold.
+    result = await session.execute(
+        update(StockReservation)
+        .where(
+            StockReservation.id == reservation_id,
+            StockReservation.user_id == user_id,
+            StockReservation.status == ACTIVE,
+            StockReservation.expires_at > _now(),
+        )
+        .values(status=CONFIRMED)
+    )
+    if result.rowcount != 1:
+        await session.rollback()
+        raise await _not_active(session, reservation_id, user_id)
+    await session.commit()
+
+
+async def release_reservation(session: AsyncSession, reservation_id: int, user_id: int):
+    reservation = await session.scalar(
+        select(StockReservation).where(StockReservation.id == reservation_id, StockReservation.user_id == user_id)
+    )
+    if reservation is None:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Reservation not found")
+    # Conditional on still being active, so a release racing the sweeper returns the stock once.
+    result = await session.execute(
+        update(StockReservation).where(StockReservation.id == reservation_id, StockReservation.status == ACTIVE).values(status=RELEASED)
+    )
+    if result.rowcount != 1:
+        await session.rollback()
+        raise await _not_active(session, reservation_id, user_id)
+    await return_stock(session, {reservation.product_id: reservation.quantity})
+    await session.commit()
+
+
+async def _held_quantities(session: AsyncSession, reservation_ids: Iterable[int]) -> dict[int, int]:
+    # Read after the status change, while this transaction holds the rows: a lease's
+    # quantity can still shrink until then.
+    quantities: dict[int, int] = defaultdict(int)
+    rows = await session.execute(
+        select(StockReservation.product_id, StockReservation.quantity).where(StockReservation.id.in_(list(reservation_ids)))
+    )
+    for product_id, quantity in rows:
+        quantities[product_id] += quantity
+    return quantities
+
+
+class ReservationSweeper:
+    """Expires reservations past their expires_at and returns their stock, a batch per transaction."""
+
+    def __init__(self, sessionmaker: async_sessionmaker, batch_size: int):
+        self.sessionmaker = sessionmaker
+        self.batch_size = batch_size
+        self._task: Optional[asyncio.Task] = None
+        self.runs = 0
+        self.expired = 0
+        self.units_returned = 0
+        self.last_run_at: Optional[datetime] = None
+        self.last_run_seconds = 0.0
+
+    async def _expire(self, session: AsyncSession, ids: list[int]) -> list[int]:
+        result = await session.execute(
+            update(StockReservation).where(StockReservation.id.in_(ids), StockReservation.status == ACTIVE).values(status=EXPIRED)
+        )
+        if result.rowcount == len(ids):
+            return ids
+        # Some were confirmed or released after the SELECT (only possible where it couldn't
+        # lock them, e.g. SQLite): redo the batch one by one to know which still held stock.
+        await session.rollback()
+        expired = []
+        for reservation_id in ids:
+            result = await session.execute(
+                update(StockReservation).where(StockReservation.id == reservation_id, StockReservation.status == ACTIVE).values(status=EXPIRED)
+            )
+            if result.rowcount == 1:
+                expired.append(reservation_id)
+        return expired
+
+    async def sweep_once(self) -> int:
+        started = time.perf_counter()
+        swept = 0
+        while True:
+            async with self.sessionmaker() as session:
+                # SKIP LOCKED lets several workers sweep at once without waiting on each other's batches.
+                ids = list((await session.scalars(
+                    select(StockReservation.id)
+                    .where(StockReservation.status == ACTIVE, StockReservation.expires_at <= _now())
+                    .order_by(StockReservation.expires_at)
+                    .limit(self.batch_size)
+                    .with_for_update(skip_locked=True)
+                )).all())
+                if not ids:
+                    break
+                expired = await self._expire(session, ids)
+                if expired:
+                    quantities = await _held_quantities(session, expired)
+                    await return_stock(session, quantities)
+                    self.units_returned += sum(quantities.values())
+                await session.commit()
+            swept += len(expired)
+            self.expired += len(expired)
+            if len(ids) < self.batch_size:
+                break
+        self.runs += 1
+        self.last_run_at = _now()
+        self.last_run_seconds = time.perf_counter() - started
+        return swept
+
+    async def _run_forever(self, interval: float):
+        # Jitter keeps several workers from sweeping in lockstep.
+        await asyncio.sleep(random.uniform(0, interval))
+        while True:
+            try:
+                swept = await self.sweep_once()
+                if swept:
+                    logger.info("Expired %d stock reservations in %.2fs", swept, self.last_run_seconds)
+            except Exception:
+                logger.exception("Stock reservation sweep failed")
+            await asyncio.sleep(interval)
+
+    def start(self, interval: float = INVENTORY_SWEEP_INTERVAL_SECONDS):
+        if interval > 0 and self._task is None:
+            self._task = asyncio.create_task(self._run_forever(interval))
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    def stats(self) -> dict:
+        return {
+            "runs": self.runs,
+            "expired": self.expired,
+            "units_returned": self.units_returned,
+            "last_run_at": self.last_run_at,
+            "last_run_seconds": round(self.last_run_seconds, 3),
+        }
+
+
+class _Lease:
+    __slots__ = ("id", "remaining", "expires_at", "last_used", "pending")
+
+    def __init__(self, lease_id: int, remaining: int, expires_at: float):
+        self.id = lease_id
+        self.remaining = remaining
+        self.expires_at = expires_at
+        self.last_used = time.monotonic()
+        # Reservations claimed from this lease but not yet committed; it isn't returned under them.
+        self.pending = 0
+
+
+class HotStockCounter:
+    """In-memory front for products under flash-sale load.
+
+    Each worker leases stock off the product row in batches, into a few lease rows
+    (reservations without a user), and reserves against those. The product row is
+    locked once per lease instead of once per reservation, and concurrent reservations
+    spread over the lease rows. The counts in memory only pick a lease; the conditional
+    UPDATE on the lease row decides. Stock a worker holds is not available to the
+    others until the lease idles out; if the worker dies, the sweeper returns it.
+    """
+
+    def __init__(self, sessionmaker: async_sessionmaker, product_ids: Iterable[int], shards: int, lease_size: int,
+                 lease_seconds: int, idle_seconds: float):
+        self.sessionmaker = sessionmaker
+        self.product_ids = frozenset(product_ids)
+        self.shards = shards
+        self.lease_size = lease_size
+        self.lease_seconds = lease_seconds
+        self.idle_seconds = idle_seconds
+        # Leases this close to expiring take no new reservations, so the sweeper never races a live one.
+        self.margin_seconds = lease_seconds / 10
+        self._leases: dict[int, list[_Lease]] = defaultdict(list)
+        self._refill_locks: dict[int, asyncio.Lock] = defaultdict(asyncio.Lock)
+        self._turn = itertools.count()
+        self._task: Optional[asyncio.Task] = None
+        self.reservations = 0
+        self.leases_taken = 0
+        self.units_leased = 0
+        self.units_returned = 0
+        self.lost_leases = 0
+
+    def handles(self, product_id: int) -> bool:
+        return product_id in self.product_ids
+
+    def _claim(self, product_id: int, quantity: int) -> Optional[_Lease]:
+        leases = self._leases.get(product_id)
+        if not leases:
+            return None
+        now = time.monotonic()
+        start = next(self._turn)
+        for i in range(len(leases)):
+            lease = leases[(start + i) % len(leases)]
+            if lease.remaining >= quantity and lease.expires_at - now > self.margin_seconds:
+                # Claimed before any await, so two coroutines can't count on the same units.
+                lease.remaining -= quantity
+                lease.pending += 1
+                lease.last_used = now
+                return lease
+        return None
+
+    def _forget(self, product_id: int, lease: _Lease):
+        leases = self._leases.get(product_id, [])
+        if lease in leases:
+            leases.remove(lease)
+
+    async def _take_lease(self, product_id: int, quantity: int) -> Optional[_Lease]:
+        async with self.sessionmaker() as session:
+            wanted = max(self.lease_size, quantity)
+            while not await take_stock(session, product_id, wanted):
+                # Less than a full lease is left: take what there is, if it covers this reservation.
+                available = await session.scalar(select(Product.stock_quantity).where(Product.id == product_id))
+                if available is None or available < quantity:
+                    return None
+                wanted = available
+            lease = StockReservation(product_id=product_id, user_id=None, quantity=wanted, expires_at=_now() + timedelta(seconds=self.lease_seconds))
+            session.add(lease)
+            await session.commit()
+        self.leases_taken += 1
+        self.units_leased += wanted
+        return _Lease(lease.id, wanted, time.monotonic() + self.lease_seconds)
+
+    async def _refill(self, product_id: int, quantity: int) -> Optional[_Lease]:
+        async with self._refill_locks[product_id]:
+            # Another reservation may have refilled while this one waited.
+            claimed = self._claim(product_id, quantity)
+            if claimed is not None:
+                return claimed
+            # Make room among the leases no reservation is using, emptiest first.
+            idle = sorted((lease for lease in self._leases[product_id] if not lease.pending), key=lambda lease: lease.remaining)
+            for lease in idle[:max(0, len(self._leases[product_id]) - self.shards + 1)]:
+                await self._return_lease(product_id, lease)
+            lease = await self._take_lease(product_id, quantity)
+            if lease is None:
+                return None
+            lease.remaining -= quantity
+            lease.pending += 1
+            self._leases[product_id].append(lease)
+            return lease
+
+    async def reserve(self, session: AsyncSession, product_id: int, user_id: int, quantity: int, ttl: timedelta) -> Optional[StockReservation]:
+        """Reserves from this worker's leases; None when they can't cover it and no new lease could be taken."""
+        lease = self._claim(product_id, quantity) or await self._refill(product_id, quantity)
+        if lease is None:
+            return None
+        try:
+            # Moves the units from the lease to the reservation in one transaction.
+            result = await session.execute(
+                update(StockReservation)
+                .where(StockReservation.id == lease.id, StockReservation.status == ACTIVE, StockReservation.quantity >= quantity)
+                .values(quantity=StockReservation.quantity - quantity)
+            )
+            if result.rowcount != 1:
+                # Returned or expired under us; the caller falls back to the product row.
+                await session.rollback()
+                self._forget(product_id, lease)
+                self.lost_leases += 1
+                return None
+            reservation = StockReservation(product_id=product_id, user_id=user_id, quantity=quantity, expires_at=_now() + ttl)
+            session.add(reservation)
+            await session.commit()
+        except BaseException:
+            lease.remaining += quantity
+            raise
+        finally:
+            lease.pending -= 1
+        self.reservations += 1
+        return reservation
+
+    async def _return_lease(self, product_id: int, lease: _Lease):
+        self._forget(product_id, lease)
+        async with self.sessionmaker() as session:
+            result = await session.execute(
+                update(StockReservation).where(StockReservation.id == lease.id, StockReservation.status == ACTIVE).values(status=RELEASED)
+            )
+            if result.rowcount == 1:
+                quantities = await _held_quantities(session, [lease.id])
+                await return_stock(session, quantities)
+                self.units_returned += sum(quantities.values())
+            await session.commit()
+
+    async def flush(self, force: bool = False):
+        """Returns idle and nearly expired leases to their product rows; every lease with force."""
+        now = time.monotonic()
+        for product_id, leases in list(self._leases.items()):
+            for lease in list(leases):
+                if force or not lease.pending and (now - lease.last_used > self.idle_seconds or lease.expires_at - now <= self.margin_seconds):
+                    await self._return_lease(product_id, lease)
+
+    async def _run_forever(self, interval: float):
+        while True:
+            await asyncio.sleep(interval)
+            try:
+                await self.flush()
+            except Exception:
+                logger.exception("Returning leased stock failed")
+
+    def start(self, interval: float = INVENTORY_HOT_FLUSH_INTERVAL_SECONDS):
+        if self.product_ids and self._task is None:
+            self._task = asyncio.create_task(self._run_forever(interval))
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        try:
+            await self.flush(force=True)
+        except Exception:
+            # The sweeper returns them once the leases expire.
+            logger.exception("Returning leased stock at shutdown failed")
+
+    def stats(self) -> dict:
+        return {
+            "products": sorted(self.product_ids),
+            "reservations": self.reservations,
+            "leases_taken": self.leases_taken,
+            "units_leased": self.units_leased,
+            "units_returned": self.units_returned,
+            "lost_leases": self.lost_leases,
+            "units_held": {product_id: sum(lease.remaining for lease in leases) for product_id, leases in self._leases.items() if leases},
+        }
+
+
+reservation_sweeper = ReservationSweeper(async_session, INVENTORY_SWEEP_BATCH_SIZE)
+hot_stock = HotStockCounter(
+    async_session,
+    INVENTORY_HOT_PRODUCT_IDS,
+    INVENTORY_HOT_SHARDS,
+    INVENTORY_HOT_LEASE_SIZE,
+    INVENTORY_HOT_LEASE_SECONDS,
+    INVENTORY_HOT_IDLE_SECONDS,
+)
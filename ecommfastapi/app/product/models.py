@@ -1,27 +1,40 @@
 from sqlalchemy.orm import Mapped, mapped_column, relationship
-from sqlalchemy import String, Integer, Float, DateTime, ForeignKey, Table, Column, Text
+from sqlalchemy import String, Integer, Float, DateTime, ForeignKey, Table, Column, Text, Index, CheckConstraint
 from datetime import datetime, timezone
+from typing import Optional
 from app.db.base import Base
 
 product_category_table = Table(
     "product_category", 
     Base.metadata,
     Column("product_id", Integer, ForeignKey("products.id", ondelete="CASCADE"), primary_key=True),
-    Column("category_id", Integer, ForeignKey("categories.id", ondelete="CASCADE"), primary_key=True)
+    Column("category_id", Integer, ForeignKey("categories.id", ondelete="CASCADE"), primary_key=True),
+    # The primary key serves a product's categories; this serves a category's products.
+    Index("ix_product_category_category_id_product_id", "category_id", "product_id"),
 )
 
 class Product(Base):
     __tablename__ = "products"
+    __table_args__ = (
+        # Keyset pagination seeks on (created_at, id).
+        Index("ix_products_created_at_id", "created_at", "id"),
+        # The in-process search index catches up on other workers' writes through updated_at.
+        Index("ix_products_updated_at", "updated_at"),
+        # MySQL only; on other databases the in-process search backend stands in for it.
+        Index("ft_products_title_description", "title", "description", mysql_prefix="FULLTEXT").ddl_if(dialect="mysql"),
+        # Backstop for app.product.inventory, whose decrements are conditional on enough stock.
+        CheckConstraint("stock_quantity >= 0", name="ck_products_stock_quantity_nonnegative"),
+    )
 
     id: Mapped[int] = mapped_column(primary_key=True, autoincrement=True)
     title: Mapped[str] = mapped_column(String(255), nullable=False)
     description: Mapped[str] = mapped_column(Text, nullable=True)
-    slug: Mapped[str] = mapped_column(Text, nullable=True)
+    slug: Mapped[str] = mapped_column(String(255), unique=True, index=True, nullable=True)
     price: Mapped[float] = mapped_column(Float, nullable=False)
     stock_quantity: Mapped[int] = mapped_column(default=0)
     image_url: Mapped[str] = mapped_column(String(255), nullable=True)
     created_at: Mapped[datetime] = mapped_column(DateTime(timezone=True), default=lambda: datetime.now(timezone.utc))
-    updated_at: Mapped[datetime] = mapped_column(DateTime(timezone=True), default=lambda: datetime.now(timezone.utc))
+    updated_at: Mapped[datetime] = mapped_column(DateTime(timezone=True), default=lambda: datetime.now(timezone.utc), onupdate=lambda: datetime.now(timezone.utc))
 
     categories: Mapped[list["Category"]] = relationship("Category", secondary=product_category_table, back_populates="products")
 
@@ -30,7 +43,26 @@ class Category(Base):
 
     id: Mapped[int] = mapped_column(primary_key=True, autoincrement=True)
     name: Mapped[str] = mapped_column(String(255), nullable=False, unique=True)
+    # Maintained by app.product.category_counts, in the transaction that links or unlinks products.
+    product_count: Mapped[int] = mapped_column(Integer, default=0, server_default="0", nullable=False)
     created_at: Mapped[datetime] = mapped_column(DateTime(timezone=True), default=lambda: datetime.now(timezone.utc))
     updated_at: Mapped[datetime] = mapped_column(DateTime(timezone=True), default=lambda: datetime.now(timezone.utc))
 
     products: Mapped[list["Product"]] = relationship("Product", secondary=product_category_table, back_populates="categories")
+
+class StockReservation(Base):
+    __tablename__ = "stock_reservations"
+    __table_args__ = (
+        # The sweeper looks for status = 'active' ORDER BY expires_at.
+        Index("ix_stock_reservations_status_expires_at", "status", "expires_at"),
+    )
+
+    id: Mapped[int] = mapped_column(Integer, primary_key=True, autoincrement=True)
+    product_id: Mapped[int] = mapped_column(ForeignKey("products.id", ondelete="CASCADE"), index=True, nullable=False)
+    # NULL for stock a worker's hot-product counter has leased, rather than a customer's hold.
+    user_id: Mapped[Optional[int]] = mapped_column(ForeignKey("users.id", ondelete="CASCADE"), index=True, nullable=True)
+    quantity: Mapped[int] = mapped_column(Integer, nullable=False)
+    # "active" until it is confirmed (sold), released, or expired; only active ones hold stock.
+    status: Mapped[str] = mapped_column(String(16), default="active", nullable=False)
+    created_at: Mapped[datetime] = mapped_column(DateTime(timezone=True), default=lambda: datetime.now(timezone.utc))
+    expires_at: Mapped[datetime] = mapped_column(DateTime(timezone=True), nullable=False)
@@ -1,15 +1,51 @@
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, Depends, HTTPException, Request, Response, status
 from app.account.dep import require_admin
 from app.account.models import User
 from app.db.config import SessionDep
-from app.product.schemas import CategoryCreate, CategoryOut
-from app.product.services import create_category, get_all_category, delete_category
+from app.db.replicas import ReadSessionDep
+from app.product.schemas import CategoryCreate, CategoryOut, CategoryBulkDelete, CategoryListItem
+from app.product.services import create_category, get_all_category, delete_category, bulk_upsert_categories, bulk_delete_categories, check_category_bulk_size
 from app.account.utils import success_response
-from typing import List
-from pydantic import TypeAdapter
+from app.product.cache import category_list_cache
+from typing import AsyncIterator, List
+from pydantic import TypeAdapter, ValidationError
+import codecs
+import csv
 
 
 router = APIRouter()
+category_list_adapter = TypeAdapter(List[CategoryListItem])
+category_create_list_adapter = TypeAdapter(List[CategoryCreate])
+
+async def _names_from_json(categories: List[CategoryCreate]) -> AsyncIterator[str]:
+    for category in categories:
+        yield category.name
+
+async def _names_from_csv(request: Request) -> AsyncIterator[str]:
+    # Parses the upload as it arrives: one category name in the first column, optional "name" header.
+    decoder = codecs.getincrementaldecoder("utf-8-sig")()
+    pending = ""
+    first_row = True
+
+    def rows(text: str):
+        nonlocal first_row
+        for row in csv.reader(text.splitlines()):
+            if not row:
+                continue
+            if first_row and row[0].strip().lower() == "name":
+                first_row = False
+                continue
+            first_row = False
+            yield row[0]
+
+    async for chunk in request.stream():
+        pending += decoder.decode(chunk)
+        complete, _, pending = pending.rpartition("\n")
+        for name in rows(complete):
+            yield name
+    pending += decoder.decode(b"", final=True)
+    for name in rows(pending):
+        yield name
 
 @router.post("/category", response_model=CategoryOut)
 async def category_create(session: SessionDep, category: CategoryCreate, admin_user: User = Depends(require_admin)):
@@ -17,20 +53,55 @@ async def category_create(session: SessionDep, category: CategoryCreate, admin_u
     category_out = CategoryOut.model_validate(new_category)
     return success_response(
         message="Category created successfully",
-        data=category_out.model_dump(),
+        data=category_out,
         status_code=201
     )
 
-@router.get("/categories", response_model=List[CategoryOut])
-async def list_categories(session: SessionDep):
-    categories = await get_all_category(session)
-    # category_out = CategoryOut.model_validate(categories)
-    adapter = TypeAdapter(List[CategoryOut])
-    validated_data = adapter.validate_python(categories)
+@router.get("/categories", response_model=List[CategoryListItem])
+async def list_categories(session: ReadSessionDep, request: Request):
+    # Counts come from Category.product_count, not a COUNT over product_category. Link
+    # changes don't invalidate the cached list; counts catch up within its TTL.
+    cached = category_list_cache.get()
+    if cached is None:
+        # Taken before the query: a write that commits and invalidates meanwhile makes this read stale.
+        generation = category_list_cache.generation
+        categories = await get_all_category(session)
+        validated_data = category_list_adapter.validate_python(categories)
+        response = success_response(
+            message="Successfully get all category",
+            data=validated_data,
+            status_code=200
+        )
+        cached = category_list_cache.set(response.body, generation)
+    if cached.matches(request):
+        return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=cached.headers())
+    return Response(content=cached.body, media_type="application/json", headers=cached.headers())
+
+@router.post("/categories/bulk")
+async def category_bulk_import(session: SessionDep, request: Request, admin_user: User = Depends(require_admin)):
+    if request.headers.get("content-type", "").startswith("text/csv"):
+        names = _names_from_csv(request)
+    else:
+        try:
+            categories = category_create_list_adapter.validate_json(await request.body())
+        except ValidationError as e:
+            raise HTTPException(status_code=422, detail=e.errors(include_url=False))
+        # The whole list is already here, so an oversized one is turned away before any batch is written.
+        check_category_bulk_size(len(categories))
+        names = _names_from_json(categories)
+    results = await bulk_upsert_categories(session, names)
+    return success_response(
+        message="Categories imported",
+        data=results,
+        status_code=200
+    )
+
+@router.post("/categories/bulk-delete")
+async def category_bulk_delete(session: SessionDep, data: CategoryBulkDelete, admin_user: User = Depends(require_admin)):
+    results = await bulk_delete_categories(session, data.ids)
     return success_response(
-        message="Successfully get all category",
-        # data=category_out.model_dump(),
-        data=[item.model_dump() for item in validated_data],
+        message="Categories deleted",
+        data=results,
         status_code=200
     )
 
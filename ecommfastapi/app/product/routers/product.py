@@ -0,0 +1,62 @@
+from fastapi import APIRouter, HTTPException, Query, status
+from fastapi.responses import StreamingResponse
+from app.db.replicas import ReadSessionDep, pick_read_sessionmaker
+from app.product.schemas import ProductOut, ProductPage, ProductSearchResult, ProductWithCategoriesOut
+from app.product.search import SEARCH_MAX_RESULTS, get_search_backend, search_products
+from app.product.services import get_products_page, get_product, stream_products_ndjson, PRODUCT_CATEGORY_LOADING
+from app.account.utils import success_response
+from typing import Optional
+
+
+router = APIRouter()
+
+@router.get("/products", response_model=ProductPage)
+async def list_products(
+    session: ReadSessionDep,
+    limit: int = Query(20, ge=1, le=100),
+    cursor: Optional[str] = None,
+    category_id: Optional[int] = None,
+    include_categories: bool = False,
+):
+    loading = PRODUCT_CATEGORY_LOADING if include_categories else None
+    products, next_cursor = await get_products_page(session, limit, cursor, category_id, loading)
+    schema = ProductWithCategoriesOut if include_categories else ProductOut
+    return success_response(
+        message="Successfully get products",
+        data=ProductPage(items=[schema.model_validate(product) for product in products], next_cursor=next_cursor),
+        status_code=200
+    )
+
+@router.get("/products/export")
+async def export_products(category_id: Optional[int] = None):
+    sessionmaker = await pick_read_sessionmaker()
+    return StreamingResponse(
+        stream_products_ndjson(sessionmaker, category_id),
+        media_type="application/x-ndjson",
+        headers={"Content-Disposition": 'attachment; filename="products.ndjson"'}
+    )
+
+@router.get("/products/search", response_model=ProductSearchResult)
+async def search(
+    session: ReadSessionDep,
+    q: str = Query(..., min_length=1, max_length=200),
+    limit: int = Query(20, ge=1, le=100),
+    offset: int = Query(0, ge=0),
+):
+    if offset + limit > SEARCH_MAX_RESULTS:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=f"Only the first {SEARCH_MAX_RESULTS} results can be paged through")
+    products = await search_products(session, q, limit, offset)
+    return success_response(
+        message="Successfully searched products",
+        data=ProductSearchResult(items=[ProductOut.model_validate(product) for product in products], backend=get_search_backend().name),
+        status_code=200
+    )
+
+@router.get("/products/{product_id}", response_model=ProductWithCategoriesOut)
+async def product_detail(session: ReadSessionDep, product_id: int):
+    product = await get_product(session, product_id, PRODUCT_CATEGORY_LOADING)
+    return success_response(
+        message="Successfully get product",
+        data=ProductWithCategoriesOut.model_validate(product),
+        status_code=200
+    )
@@ -0,0 +1,49 @@
+from fastapi import APIRouter, Depends, HTTPException, status
+from app.account.dep import get_current_user, require_admin
+from app.account.models import User
+from app.account.utils import success_response
+from app.db.config import SessionDep
+from app.product.inventory import (
+    INVENTORY_MAX_RESERVATION_QUANTITY,
+    confirm_reservation,
+    hot_stock,
+    release_reservation,
+    reservation_sweeper,
+    reserve_stock,
+)
+from app.product.schemas import ReservationCreate, ReservationOut
+
+
+router = APIRouter()
+
+@router.post("/products/{product_id}/reservations", response_model=ReservationOut, status_code=status.HTTP_201_CREATED)
+async def reserve(session: SessionDep, product_id: int, data: ReservationCreate, user: User = Depends(get_current_user)):
+    if data.quantity > INVENTORY_MAX_RESERVATION_QUANTITY:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=f"At most {INVENTORY_MAX_RESERVATION_QUANTITY} units can be reserved at once")
+    reservation = await reserve_stock(session, product_id, user.id, data.quantity)
+    return success_response(
+        message="Stock reserved",
+        data=ReservationOut.model_validate(reservation),
+        status_code=201
+    )
+
+@router.post("/reservations/{reservation_id}/confirm")
+async def confirm(session: SessionDep, reservation_id: int, user: User = Depends(get_current_user)):
+    await confirm_reservation(session, reservation_id, user.id)
+    return success_response(message="Reservation confirmed", status_code=200)
+
+@router.delete("/reservations/{reservation_id}")
+async def release(session: SessionDep, reservation_id: int, user: User = Depends(get_current_user)):
+    await release_reservation(session, reservation_id, user.id)
+    return success_response(message="Reservation released", status_code=200)
+
+@router.get("/reservations/stats")
+async def reservation_stats(admin_user: User = Depends(require_admin)):
+    return success_response(
+        message="Stock reservation stats",
+        data={
+            "sweeper": reservation_sweeper.stats(),
+            "hot_stock": hot_stock.stats(),
+        },
+        status_code=200
+    )
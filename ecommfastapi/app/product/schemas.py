@@ -1,4 +1,6 @@
 from pydantic import BaseModel, Field
+from datetime import datetime
+from typing import List, Optional
 
 class CategoryBase(BaseModel):
     name: str
@@ -12,3 +14,54 @@ class CategoryOut(CategoryBase):
     model_config = {
         "from_attributes": True
     }
+
+class CategoryListItem(CategoryOut):
+    product_count: int
+
+class CategoryBulkResult(BaseModel):
+    name: Optional[str] = None
+    id: Optional[int] = None
+    status: str
+    detail: Optional[str] = None
+
+class CategoryBulkDelete(BaseModel):
+    ids: List[int] = Field(..., min_length=1)
+
+class ProductOut(BaseModel):
+    id: int
+    title: str
+    description: Optional[str] = None
+    slug: Optional[str] = None
+    price: float
+    stock_quantity: int
+    image_url: Optional[str] = None
+    created_at: datetime
+    updated_at: datetime
+    model_config = {
+        "from_attributes": True
+    }
+
+class ProductWithCategoriesOut(ProductOut):
+    categories: List[CategoryOut]
+
+class ProductPage(BaseModel):
+    items: List[ProductOut | ProductWithCategoriesOut]
+    next_cursor: Optional[str] = None
+
+class ProductSearchResult(BaseModel):
+    items: List[ProductOut]
+    backend: str
+
+class ReservationCreate(BaseModel):
+    quantity: int = Field(1, ge=1)
+
+class ReservationOut(BaseModel):
+    id: int
+    product_id: int
+    quantity: int
+    status: str
+    created_at: datetime
+    expires_at: datetime
+    model_config = {
+        "from_attributes": True
+    }
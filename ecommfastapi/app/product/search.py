@@ -0,0 +1,479 @@
+from array import array
+from bisect import bisect_left
+from collections import Counter, OrderedDict
+from datetime import datetime, timedelta, timezone
+from functools import lru_cache
+from operator import itemgetter
+from typing import Optional
+from decouple import config
+from fastapi import HTTPException, status
+from sqlalchemy import event, select
+from sqlalchemy.dialects.mysql import match
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker
+from sqlalchemy.orm import Session, object_session
+from app.product.models import Product
+import asyncio
+import heapq
+import logging
+import math
+import re
+import sys
+import time
+
+logger = logging.getLogger(__name__)
+
+# "fulltext" (MySQL FULLTEXT index), "memory" (in-process inverted index), or "auto":
+# fulltext on MySQL, memory elsewhere.
+SEARCH_BACKEND = config("SEARCH_BACKEND", default="auto")
+SEARCH_MAX_RESULTS = config("SEARCH_MAX_RESULTS", default=1000, cast=int)
+# The last query word also matches longer words starting with it (search-as-you-type).
+SEARCH_MIN_PREFIX_LENGTH = config("SEARCH_MIN_PREFIX_LENGTH", default=2, cast=int)
+SEARCH_PREFIX_EXPANSIONS = config("SEARCH_PREFIX_EXPANSIONS", default=20, cast=int)
+# Completions are added, most common first, until they would scan more postings than this.
+SEARCH_PREFIX_MAX_POSTINGS = config("SEARCH_PREFIX_MAX_POSTINGS", default=100_000, cast=int)
+# Words in more than this share of products only re-rank products matched by rarer words.
+SEARCH_COMMON_TERM_RATIO = config("SEARCH_COMMON_TERM_RATIO", default=0.05, cast=float)
+# A word is scored over at most this many of its newest postings, which bounds how long one
+# query holds the event loop; IDF still counts all of them.
+SEARCH_MAX_TERM_POSTINGS = config("SEARCH_MAX_TERM_POSTINGS", default=50_000, cast=int)
+# Ranked results kept per query until the index next changes; 0 disables.
+SEARCH_RESULT_CACHE_SIZE = config("SEARCH_RESULT_CACHE_SIZE", default=1024, cast=int)
+SEARCH_BUILD_BATCH_SIZE = config("SEARCH_BUILD_BATCH_SIZE", default=5000, cast=int)
+# Picks up products written by other workers or processes; 0 disables.
+SEARCH_SYNC_INTERVAL_SECONDS = config("SEARCH_SYNC_INTERVAL_SECONDS", default=30, cast=float)
+
+_TOKEN = re.compile(r"\w+")
+# Words too common to rank anything; mirrors the short lists full-text engines ship with.
+STOPWORDS = frozenset(
+    "a an and are as at be by for from has in is it its of on or that the this to was were will with".split()
+)
+TITLE_WEIGHT = 2
+
+
+def tokenize(text: Optional[str]) -> list[str]:
+    if not text:
+        return []
+    return [token for token in _TOKEN.findall(text.casefold()) if token not in STOPWORDS]
+
+
+class InvertedIndex:
+    """BM25-ranked inverted index over product title and description, updated in place.
+
+    Each document gets a slot; postings are parallel arrays of slots and term
+    frequencies (6 bytes per posting). Updating a product tombstones its old slot
+    and appends a new one, and compact() drops tombstoned postings later.
+    """
+
+    def __init__(self, k1: float = 1.2, b: float = 0.75):
+        self.k1 = k1
+        self.b = b
+        self._postings: dict[str, tuple[array, array]] = {}
+        self._product_ids = array("q")
+        self._lengths = array("I")
+        # Per-slot BM25 length normalization, k1 * (1 - b + b * length / average), for _norms_average.
+        self._norms = array("f")
+        self._norms_average = 0.0
+        self._alive = bytearray()
+        # Hash of each slot's text, so re-adding an unchanged product is a no-op.
+        self._hashes = array("q")
+        self._slots: dict[int, int] = {}
+        self._total_length = 0
+        self._sorted_terms: Optional[list[str]] = None
+        self._results: OrderedDict[tuple, array] = OrderedDict()
+
+    def __len__(self):
+        return len(self._slots)
+
+    @property
+    def dead(self) -> int:
+        return len(self._product_ids) - len(self._slots)
+
+    def add(self, product_id: int, title: Optional[str], description: Optional[str]):
+        text_hash = hash((title, description))
+        if product_id in self._slots:
+            if self._hashes[self._slots[product_id]] == text_hash:
+                return
+            self.remove(product_id)
+        self._results.clear()
+        counts = Counter(tokenize(description))
+        for token in tokenize(title):
+            counts[token] += TITLE_WEIGHT
+        slot = len(self._product_ids)
+        length = sum(counts.values())
+        self._product_ids.append(product_id)
+        self._lengths.append(length)
+        self._norms.append(self._norm(length))
+        self._alive.append(1)
+        self._hashes.append(text_hash)
+        self._slots[product_id] = slot
+        self._total_length += length
+        for term, frequency in counts.items():
+            postings = self._postings.get(term)
+            if postings is None:
+                postings = self._postings[term] = (array("I"), array("H"))
+                self._sorted_terms = None
+            postings[0].append(slot)
+            postings[1].append(min(frequency, 65535))
+
+    def _norm(self, length: int) -> float:
+        return self.k1 * (1 - self.b + self.b * length / (self._norms_average or length or 1))
+
+    def _refresh_norms(self):
+        # The average drifts as products come and go; recompute (O(documents)) once it moves by 5%.
+        average = self._total_length / len(self._slots)
+        if abs(average - self._norms_average) > 0.05 * average:
+            self._norms_average = average
+            self._norms = array("f", (self._norm(length) for length in self._lengths))
+
+    def prepare(self):
+        """Does now the upkeep the next query would otherwise pay for: length norms and the sorted terms."""
+        if self._slots:
+            self._refresh_norms()
+        if self._sorted_terms is None:
+            self._sorted_terms = sorted(self._postings)
+
+    def remove(self, product_id: int):
+        slot = self._slots.pop(product_id, None)
+        if slot is not None:
+            self._results.clear()
+            self._alive[slot] = 0
+            self._total_length -= self._lengths[slot]
+
+    def compact(self):
+        """Drops tombstoned postings and terms left without any; O(postings)."""
+        alive = self._alive
+        for term in list(self._postings):
+            slots, frequencies = self._postings[term]
+            keep = [i for i, slot in enumerate(slots) if alive[slot]]
+            if not keep:
+                del self._postings[term]
+            elif len(keep) < len(slots):
+                self._postings[term] = (array("I", (slots[i] for i in keep)), array("H", (frequencies[i] for i in keep)))
+        self._sorted_terms = None
+        self._results.clear()
+
+    def _expand_prefix(self, prefix: str) -> list[str]:
+        if self._sorted_terms is None:
+            # New terms are rare once the catalog is indexed, so this rarely re-sorts.
+            self._sorted_terms = sorted(self._postings)
+        terms = self._sorted_terms
+        completions = []
+        for i in range(bisect_left(terms, prefix), len(terms)):
+            if not terms[i].startswith(prefix):
+                break
+            completions.append(terms[i])
+        # The word as typed comes first, then the most common completions within the budget.
+        completions.sort(key=lambda term: (term != prefix, -len(self._postings[term][0])))
+        matches, postings = [], 0
+        for term in completions[:SEARCH_PREFIX_EXPANSIONS]:
+            postings += len(self._postings[term][0])
+            if matches and postings > SEARCH_PREFIX_MAX_POSTINGS:
+                break
+            matches.append(term)
+        return matches
+
+    def _document_frequency(self, terms: list[str]) -> int:
+        return sum(len(self._postings[term][0]) for term in terms if term in self._postings)
+
+    def _score(self, terms: list[str], scores: dict[int, float], documents: int):
+        """Adds BM25 scores for the best-scoring of `terms` (several for a prefix) in every document."""
+        alive, norms, k1 = self._alive, self._norms, self.k1
+        if len(terms) == 1:
+            term_scores = scores
+        else:
+            term_scores = {}
+        for term in terms:
+            postings = self._postings.get(term)
+            if postings is None:
+                continue
+            slots, frequencies = postings
+            weight = math.log(1 + (documents - len(slots) + 0.5) / (len(slots) + 0.5)) * (k1 + 1)
+            if len(slots) > SEARCH_MAX_TERM_POSTINGS:
+                # Postings are in slot order, and new or updated products take new slots.
+                slots, frequencies = slots[-SEARCH_MAX_TERM_POSTINGS:], frequencies[-SEARCH_MAX_TERM_POSTINGS:]
+            if term_scores is scores:
+                get = scores.get
+                for slot, frequency in zip(slots, frequencies):
+                    if alive[slot]:
+                        scores[slot] = get(slot, 0.0) + weight * frequency / (frequency + norms[slot])
+            else:
+                get = term_scores.get
+                for slot, frequency in zip(slots, frequencies):
+                    if alive[slot]:
+                        score = weight * frequency / (frequency + norms[slot])
+                        if score > get(slot, 0.0):
+                            term_scores[slot] = score
+        if term_scores is not scores:
+            for slot, score in term_scores.items():
+                scores[slot] = scores.get(slot, 0.0) + score
+
+    def _rescore(self, terms: list[str], scores: dict[int, float], documents: int):
+        """Adds scores for `terms` to documents already in `scores`, without adding documents."""
+        norms, k1 = self._norms, self.k1
+        best: dict[int, float] = {}
+        for term in terms:
+            postings = self._postings.get(term)
+            if postings is None:
+                continue
+            slots, frequencies = postings
+            weight = math.log(1 + (documents - len(slots) + 0.5) / (len(slots) + 0.5)) * (k1 + 1)
+            if len(scores) * 16 < len(slots):
+                # Few candidates: look each one up. Postings are appended in slot order, so each list is sorted.
+                matches = []
+                for slot in scores:
+                    i = bisect_left(slots, slot)
+                    if i < len(slots) and slots[i] == slot:
+                        matches.append((slot, frequencies[i]))
+            else:
+                matches = [(slot, frequency) for slot, frequency in zip(slots, frequencies) if slot in scores]
+            for slot, frequency in matches:
+                score = weight * frequency / (frequency + norms[slot])
+                if score > best.get(slot, 0.0):
+                    best[slot] = score
+        for slot, score in best.items():
+            scores[slot] += score
+
+    def search(self, query: str, limit: int, offset: int = 0) -> list[int]:
+        tokens = tokenize(query)
+        if not tokens or not self._slots:
+            return []
+        groups = [[token] for token in tokens]
+        last = tokens[-1]
+        if len(last) >= SEARCH_MIN_PREFIX_LENGTH and not query[-1:].isspace():
+            groups[-1] = self._expand_prefix(last) or [last]
+        key = tuple(tuple(group) for group in groups)
+        ranked = self._results.get(key)
+        if ranked is None:
+            ranked = self._rank(groups)
+            if SEARCH_RESULT_CACHE_SIZE:
+                self._results[key] = ranked
+                if len(self._results) > SEARCH_RESULT_CACHE_SIZE:
+                    self._results.popitem(last=False)
+        else:
+            self._results.move_to_end(key)
+        return [self._product_ids[slot] for slot in ranked[offset:offset + limit]]
+
+    def _rank(self, groups: list[list[str]]) -> array:
+        self._refresh_norms()
+        # Live products only; counting tombstoned slots would drift IDF between compactions.
+        documents = len(self._slots)
+
+        # Common-terms query: a word in most products adds little to the ranking but costs a
+        # pass over a huge postings list, so it only re-ranks what the rarer words matched.
+        cutoff = SEARCH_COMMON_TERM_RATIO * documents
+        rare = [group for group in groups if self._document_frequency(group) <= cutoff]
+        common = [group for group in groups if self._document_frequency(group) > cutoff]
+        if not rare:
+            # Every word is common: match on the rarest one and let the others re-rank.
+            common.sort(key=self._document_frequency)
+            rare, common = common[:1], common[1:]
+        scores: dict[int, float] = {}
+        for group in rare:
+            self._score(group, scores, documents)
+        if scores:
+            for group in common:
+                self._rescore(group, scores, documents)
+        # Ranked as deep as anyone may page, so every page of a query comes from one pass.
+        top = heapq.nlargest(SEARCH_MAX_RESULTS, scores.items(), key=itemgetter(1))
+        return array("I", (slot for slot, _ in top))
+
+    def memory_bytes(self) -> int:
+        """Approximate size of the index structures (arrays, dicts and term strings)."""
+        # The slot map's int keys and values are separate objects, 28 bytes each.
+        size = sys.getsizeof(self._postings) + sys.getsizeof(self._slots) + len(self._slots) * 56
+        size += sum(values.buffer_info()[1] * values.itemsize for values in (self._product_ids, self._lengths, self._norms, self._hashes))
+        size += len(self._alive)
+        for term, (slots, frequencies) in self._postings.items():
+            size += sys.getsizeof(term) + sys.getsizeof(slots) + sys.getsizeof(frequencies) + 64
+        return size
+
+    def stats(self) -> dict:
+        return {
+            "documents": len(self._slots),
+            "tombstones": self.dead,
+            "terms": len(self._postings),
+            "postings": sum(len(slots) for slots, _ in self._postings.values()),
+            "memory_bytes": self.memory_bytes(),
+        }
+
+
+class MemorySearchBackend:
+    """Serves search from an InvertedIndex built from the products table at startup.
+
+    Commits in this process update it through ORM events; a periodic pass over
+    recently updated rows picks up writes from other workers. Deletes made
+    elsewhere are dropped when their ids fail to load.
+    """
+
+    name = "memory"
+
+    def __init__(self, sessionmaker: async_sessionmaker, batch_size: int = SEARCH_BUILD_BATCH_SIZE, sync_interval: float = SEARCH_SYNC_INTERVAL_SECONDS):
+        self.sessionmaker = sessionmaker
+        self.batch_size = batch_size
+        self.sync_interval = sync_interval
+        self.index = InvertedIndex()
+        self.ready = False
+        self.build_seconds = 0.0
+        self.synced_until: Optional[datetime] = None
+        self._task: Optional[asyncio.Task] = None
+
+    async def build(self):
+        started = time.perf_counter()
+        synced_until = datetime.now(timezone.utc)
+        stmt = select(Product.id, Product.title, Product.description).order_by(Product.id)
+        async with self.sessionmaker() as session:
+            result = await session.stream(stmt.execution_options(yield_per=self.batch_size))
+            async for rows in result.partitions():
+                for product_id, title, description in rows:
+                    self.index.add(product_id, title, description)
+        self.index.prepare()
+        self.synced_until = synced_until
+        self.ready = True
+        self.build_seconds = time.perf_counter() - started
+        logger.info("Search index built: %d products in %.1fs", len(self.index), self.build_seconds)
+
+    async def sync(self):
+        # Overlapping by a second re-adds a few rows (harmless) rather than missing ones
+        # committed with a timestamp just before the last pass.
+        since = self.synced_until - timedelta(seconds=1)
+        synced_until = datetime.now(timezone.utc)
+        stmt = select(Product.id, Product.title, Product.description).where(Product.updated_at >= since)
+        async with self.sessionmaker() as session:
+            for product_id, title, description in await session.execute(stmt):
+                self.index.add(product_id, title, description)
+        self.synced_until = synced_until
+        if self.index.dead > max(10_000, len(self.index) // 4):
+            self.index.compact()
+        self.index.prepare()
+
+    async def _run(self):
+        try:
+            await self.build()
+        except Exception:
+            logger.exception("Search index build failed")
+            return
+        while self.sync_interval > 0:
+            await asyncio.sleep(self.sync_interval)
+            try:
+                await self.sync()
+            except Exception:
+                logger.exception("Search index sync failed")
+
+    def start(self):
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    async def search(self, session: AsyncSession, query: str, limit: int, offset: int) -> list[int]:
+        if not self.ready:
+            raise HTTPException(
+                status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+                detail="Search index is still building",
+                headers={"Retry-After": "5"}
+            )
+        return self.index.search(query, limit, offset)
+
+    def apply(self, changes: dict):
+        for product_id, fields in changes.items():
+            if fields is None:
+                self.index.remove(product_id)
+            else:
+                self.index.add(product_id, *fields)
+        self.index.prepare()
+
+    def stats(self) -> dict:
+        return {"backend": self.name, "ready": self.ready, "build_seconds": round(self.build_seconds, 2), **self.index.stats()}
+
+
+class FulltextSearchBackend:
+    """MySQL FULLTEXT over (title, description); InnoDB ranks with its own BM25 variant."""
+
+    name = "fulltext"
+
+    @staticmethod
+    def boolean_query(query: str) -> str:
+        # Tokenizing drops MySQL's boolean operators, so user input can't change the query's meaning.
+        tokens = tokenize(query)
+        if tokens and len(tokens[-1]) >= SEARCH_MIN_PREFIX_LENGTH and not query[-1:].isspace():
+            tokens[-1] += "*"
+        return " ".join(tokens)
+
+    async def search(self, session: AsyncSession, query: str, limit: int, offset: int) -> list[int]:
+        against = self.boolean_query(query)
+        if not against:
+            return []
+        score = match(Product.title, Product.description, against=against).in_boolean_mode()
+        stmt = select(Product.id).where(score > 0).order_by(score.desc(), Product.id).limit(limit).offset(offset)
+        return list((await session.scalars(stmt)).all())
+
+    def start(self):
+        pass
+
+    async def stop(self):
+        pass
+
+    def stats(self) -> dict:
+        return {"backend": self.name}
+
+
+@lru_cache(maxsize=None)
+def get_search_backend():
+    from app.db.config import async_session, get_engine
+    backend = SEARCH_BACKEND
+    if backend == "auto":
+        backend = "fulltext" if get_engine().dialect.name == "mysql" else "memory"
+    if backend == "fulltext":
+        return FulltextSearchBackend()
+    return MemorySearchBackend(async_session)
+
+
+async def search_products(session: AsyncSession, query: str, limit: int, offset: int = 0) -> list[Product]:
+    backend = get_search_backend()
+    product_ids = await backend.search(session, query, limit, offset)
+    if not product_ids:
+        return []
+    products = {product.id: product for product in await session.scalars(select(Product).where(Product.id.in_(product_ids)))}
+    if isinstance(backend, MemorySearchBackend):
+        for product_id in product_ids:
+            if product_id not in products:
+                backend.index.remove(product_id)
+    return [products[product_id] for product_id in product_ids if product_id in products]
+
+
+# Changes are collected per session and applied to the in-process index only once committed.
+def _record_change(session: Optional[Session], product_id: int, fields: Optional[tuple]):
+    if session is not None:
+        session.info.setdefault("search_changes", {})[product_id] = fields
+
+
+@event.listens_for(Product, "after_insert")
+@event.listens_for(Product, "after_update")
+def _product_saved(mapper, connection, target: Product):
+    _record_change(object_session(target), target.id, (target.title, target.description))
+
+
+@event.listens_for(Product, "after_delete")
+def _product_deleted(mapper, connection, target: Product):
+    _record_change(object_session(target), target.id, None)
+
+
+@event.listens_for(Session, "after_commit")
+def _apply_search_changes(session: Session):
+    changes = session.info.pop("search_changes", None)
+    if changes and SEARCH_BACKEND != "fulltext" and get_search_backend.cache_info().currsize:
+        backend = get_search_backend()
+        if isinstance(backend, MemorySearchBackend):
+            backend.apply(changes)
+
+
+@event.listens_for(Session, "after_rollback")
+def _discard_search_changes(session: Session):
+    session.info.pop("search_changes", None)
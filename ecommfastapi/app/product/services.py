@@ -1,14 +1,36 @@
-from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy import select
-from app.product.models import Product, Category
-from app.product.schemas import CategoryCreate, CategoryOut
-from typing import List
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker
+from sqlalchemy import select, or_, delete
+from sqlalchemy.dialects.mysql import insert as mysql_insert
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from sqlalchemy.orm import joinedload, selectinload
+from app.product.models import Product, Category, product_category_table
+from app.product.schemas import CategoryCreate, CategoryOut, ProductOut, CategoryBulkResult
+from typing import AsyncIterable, AsyncIterator, Callable, List, Literal, Optional
 from fastapi import HTTPException, status
+from datetime import datetime
+import base64
+import json
+import unicodedata
+from app.product.cache import category_list_cache
+from app.product import category_counts  # noqa: F401  (registers the hooks that keep Category.product_count current)
+from app.responses import dumps
+from decouple import config
+
+# How Product.categories is fetched for a page of products:
+#   "selectin" - one extra SELECT ... WHERE product_id IN (...) per page (chunked by SQLAlchemy)
+#   "joined"   - a single LEFT OUTER JOIN query for products and categories together
+CategoryLoading = Literal["selectin", "joined"]
+PRODUCT_CATEGORY_LOADING: CategoryLoading = config("PRODUCT_CATEGORY_LOADING", default="selectin")
+
+CATEGORY_BULK_BATCH_SIZE = config("CATEGORY_BULK_BATCH_SIZE", default=1000, cast=int)
+CATEGORY_BULK_MAX_ITEMS = config("CATEGORY_BULK_MAX_ITEMS", default=50_000, cast=int)
+CATEGORY_NAME_MAX_LENGTH = Category.__table__.c.name.type.length
 
 async def create_category(session: AsyncSession, category: CategoryCreate) -> CategoryOut:
     category = Category(name=category.name)
     session.add(category)
     await session.commit()
+    category_list_cache.invalidate()
     await session.refresh(category)
     return category
 
@@ -23,4 +45,155 @@ async def delete_category(session: AsyncSession, category_id: int):
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Category not found")
     await session.delete(category)
     await session.commit()
-    return True
\ No newline at end of file
+    category_list_cache.invalidate()
+    return True
+
+def _category_upsert_stmt(dialect_name: str):
+    # Existing names only get updated_at bumped, so a re-import is idempotent.
+    table = Category.__table__
+    if dialect_name == "mysql":
+        stmt = mysql_insert(table)
+        return stmt.on_duplicate_key_update(updated_at=stmt.inserted.updated_at)
+    if dialect_name == "sqlite":
+        stmt = sqlite_insert(table)
+        return stmt.on_conflict_do_update(index_elements=[table.c.name], set_={"updated_at": stmt.excluded.updated_at})
+    raise NotImplementedError(f"Bulk category upsert is not supported on {dialect_name}")
+
+def _fold_category_name(name: str) -> str:
+    # MySQL's default utf8mb4 collation ignores case and accents: "Café" and "cafe" are one key.
+    decomposed = unicodedata.normalize("NFKD", name)
+    return "".join(char for char in decomposed if not unicodedata.combining(char)).casefold()
+
+def _category_name_key(dialect_name: str) -> Callable[[str], str]:
+    """How the unique index on categories.name compares names; SQLite compares them exactly."""
+    if dialect_name == "mysql":
+        return _fold_category_name
+    return lambda name: name
+
+async def _upsert_category_batch(session: AsyncSession, batch: list[tuple[int, str]], results: list, key: Callable[[str], str]):
+    # Three statements per batch regardless of size: find existing, upsert, read back ids.
+    # Rows come back spelled as stored, so they are matched to the request by `key`.
+    names = [name for _, name in batch]
+    existing = {key(name) for name in (await session.scalars(select(Category.name).where(Category.name.in_(names)))).all()}
+    await session.execute(_category_upsert_stmt(session.bind.dialect.name), [{"name": name} for name in names])
+    ids = {key(name): category_id for name, category_id in await session.execute(select(Category.name, Category.id).where(Category.name.in_(names)))}
+    await session.commit()
+    for position, name in batch:
+        results[position] = CategoryBulkResult(name=name, id=ids.get(key(name)), status="updated" if key(name) in existing else "created")
+
+def check_category_bulk_size(count: int, saved: int = 0):
+    if count > CATEGORY_BULK_MAX_ITEMS:
+        detail = f"At most {CATEGORY_BULK_MAX_ITEMS} categories per request"
+        if saved:
+            detail += f"; the first {saved} were saved before the limit was reached"
+        raise HTTPException(status_code=status.HTTP_413_CONTENT_TOO_LARGE, detail=detail)
+
+async def bulk_upsert_categories(session: AsyncSession, names: AsyncIterable[str]) -> list[CategoryBulkResult]:
+    # Results come back in input order; valid names are filled in as their batch is written.
+    # Each batch commits on its own, so a stream that fails part way (the item cap on a
+    # CSV upload, a DB error) leaves the earlier batches saved.
+    results: list[Optional[CategoryBulkResult]] = []
+    batch: list[tuple[int, str]] = []
+    seen: set[str] = set()
+    key = _category_name_key(session.bind.dialect.name)
+    received = saved = 0
+    try:
+        async for raw_name in names:
+            received += 1
+            check_category_bulk_size(received, saved)
+            name = raw_name.strip()
+            if not name or len(name) > CATEGORY_NAME_MAX_LENGTH:
+                results.append(CategoryBulkResult(name=raw_name, status="invalid", detail=f"Name must be 1-{CATEGORY_NAME_MAX_LENGTH} characters"))
+                continue
+            if key(name) in seen:
+                results.append(CategoryBulkResult(name=name, status="duplicate", detail="Repeated in this request"))
+                continue
+            seen.add(key(name))
+            batch.append((len(results), name))
+            results.append(None)
+            if len(batch) >= CATEGORY_BULK_BATCH_SIZE:
+                await _upsert_category_batch(session, batch, results, key)
+                saved += len(batch)
+                batch = []
+        if batch:
+            await _upsert_category_batch(session, batch, results, key)
+            saved += len(batch)
+    finally:
+        # Also on the way out with an error, so saved batches don't hide behind the cached list.
+        if saved:
+            category_list_cache.invalidate()
+    return results
+
+async def bulk_delete_categories(session: AsyncSession, category_ids: list[int]) -> list[CategoryBulkResult]:
+    category_ids = list(dict.fromkeys(category_ids))
+    existing = set((await session.scalars(select(Category.id).where(Category.id.in_(category_ids)))).all())
+    if existing:
+        await session.execute(delete(Category).where(Category.id.in_(existing)))
+        await session.commit()
+        category_list_cache.invalidate()
+    return [
+        CategoryBulkResult(id=category_id, status="deleted" if category_id in existing else "not_found")
+        for category_id in category_ids
+    ]
+
+def encode_product_cursor(product) -> str:
+    raw = json.dumps([product.created_at.isoformat(), product.id]).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+def decode_product_cursor(cursor: str) -> tuple[datetime, int]:
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        created_at, product_id = json.loads(raw)
+        return datetime.fromisoformat(created_at), int(product_id)
+    except (ValueError, TypeError):
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Invalid cursor")
+
+def _with_categories(stmt, loading: Optional[CategoryLoading]):
+    if loading is None:
+        return stmt
+    if loading == "joined":
+        return stmt.options(joinedload(Product.categories))
+    if loading == "selectin":
+        return stmt.options(selectinload(Product.categories))
+    raise ValueError(f"Unknown category loading strategy: {loading}")
+
+def _filter_by_category(stmt, category_id: Optional[int]):
+    if category_id is None:
+        return stmt
+    return stmt.join(product_category_table, product_category_table.c.product_id == Product.id).where(
+        product_category_table.c.category_id == category_id
+    )
+
+async def get_products_page(session: AsyncSession, limit: int, cursor: Optional[str] = None, category_id: Optional[int] = None, loading: Optional[CategoryLoading] = None):
+    # Keyset pagination, newest first: seek past the last (created_at, id) seen
+    # instead of OFFSET, so deep pages cost the same as the first one.
+    stmt = _filter_by_category(select(Product), category_id)
+    if cursor:
+        created_at, product_id = decode_product_cursor(cursor)
+        # The redundant leading "created_at <=" bounds an index range scan on MySQL.
+        stmt = stmt.where(
+            Product.created_at <= created_at,
+            or_(Product.created_at < created_at, Product.id < product_id),
+        )
+    stmt = stmt.order_by(Product.created_at.desc(), Product.id.desc()).limit(limit + 1)
+    result = await session.scalars(_with_categories(stmt, loading))
+    products = result.unique().all()
+    next_cursor = encode_product_cursor(products[limit - 1]) if len(products) > limit else None
+    return products[:limit], next_cursor
+
+async def get_product(session: AsyncSession, product_id: int, loading: Optional[CategoryLoading] = None):
+    stmt = _with_categories(select(Product).where(Product.id == product_id), loading)
+    result = await session.scalars(stmt)
+    product = result.unique().first()
+    if not product:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Product not found")
+    return product
+
+async def stream_products_ndjson(sessionmaker: async_sessionmaker, category_id: Optional[int] = None, batch_size: int = 1000) -> AsyncIterator[bytes]:
+    # Selects table columns rather than ORM entities so rows never enter the
+    # identity map; with a server-side cursor memory stays flat for any row count.
+    stmt = _filter_by_category(select(*Product.__table__.c), category_id).order_by(Product.id)
+    async with sessionmaker() as session:
+        result = await session.stream(stmt.execution_options(yield_per=batch_size))
+        async for rows in result.partitions():
+            yield b"".join(dumps(ProductOut.model_validate(row)) + b"\n" for row in rows)
@@ -0,0 +1,229 @@
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Optional
+from decouple import config
+from fastapi import Depends, HTTPException, Request, status
+from fastapi.routing import APIRoute
+import logging
+import math
+import time
+import pydantic_core
+
+logger = logging.getLogger(__name__)
+
+RATE_LIMIT_ENABLED = config("RATE_LIMIT_ENABLED", default=True, cast=bool)
+# "memory" keeps buckets per worker; "redis" shares them across workers (needs the redis package).
+RATE_LIMIT_BACKEND = config("RATE_LIMIT_BACKEND", default="memory")
+RATE_LIMIT_REDIS_URL = config("RATE_LIMIT_REDIS_URL", default="redis://localhost:6379/0")
+RATE_LIMIT_MAX_KEYS = config("RATE_LIMIT_MAX_KEYS", default=100_000, cast=int)
+# Only enable behind a proxy that overwrites X-Forwarded-For; otherwise clients pick their own IP.
+RATE_LIMIT_TRUST_FORWARDED_FOR = config("RATE_LIMIT_TRUST_FORWARDED_FOR", default=False, cast=bool)
+# Routes with a per-email limit take a few small fields; larger bodies get a 413.
+RATE_LIMIT_MAX_BODY_BYTES = config("RATE_LIMIT_MAX_BODY_BYTES", default=16_384, cast=int)
+
+_PERIODS = {"second": 1, "minute": 60, "hour": 3600, "day": 86400}
+
+
+@dataclass(frozen=True)
+class Limit:
+    """A token bucket: `capacity` requests in a burst, refilled at `rate` per second."""
+
+    capacity: int
+    rate: float
+
+    @classmethod
+    def parse(cls, value: str) -> "Limit":
+        # "5/minute" -> bursts of 5, one token back every 12 seconds.
+        count, _, period = value.partition("/")
+        try:
+            capacity, seconds = int(count), _PERIODS[period.strip()]
+        except (KeyError, ValueError):
+            raise ValueError(f"Invalid rate limit {value!r}, expected <count>/<{'|'.join(_PERIODS)}>") from None
+        # A bucket that never refills would divide by zero; turn a limit off by leaving it empty.
+        if capacity < 1:
+            raise ValueError(f"Invalid rate limit {value!r}, the count must be at least 1")
+        return cls(capacity, capacity / seconds)
+
+
+class MemoryBucketStore:
+    """Token buckets in an LRU dict; O(1) per request.
+
+    A bucket that has refilled to capacity is the same as no bucket, so entries
+    carry the time they become full and are dropped lazily from the cold end.
+    """
+
+    def __init__(self, max_keys: int):
+        self.max_keys = max_keys
+        self._buckets: OrderedDict[str, tuple[float, float, float]] = OrderedDict()
+
+    async def take(self, key: str, limit: Limit) -> float:
+        """Spend one token; returns 0 when allowed, else seconds until a token is available."""
+        now = time.monotonic()
+        bucket = self._buckets.get(key)
+        if bucket is None:
+            tokens = float(limit.capacity)
+        else:
+            tokens, updated_at, _ = bucket
+            tokens = min(limit.capacity, tokens + (now - updated_at) * limit.rate)
+        retry_after = 0.0
+        if tokens >= 1:
+            tokens -= 1
+        else:
+            retry_after = (1 - tokens) / limit.rate
+        self._buckets[key] = (tokens, now, now + (limit.capacity - tokens) / limit.rate)
+        self._buckets.move_to_end(key)
+        self._expire(now)
+        return retry_after
+
+    def _expire(self, now: float):
+        # At most a couple of pops per call keeps the cost amortized O(1).
+        for _ in range(2):
+            if not self._buckets:
+                return
+            key, (_, _, full_at) = next(iter(self._buckets.items()))
+            if full_at > now and len(self._buckets) <= self.max_keys:
+                return
+            del self._buckets[key]
+
+    def __len__(self):
+        return len(self._buckets)
+
+
+# Refill, spend and expire in one round trip; atomic across workers.
+_REDIS_TAKE = """
+local capacity = tonumber(ARGV[1])
+local rate = tonumber(ARGV[2])
+local now = tonumber(ARGV[3])
+local bucket = redis.call('HMGET', KEYS[1], 't', 'ts')
+local tokens = tonumber(bucket[1]) or capacity
+local updated_at = tonumber(bucket[2]) or now
+tokens = math.min(capacity, tokens + math.max(0, now - updated_at) * rate)
+local retry_after = 0
+if tokens >= 1 then tokens = tokens - 1 else retry_after = (1 - tokens) / rate end
+redis.call('HSET', KEYS[1], 't', tokens, 'ts', now)
+redis.call('PEXPIRE', KEYS[1], math.ceil((capacity - tokens) / rate * 1000) + 1000)
+return tostring(retry_after)
+"""
+
+
+class RedisBucketStore:
+    """Buckets shared by every worker; Redis key expiry does the lazy cleanup."""
+
+    def __init__(self, url: str):
+        import redis.asyncio as redis
+        self._redis = redis.from_url(url)
+        self._take = self._redis.register_script(_REDIS_TAKE)
+
+    async def take(self, key: str, limit: Limit) -> float:
+        try:
+            return float(await self._take(keys=[f"ratelimit:{key}"], args=[limit.capacity, limit.rate, time.time()]))
+        except Exception:
+            # Fail open: an unreachable limiter shouldn't take login down with it.
+            logger.exception("Rate limit backend unavailable")
+            return 0.0
+
+
+def create_bucket_store():
+    if RATE_LIMIT_BACKEND == "redis":
+        return RedisBucketStore(RATE_LIMIT_REDIS_URL)
+    return MemoryBucketStore(RATE_LIMIT_MAX_KEYS)
+
+
+bucket_store = create_bucket_store()
+
+
+def _client_ip(request: Request) -> str:
+    if RATE_LIMIT_TRUST_FORWARDED_FOR:
+        forwarded_for = request.headers.get("x-forwarded-for")
+        if forwarded_for:
+            return forwarded_for.split(",")[0].strip()
+    return request.client.host if request.client else "unknown"
+
+
+async def _read_body(request: Request, limit: int) -> bytes:
+    """The request body, cut off with a 413 as soon as it passes `limit` bytes.
+
+    Chunked uploads carry no Content-Length, so the stream is counted as it arrives.
+    The body is kept on the request, where FastAPI's own parsing picks it up.
+    """
+    if int(request.headers.get("content-length") or 0) > limit:
+        raise _body_too_large()
+    chunks, size = [], 0
+    async for chunk in request.stream():
+        size += len(chunk)
+        if size > limit:
+            raise _body_too_large()
+        chunks.append(chunk)
+    request._body = b"".join(chunks)
+    return request._body
+
+
+async def _email_from_body(request: Request) -> str:
+    # Skipping the check for a body that can't be read would let padding or junk
+    # bypass it while the route still tries the login, so those are rejected instead.
+    try:
+        payload = pydantic_core.from_json(await _read_body(request, RATE_LIMIT_MAX_BODY_BYTES))
+    except ValueError:
+        payload = None
+    email = payload.get("email") if isinstance(payload, dict) else None
+    if not isinstance(email, str):
+        raise HTTPException(status_code=status.HTTP_422_UNPROCESSABLE_CONTENT, detail="Expected a JSON object with an email")
+    return email.strip().lower()
+
+
+def _body_too_large() -> HTTPException:
+    return HTTPException(status_code=status.HTTP_413_CONTENT_TOO_LARGE, detail="Request body too large")
+
+
+def _too_many_requests(retry_after: float) -> HTTPException:
+    return HTTPException(
+        status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+        detail="Too many requests",
+        headers={"Retry-After": str(max(1, math.ceil(retry_after)))},
+    )
+
+
+def rate_limit(scope: str, per_ip: Optional[str] = None, per_email: Optional[str] = None, store=None):
+    """Token-bucket limits for a route, declared as `dependencies=[rate_limit(...)]`.
+
+    Route-level dependencies resolve before the endpoint's own (sessions included),
+    so a throttled request costs one bucket update and never reaches the DB or a
+    password hash. `per_email` keys on the "email" field of the JSON body.
+    """
+    ip_limit = Limit.parse(per_ip) if per_ip else None
+    email_limit = Limit.parse(per_email) if per_email else None
+
+    async def check(request: Request):
+        if not RATE_LIMIT_ENABLED:
+            return
+        buckets = store or bucket_store
+        if ip_limit:
+            retry_after = await buckets.take(f"{scope}:ip:{_client_ip(request)}", ip_limit)
+            if retry_after:
+                raise _too_many_requests(retry_after)
+        if email_limit:
+            email = await _email_from_body(request)
+            retry_after = await buckets.take(f"{scope}:email:{email}", email_limit)
+            if retry_after:
+                raise _too_many_requests(retry_after)
+
+    check.reads_body = email_limit is not None
+    return Depends(check)
+
+
+class RateLimitedRoute(APIRoute):
+    """Caps the body of routes with a per-email limit before FastAPI reads it.
+
+    FastAPI reads the whole body ahead of any dependency, so `check` alone would
+    reject a huge body only after buffering it. Use as `APIRouter(route_class=...)`.
+    """
+
+    def get_route_handler(self):
+        handler = super().get_route_handler()
+        if not any(getattr(dependency.dependency, "reads_body", False) for dependency in self.dependencies):
+            return handler
+
+        async def bounded_handler(request: Request):
+            await _read_body(request, RATE_LIMIT_MAX_BODY_BYTES)
+            return await handler(request)
+        return bounded_handler
@@ -0,0 +1,35 @@
+from typing import Any
+from decouple import config
+from fastapi.responses import JSONResponse
+from pydantic import BaseModel
+import pydantic_core
+
+try:
+    import orjson
+except ImportError:  # optional backend
+    orjson = None
+
+# "pydantic" (default) or "orjson". pydantic-core measured faster on model-heavy
+# payloads (benchmarks/json_responses.py); orjson needs 3.9+ for orjson.Fragment.
+JSON_RESPONSE_BACKEND = config("JSON_RESPONSE_BACKEND", default="pydantic")
+_USE_ORJSON = JSON_RESPONSE_BACKEND == "orjson" and orjson is not None and hasattr(orjson, "Fragment")
+
+
+def _orjson_default(obj: Any):
+    if isinstance(obj, BaseModel):
+        return orjson.Fragment(obj.__pydantic_serializer__.to_json(obj))
+    return orjson.Fragment(pydantic_core.to_json(obj))
+
+
+def dumps(content: Any) -> bytes:
+    # Pydantic models are serialized straight to bytes by pydantic-core, with no model_dump() dict in between.
+    if _USE_ORJSON:
+        return orjson.dumps(content, default=_orjson_default)
+    return pydantic_core.to_json(content)
+
+
+class FastJSONResponse(JSONResponse):
+    """JSONResponse that accepts Pydantic models anywhere in the content."""
+
+    def render(self, content: Any) -> bytes:
+        return dumps(content)
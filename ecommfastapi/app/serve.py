@@ -0,0 +1,131 @@
+"""Production entry point: several worker processes behind one port.
+
+    python -m app.serve --workers 4 --db-connection-budget 60
+    python -m app.serve --server gunicorn --workers 4 --preload
+
+uvicorn's event loop and HTTP parser are picked per worker: uvloop and httptools
+when installed (`pip install uvloop httptools`), asyncio and h11 otherwise. The
+gunicorn server also needs `pip install gunicorn uvicorn-worker`.
+"""
+from importlib.util import find_spec
+from decouple import config
+import argparse
+import gc
+import logging
+import os
+
+logger = logging.getLogger("app.serve")
+
+SERVER_BACKEND = config("SERVER_BACKEND", default="uvicorn")
+SERVER_HOST = config("SERVER_HOST", default="0.0.0.0")
+SERVER_PORT = config("SERVER_PORT", default=8000, cast=int)
+WEB_CONCURRENCY = config("WEB_CONCURRENCY", default=os.cpu_count() or 1, cast=int)
+# Imports the app once in the gunicorn master and forks workers from it.
+SERVER_PRELOAD = config("SERVER_PRELOAD", default=False, cast=bool)
+# Total primary connections this instance may open, split across its workers;
+# 0 leaves DB_POOL_SIZE/DB_MAX_OVERFLOW as they are (per worker).
+DB_CONNECTION_BUDGET = config("DB_CONNECTION_BUDGET", default=0, cast=int)
+# Share of each worker's connections kept as overflow for bursts rather than held open.
+DB_POOL_OVERFLOW_SHARE = config("DB_POOL_OVERFLOW_SHARE", default=0.2, cast=float)
+SERVER_KEEPALIVE_SECONDS = config("SERVER_KEEPALIVE_SECONDS", default=5, cast=int)
+# Must outlast the drain delay plus the in-flight wait in app.lifecycle.
+SERVER_GRACEFUL_TIMEOUT_SECONDS = config("SERVER_GRACEFUL_TIMEOUT_SECONDS", default=30, cast=int)
+
+APP = "app.main:app"
+
+
+def pool_sizing(budget: int, workers: int, overflow_share: float = DB_POOL_OVERFLOW_SHARE) -> tuple[int, int]:
+    """Splits a connection budget into per-worker (pool_size, max_overflow); workers never exceed it together."""
+    per_worker = budget // workers
+    if per_worker < 1:
+        raise SystemExit(f"DB connection budget {budget} is too small for {workers} workers")
+    max_overflow = int(per_worker * overflow_share)
+    return per_worker - max_overflow, max_overflow
+
+
+def _event_loop() -> str:
+    return "uvloop" if find_spec("uvloop") else "asyncio"
+
+
+def _http_parser() -> str:
+    return "httptools" if find_spec("httptools") else "h11"
+
+
+def run_uvicorn(args):
+    import uvicorn
+    if args.preload:
+        raise SystemExit("--preload needs --server gunicorn; uvicorn starts each worker in a fresh interpreter")
+    uvicorn.run(
+        APP,
+        host=args.host,
+        port=args.port,
+        workers=args.workers,
+        loop=_event_loop(),
+        http=_http_parser(),
+        proxy_headers=True,
+        access_log=args.access_log,
+        timeout_keep_alive=SERVER_KEEPALIVE_SECONDS,
+        timeout_graceful_shutdown=SERVER_GRACEFUL_TIMEOUT_SECONDS,
+    )
+
+
+def run_gunicorn(args):
+    from gunicorn.app.base import BaseApplication
+    # The uvicorn-worker package replaces uvicorn's own, deprecated, gunicorn worker.
+    worker_class = "uvicorn_worker.UvicornWorker" if find_spec("uvicorn_worker") else "uvicorn.workers.UvicornWorker"
+
+    class Application(BaseApplication):
+        def load_config(self):
+            settings = {
+                "bind": f"{args.host}:{args.port}",
+                "workers": args.workers,
+                "worker_class": worker_class,
+                "preload_app": args.preload,
+                "keepalive": SERVER_KEEPALIVE_SECONDS,
+                "graceful_timeout": SERVER_GRACEFUL_TIMEOUT_SECONDS,
+                "accesslog": "-" if args.access_log else None,
+            }
+            for key, value in settings.items():
+                self.cfg.set(key, value)
+
+        def load(self):
+            from app.main import app
+            if args.preload:
+                # Objects loaded before the fork stay shared; keep the GC from touching (and copying) them.
+                gc.freeze()
+            return app
+
+    Application().run()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Run the API with several worker processes.")
+    parser.add_argument("--server", choices=["uvicorn", "gunicorn"], default=SERVER_BACKEND)
+    parser.add_argument("--host", default=SERVER_HOST)
+    parser.add_argument("--port", type=int, default=SERVER_PORT)
+    parser.add_argument("--workers", type=int, default=WEB_CONCURRENCY)
+    parser.add_argument("--preload", action="store_true", default=SERVER_PRELOAD)
+    parser.add_argument("--db-connection-budget", type=int, default=DB_CONNECTION_BUDGET)
+    parser.add_argument("--no-access-log", dest="access_log", action="store_false")
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO, format="%(levelname)s:     %(message)s")
+
+    if args.db_connection_budget:
+        pool_size, max_overflow = pool_sizing(args.db_connection_budget, args.workers)
+        # Workers read their settings lazily, after this, and inherit the environment.
+        os.environ["DB_POOL_SIZE"] = str(pool_size)
+        os.environ["DB_MAX_OVERFLOW"] = str(max_overflow)
+        logger.info("DB pool per worker: pool_size=%d max_overflow=%d (%d workers, budget %d)",
+                    pool_size, max_overflow, args.workers, args.db_connection_budget)
+    logger.info("Serving with %s: %d workers, %s loop, %s parser", args.server, args.workers, _event_loop(), _http_parser())
+    if not find_spec("uvloop") or not find_spec("httptools"):
+        logger.warning("uvloop/httptools not installed; falling back to asyncio/h11")
+
+    if args.server == "gunicorn":
+        run_gunicorn(args)
+    else:
+        run_uvicorn(args)
+
+
+if __name__ == "__main__":
+    main()
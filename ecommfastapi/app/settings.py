@@ -0,0 +1,70 @@
+from dataclasses import dataclass
+from functools import lru_cache
+from decouple import config
+
+
+@dataclass(frozen=True)
+class Settings:
+    """Core settings: database, JWT and password hashing. Read once, on first use rather than at import."""
+
+    database_url: str
+    db_echo: bool
+    db_pool_size: int
+    db_max_overflow: int
+    db_pool_timeout: float
+    db_pool_recycle: int
+    db_pool_pre_ping: bool
+    db_connect_timeout: int
+    # MySQL max_execution_time, applies to SELECTs; 0 disables it.
+    db_statement_timeout_ms: int
+
+    jwt_secret_key: str
+    jwt_algorithm: str
+    jwt_access_token_expire_minutes: int
+    jwt_refresh_token_expire_days: int
+    email_verification_token_time_hour: int
+    password_reset_token_time_hour: int
+
+    argon2_time_cost: int
+    argon2_memory_cost: int
+    argon2_parallelism: int
+    # Hashing runs on its own pool so a login burst can't stall the event loop.
+    password_hash_workers: int
+    password_hash_max_queue: int
+
+
+def _database_url() -> str:
+    # DATABASE_URL overrides the DB_* parts, e.g. for a local SQLite stand-in.
+    url = config("DATABASE_URL", default="")
+    if url:
+        return url
+    return (
+        f"mysql+aiomysql://{config('DB_USER')}:{config('DB_PASSWORD')}"
+        f"@{config('DB_HOST')}:{config('DB_PORT', cast=int)}/{config('DB_NAME')}"
+    )
+
+
+@lru_cache(maxsize=None)
+def get_settings() -> Settings:
+    return Settings(
+        database_url=_database_url(),
+        db_echo=config("DB_ECHO", default=False, cast=bool),
+        db_pool_size=config("DB_POOL_SIZE", default=10, cast=int),
+        db_max_overflow=config("DB_MAX_OVERFLOW", default=5, cast=int),
+        db_pool_timeout=config("DB_POOL_TIMEOUT", default=10, cast=float),
+        db_pool_recycle=config("DB_POOL_RECYCLE", default=1800, cast=int),
+        db_pool_pre_ping=config("DB_POOL_PRE_PING", default=True, cast=bool),
+        db_connect_timeout=config("DB_CONNECT_TIMEOUT", default=5, cast=int),
+        db_statement_timeout_ms=config("DB_STATEMENT_TIMEOUT_MS", default=0, cast=int),
+        jwt_secret_key=config("JWT_SECRET_KEY"),
+        jwt_algorithm=config("JWT_ALGORITHM"),
+        jwt_access_token_expire_minutes=config("JWT_ACCESS_TOKEN_EXPIRE_MINUTES", default=30, cast=int),
+        jwt_refresh_token_expire_days=config("JWT_REFRESH_TOKEN_EXPIRE_DAYS", default=7, cast=int),
+        email_verification_token_time_hour=config("EMAIL_VERIFICATION_TOKEN_TIME_HOUR", default=1, cast=int),
+        password_reset_token_time_hour=config("PASSWORD_RESET_TOKEN_TIME_HOUR", default=2, cast=int),
+        argon2_time_cost=config("ARGON2_TIME_COST", default=3, cast=int),
+        argon2_memory_cost=config("ARGON2_MEMORY_COST", default=65536, cast=int),
+        argon2_parallelism=config("ARGON2_PARALLELISM", default=4, cast=int),
+        password_hash_workers=config("PASSWORD_HASH_WORKERS", default=4, cast=int),
+        password_hash_max_queue=config("PASSWORD_HASH_MAX_QUEUE", default=64, cast=int),
+    )
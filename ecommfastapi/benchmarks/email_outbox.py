@@ -0,0 +1,117 @@
+"""Request-path cost of sending mail inline vs enqueueing it, and outbox drain throughput.
+
+Runs against a local aiosmtpd server (pip install aiosmtpd) that adds --smtp-delay-ms
+of latency per message and fails --fail-rate of them, so retries and backoff are exercised.
+The run fails if any message is lost.
+
+    python benchmarks/email_outbox.py --emails 500 --smtp-delay-ms 50 --fail-rate 0.1
+"""
+import argparse
+import asyncio
+import os
+import random
+import statistics
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault("DATABASE_URL", "sqlite+aiosqlite:////tmp/ecommfastapi-bench.db")
+os.environ.setdefault("JWT_SECRET_KEY", "benchmark")
+os.environ.setdefault("JWT_ALGORITHM", "HS256")
+
+from aiosmtpd.controller import Controller  # noqa: E402
+from sqlalchemy.ext.asyncio import async_sessionmaker  # noqa: E402
+from app.db.base import Base  # noqa: E402
+from app.db import models  # noqa: E402,F401
+from app.db.config import create_engine_from_settings  # noqa: E402
+from app.settings import get_settings  # noqa: E402
+from app.mail.outbox import OutboxWorker, enqueue_email, outbox_depth  # noqa: E402
+from app.mail.senders import SMTPSender, build_message  # noqa: E402
+
+
+class FlakyHandler:
+    def __init__(self, delay: float, fail_rate: float):
+        self.delay = delay
+        self.fail_rate = fail_rate
+        self.received = set()
+
+    async def handle_DATA(self, server, session, envelope):
+        await asyncio.sleep(self.delay)
+        if random.random() < self.fail_rate:
+            return "451 Try again later"
+        self.received.add(envelope.rcpt_tos[0])
+        return "250 OK"
+
+
+def p99(timings):
+    timings = sorted(timings)
+    return timings[min(len(timings) - 1, int(len(timings) * 0.99))]
+
+
+async def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--url", default=get_settings().database_url)
+    parser.add_argument("--emails", type=int, default=500)
+    parser.add_argument("--smtp-delay-ms", type=float, default=50)
+    parser.add_argument("--fail-rate", type=float, default=0.1)
+    parser.add_argument("--concurrency", type=int, default=10)
+    parser.add_argument("--port", type=int, default=8025)
+    args = parser.parse_args()
+
+    handler = FlakyHandler(args.smtp_delay_ms / 1000, args.fail_rate)
+    controller = Controller(handler, hostname="127.0.0.1", port=args.port)
+    controller.start()
+    sender = SMTPSender("127.0.0.1", args.port, max_workers=args.concurrency)
+
+    engine = create_engine_from_settings(args.url)
+    async with engine.begin() as connection:
+        await connection.run_sync(Base.metadata.drop_all)
+        await connection.run_sync(Base.metadata.create_all)
+    sessionmaker = async_sessionmaker(bind=engine, expire_on_commit=False)
+
+    inline = []
+    for i in range(min(args.emails, 50)):
+        started = time.perf_counter()
+        try:
+            await sender.send(build_message(f"inline{i}@example.com", "Verify your email", "link"))
+        except Exception:
+            pass
+        inline.append((time.perf_counter() - started) * 1000)
+
+    enqueued = []
+    for i in range(args.emails):
+        async with sessionmaker() as session:
+            started = time.perf_counter()
+            enqueue_email(session, f"user{i}@example.com", "Verify your email", "link")
+            await session.commit()
+            enqueued.append((time.perf_counter() - started) * 1000)
+
+    print(f"request path, inline SMTP: p50={statistics.median(inline):.2f}ms p99={p99(inline):.2f}ms")
+    print(f"request path, outbox:      p50={statistics.median(enqueued):.2f}ms p99={p99(enqueued):.2f}ms")
+
+    # Short backoff so failed sends are retried within the run.
+    worker = OutboxWorker(sessionmaker, sender, batch_size=100, concurrency=args.concurrency, max_attempts=20, lease_seconds=60, backoff_base=0.01, backoff_max=0.5)
+    started = time.perf_counter()
+    while True:
+        await worker.drain()
+        async with sessionmaker() as session:
+            depth = await outbox_depth(session)
+        if not depth["pending"]:
+            break
+        await asyncio.sleep(0.05)
+    elapsed = time.perf_counter() - started
+
+    stats = worker.stats()
+    print(f"drained {stats['sent']} emails in {elapsed:.2f}s ({stats['sent'] / elapsed:.0f}/s) "
+          f"with concurrency={args.concurrency}, {stats['failed_attempts']} failed attempts retried")
+    print(f"send latency p50={stats['send_latency_ms']['p50']}ms p99={stats['send_latency_ms']['p99']}ms")
+
+    delivered = {f"user{i}@example.com" for i in range(args.emails)} <= handler.received
+    controller.stop()
+    await engine.dispose()
+    if not delivered or depth["failed"]:
+        sys.exit("some emails were not delivered")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
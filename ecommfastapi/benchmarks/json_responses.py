@@ -0,0 +1,52 @@
+"""Serialization cost of the category list envelope.
+
+Compares the old path (TypeAdapter validation, model_dump() per item, stdlib
+json via JSONResponse) with FastJSONResponse serializing the models directly.
+
+    python benchmarks/json_responses.py --categories 1000
+"""
+import argparse
+import os
+import sys
+import timeit
+from types import SimpleNamespace
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from fastapi.responses import JSONResponse  # noqa: E402
+from pydantic import TypeAdapter  # noqa: E402
+from app.product.schemas import CategoryOut  # noqa: E402
+from app.responses import FastJSONResponse, _USE_ORJSON  # noqa: E402
+
+adapter = TypeAdapter(list[CategoryOut])
+
+
+def envelope(data):
+    return {"success": True, "status_code": 200, "message": "Successfully get all category", "data": data}
+
+
+def old_path(rows):
+    validated = adapter.validate_python(rows)
+    return JSONResponse(content=envelope([item.model_dump() for item in validated])).body
+
+
+def new_path(rows):
+    return FastJSONResponse(content=envelope(adapter.validate_python(rows))).body
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--categories", type=int, default=1000)
+    parser.add_argument("--number", type=int, default=200)
+    args = parser.parse_args()
+    rows = [SimpleNamespace(id=i, name=f"Category {i}") for i in range(args.categories)]
+    assert len(old_path(rows)) == len(new_path(rows))
+
+    print(f"backend: {'orjson' if _USE_ORJSON else 'pydantic-core'}")
+    for name, func in (("JSONResponse + model_dump", old_path), ("FastJSONResponse", new_path)):
+        seconds = min(timeit.repeat(lambda: func(rows), number=args.number, repeat=5)) / args.number
+        print(f"{name:>26}: {seconds * 1e6:8.1f} us per response")
+
+
+if __name__ == "__main__":
+    main()
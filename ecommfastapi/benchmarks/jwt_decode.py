@@ -0,0 +1,36 @@
+"""Per-request access token verification cost, with and without the decode cache.
+
+    python benchmarks/jwt_decode.py
+    JWT_BACKEND=pyjwt python benchmarks/jwt_decode.py
+"""
+import os
+import sys
+import timeit
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault("DATABASE_URL", "sqlite+aiosqlite:////tmp/ecommfastapi-bench.db")
+os.environ.setdefault("JWT_SECRET_KEY", "benchmark")
+os.environ.setdefault("JWT_ALGORITHM", "HS256")
+
+from types import SimpleNamespace  # noqa: E402
+from app.account.jwt_backend import JWT_BACKEND, get_jwt_backend  # noqa: E402
+from app.account.principal import access_token_claims  # noqa: E402
+from app.account.utils import create_access_token, decode_token  # noqa: E402
+from app.settings import get_settings  # noqa: E402
+
+
+def main(number: int = 20_000):
+    user = SimpleNamespace(id=42, email="bench@example.com", is_active=True, is_admin=False, is_verified=True, token_version=3)
+    token = create_access_token(access_token_claims(user))
+    decode_token(token)  # warm the cache
+    settings = get_settings()
+
+    uncached = min(timeit.repeat(lambda: get_jwt_backend().decode(token, settings.jwt_secret_key, settings.jwt_algorithm), number=number, repeat=3)) / number
+    cached = min(timeit.repeat(lambda: decode_token(token), number=number, repeat=3)) / number
+    print(f"backend: {JWT_BACKEND}")
+    print(f"  verify every request: {uncached * 1e6:7.2f} us")
+    print(f"  decode cache hit:     {cached * 1e6:7.2f} us ({uncached / cached:.0f}x)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,237 @@
+"""HTTP load test of the auth flow and the category list, reporting RPS and latency per scenario.
+
+By default it starts the app with app.serve against a SQLite stand-in. Rate
+limiting is off in that server, and the database gets seed categories. Point
+--url at a running server (e.g. one backed by local MySQL) to test that
+instead. Writes from several workers contend on SQLite's single writer, so
+use MySQL for --workers > 1.
+
+    python benchmarks/load_test.py --duration 10 --concurrency 16
+    python benchmarks/load_test.py --url http://127.0.0.1:8000 --scenarios me,categories
+"""
+import argparse
+import asyncio
+import json
+import os
+import socket
+import subprocess
+import sys
+import time
+import uuid
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+os.environ.setdefault("DATABASE_URL", "sqlite+aiosqlite:////tmp/ecommfastapi-bench.db")
+os.environ.setdefault("JWT_SECRET_KEY", "benchmark")
+os.environ.setdefault("JWT_ALGORITHM", "HS256")
+
+import httpx  # noqa: E402
+
+SCENARIOS = ["register", "login", "me", "refresh", "categories"]
+PASSWORD = "Passw0rdX"
+ACCOUNT = "/app/account"
+
+
+class Session:
+    """One virtual user. The app sets Secure cookies, which httpx won't send over plain HTTP, so they are carried by hand."""
+
+    def __init__(self, email: str):
+        self.email = email
+        self.cookies: dict[str, str] = {}
+
+    def remember(self, response: httpx.Response):
+        for name in ("access_token", "refresh_token"):
+            if name in response.cookies:
+                self.cookies[name] = response.cookies[name]
+
+    @property
+    def headers(self) -> dict:
+        return {"cookie": "; ".join(f"{name}={value}" for name, value in self.cookies.items())}
+
+
+class Result:
+    def __init__(self, name: str):
+        self.name = name
+        self.latencies: list[float] = []
+        self.statuses: dict[int, int] = {}
+        self.elapsed = 0.0
+
+    def record(self, status_code: int, latency_ms: float):
+        self.latencies.append(latency_ms)
+        self.statuses[status_code] = self.statuses.get(status_code, 0) + 1
+
+    def percentile(self, q: float) -> float:
+        ordered = sorted(self.latencies)
+        return ordered[min(len(ordered) - 1, int(len(ordered) * q))] if ordered else 0.0
+
+    def summary(self) -> dict:
+        errors = sum(count for status_code, count in self.statuses.items() if status_code >= 400)
+        return {
+            "scenario": self.name,
+            "requests": len(self.latencies),
+            "errors": errors,
+            "statuses": self.statuses,
+            "rps": round(len(self.latencies) / self.elapsed, 1) if self.elapsed else 0.0,
+            "p50_ms": round(self.percentile(0.5), 2),
+            "p90_ms": round(self.percentile(0.9), 2),
+            "p99_ms": round(self.percentile(0.99), 2),
+            "max_ms": round(max(self.latencies, default=0.0), 2),
+        }
+
+
+async def timed(result: Result, request) -> httpx.Response:
+    started = time.perf_counter()
+    try:
+        response = await request
+    except httpx.HTTPError:
+        result.record(599, (time.perf_counter() - started) * 1000)
+        return None
+    result.record(response.status_code, (time.perf_counter() - started) * 1000)
+    return response
+
+
+async def register(client: httpx.AsyncClient, session: Session) -> httpx.Response:
+    return await client.post(f"{ACCOUNT}/register", json={"email": session.email, "password": PASSWORD})
+
+
+async def login(client: httpx.AsyncClient, session: Session) -> httpx.Response:
+    response = await client.post(f"{ACCOUNT}/login", json={"email": session.email, "password": PASSWORD})
+    session.remember(response)
+    return response
+
+
+async def seed_sessions(client: httpx.AsyncClient, count: int, run_id: str) -> list[Session]:
+    sessions = [Session(f"load-{run_id}-{n}@example.com") for n in range(count)]
+    for step in (register, login):
+        responses = await asyncio.gather(*(step(client, session) for session in sessions))
+        failed = [response.status_code for response in responses if response.status_code >= 400]
+        if failed:
+            sys.exit(f"seeding failed at {step.__name__}: statuses {sorted(set(failed))}")
+    return sessions
+
+
+async def run_scenario(client: httpx.AsyncClient, name: str, sessions: list[Session], concurrency: int, duration: float, run_id: str) -> Result:
+    result = Result(name)
+    deadline = time.perf_counter() + duration
+    registered = 0
+
+    async def virtual_user(index: int):
+        nonlocal registered
+        # Each virtual user owns one session, so refresh tokens rotate without races between users.
+        session = sessions[index]
+        while time.perf_counter() < deadline:
+            if name == "register":
+                registered += 1
+                await timed(result, register(client, Session(f"load-{run_id}-new-{registered}@example.com")))
+            elif name == "login":
+                await timed(result, login(client, session))
+            elif name == "me":
+                await timed(result, client.get(f"{ACCOUNT}/me", headers=session.headers))
+            elif name == "refresh":
+                response = await timed(result, client.post(f"{ACCOUNT}/refresh", headers=session.headers))
+                if response is not None:
+                    session.remember(response)
+            else:
+                await timed(result, client.get("/app/product/categories"))
+
+    started = time.perf_counter()
+    await asyncio.gather(*(virtual_user(index) for index in range(concurrency)))
+    result.elapsed = time.perf_counter() - started
+    return result
+
+
+async def prepare_database(categories: int):
+    from sqlalchemy import insert, select
+    from app.db.base import Base
+    from app.db import models  # noqa: F401
+    from app.db.config import create_engine_from_settings
+    from app.product.models import Category
+    engine = create_engine_from_settings()
+    async with engine.begin() as connection:
+        await connection.run_sync(Base.metadata.create_all)
+        existing = set((await connection.scalars(select(Category.name))).all())
+        missing = [{"name": f"Load category {n}"} for n in range(categories) if f"Load category {n}" not in existing]
+        if missing:
+            await connection.execute(insert(Category), missing)
+    await engine.dispose()
+
+
+def _free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+async def start_server(args) -> tuple[subprocess.Popen, str]:
+    await prepare_database(args.categories)
+    port = _free_port()
+    env = {**os.environ, "RATE_LIMIT_ENABLED": "false", "SHUTDOWN_DRAIN_DELAY_SECONDS": "0", "PYTHONPATH": ROOT}
+    command = [sys.executable, "-m", "app.serve", "--host", "127.0.0.1", "--port", str(port),
+               "--workers", str(args.workers), "--server", args.server, "--no-access-log"]
+    if args.db_connection_budget:
+        command += ["--db-connection-budget", str(args.db_connection_budget)]
+    with open(args.server_log, "w") as log:
+        server = subprocess.Popen(command, cwd=ROOT, env=env, stdout=log, stderr=subprocess.STDOUT)
+    url = f"http://127.0.0.1:{port}"
+    async with httpx.AsyncClient(base_url=url) as client:
+        for _ in range(300):
+            try:
+                if (await client.get("/readyz")).status_code == 200:
+                    return server, url
+            except httpx.TransportError:
+                pass
+            if server.poll() is not None:
+                sys.exit(f"server exited during startup, see {args.server_log}")
+            await asyncio.sleep(0.1)
+    server.terminate()
+    sys.exit("server did not become ready")
+
+
+async def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--url", help="target a running server instead of starting one")
+    parser.add_argument("--scenarios", default=",".join(SCENARIOS))
+    parser.add_argument("--duration", type=float, default=10, help="seconds per scenario")
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--workers", type=int, default=1)
+    parser.add_argument("--server", choices=["uvicorn", "gunicorn"], default="uvicorn")
+    parser.add_argument("--db-connection-budget", type=int, default=0)
+    parser.add_argument("--categories", type=int, default=50, help="categories seeded into the stand-in database")
+    parser.add_argument("--server-log", default="/tmp/ecommfastapi-load-server.log", help="output of the started server")
+    parser.add_argument("--json", help="also write the results to this file")
+    args = parser.parse_args()
+    scenarios = [name.strip() for name in args.scenarios.split(",") if name.strip()]
+    unknown = set(scenarios) - set(SCENARIOS)
+    if unknown:
+        sys.exit(f"unknown scenarios: {', '.join(sorted(unknown))}")
+
+    server = None
+    url = args.url
+    if url is None:
+        server, url = await start_server(args)
+    run_id = uuid.uuid4().hex[:8]
+    limits = httpx.Limits(max_connections=args.concurrency, max_keepalive_connections=args.concurrency)
+    summaries = []
+    try:
+        async with httpx.AsyncClient(base_url=url, limits=limits, timeout=30) as client:
+            sessions = await seed_sessions(client, args.concurrency, run_id)
+            print(f"target={url} workers={args.workers if server else '?'} concurrency={args.concurrency} duration={args.duration:g}s")
+            print(f"{'scenario':<11}{'requests':>9}{'errors':>8}{'rps':>9}{'p50 ms':>9}{'p90 ms':>9}{'p99 ms':>9}{'max ms':>9}")
+            for name in scenarios:
+                summary = (await run_scenario(client, name, sessions, args.concurrency, args.duration, run_id)).summary()
+                summaries.append(summary)
+                print(f"{name:<11}{summary['requests']:>9}{summary['errors']:>8}{summary['rps']:>9.1f}"
+                      f"{summary['p50_ms']:>9.2f}{summary['p90_ms']:>9.2f}{summary['p99_ms']:>9.2f}{summary['max_ms']:>9.2f}")
+                if summary["errors"]:
+                    print(f"{'':<11}statuses: {summary['statuses']}")
+    finally:
+        if server is not None:
+            server.terminate()
+            server.wait(timeout=60)
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump({"target": url, "workers": args.workers, "concurrency": args.concurrency, "duration": args.duration, "results": summaries}, f, indent=2)
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,60 @@
+"""Event-loop latency while concurrent logins verify passwords.
+
+Compares calling passlib inline (the old behaviour) with the bounded executor
+in app.account.utils. A ticker task measures how late the loop wakes it up.
+
+    python benchmarks/password_hashing.py --logins 32
+"""
+import argparse
+import asyncio
+import os
+import statistics
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault("DATABASE_URL", "sqlite+aiosqlite:////tmp/ecommfastapi-bench.db")
+os.environ.setdefault("JWT_SECRET_KEY", "benchmark")
+os.environ.setdefault("JWT_ALGORITHM", "HS256")
+os.environ.setdefault("PASSWORD_HASH_MAX_QUEUE", "100000")
+
+from app.account import utils  # noqa: E402
+
+
+async def _measure_loop_lag(stop: asyncio.Event, interval: float = 0.005) -> list[float]:
+    lags = []
+    while not stop.is_set():
+        started = time.perf_counter()
+        await asyncio.sleep(interval)
+        lags.append((time.perf_counter() - started - interval) * 1000)
+    return lags
+
+
+async def _inline_verify(password: str, hashed: str):
+    return utils.verify_password(password, hashed)
+
+
+async def run(mode: str, logins: int, hashed: str):
+    stop = asyncio.Event()
+    ticker = asyncio.create_task(_measure_loop_lag(stop))
+    verify = _inline_verify if mode == "inline" else utils.verify_password_async
+    started = time.perf_counter()
+    await asyncio.gather(*[verify("Passw0rdX", hashed) for _ in range(logins)])
+    elapsed = time.perf_counter() - started
+    stop.set()
+    lags = sorted(await ticker) or [0.0]
+    p99 = lags[min(len(lags) - 1, int(len(lags) * 0.99))]
+    print(f"{mode:>8}: {logins} logins in {elapsed:.2f}s | loop lag p50={statistics.median(lags):.1f}ms p99={p99:.1f}ms max={lags[-1]:.1f}ms")
+
+
+async def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--logins", type=int, default=32)
+    args = parser.parse_args()
+    hashed = utils.hash_password("Passw0rdX")
+    await run("inline", args.logins, hashed)
+    await run("executor", args.logins, hashed)
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,91 @@
+"""Deep-page latency: keyset (seek) pagination vs OFFSET.
+
+Seeds a throwaway database (SQLite by default; pass --url for a MySQL schema)
+and times fetching one page at increasing depths both ways.
+
+    python benchmarks/product_pagination.py --products 200000
+"""
+import argparse
+import asyncio
+import os
+import sys
+import time
+from datetime import datetime, timedelta, timezone
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault("DATABASE_URL", "sqlite+aiosqlite:////tmp/ecommfastapi-bench.db")
+os.environ.setdefault("JWT_SECRET_KEY", "benchmark")
+os.environ.setdefault("JWT_ALGORITHM", "HS256")
+
+from sqlalchemy import insert, select  # noqa: E402
+from app.db.base import Base  # noqa: E402
+from app.db import models  # noqa: E402,F401
+from app.db.config import create_engine_from_settings  # noqa: E402
+from app.settings import get_settings  # noqa: E402
+from sqlalchemy.ext.asyncio import async_sessionmaker  # noqa: E402
+from app.product.models import Product  # noqa: E402
+from app.product.services import get_products_page, encode_product_cursor  # noqa: E402
+
+
+async def seed(engine, count: int):
+    async with engine.begin() as connection:
+        await connection.run_sync(Base.metadata.drop_all)
+        await connection.run_sync(Base.metadata.create_all)
+        start = datetime(2024, 1, 1, tzinfo=timezone.utc)
+        batch = []
+        for i in range(count):
+            created_at = start + timedelta(seconds=i)
+            batch.append({
+                "title": f"Product {i}", "price": 9.99, "stock_quantity": 10,
+                "created_at": created_at, "updated_at": created_at,
+            })
+            if len(batch) == 10_000:
+                await connection.execute(insert(Product), batch)
+                batch = []
+        if batch:
+            await connection.execute(insert(Product), batch)
+
+
+async def timed(func, repeat: int = 5) -> float:
+    best = float("inf")
+    for _ in range(repeat):
+        started = time.perf_counter()
+        await func()
+        best = min(best, time.perf_counter() - started)
+    return best * 1000
+
+
+async def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--url", default=get_settings().database_url)
+    parser.add_argument("--products", type=int, default=200_000)
+    parser.add_argument("--page-size", type=int, default=20)
+    args = parser.parse_args()
+
+    engine = create_engine_from_settings(args.url)
+    await seed(engine, args.products)
+    sessionmaker = async_sessionmaker(bind=engine, expire_on_commit=False)
+    ordering = (Product.created_at.desc(), Product.id.desc())
+
+    print(f"{'depth':>10} {'offset ms':>10} {'keyset ms':>10}")
+    for depth in (0, args.products // 100, args.products // 10, args.products // 2, args.products - args.page_size):
+        async with sessionmaker() as session:
+            anchor = None
+            if depth:
+                anchor = (await session.scalars(select(Product).order_by(*ordering).offset(depth - 1).limit(1))).first()
+            cursor = encode_product_cursor(anchor) if anchor else None
+
+            async def offset_page():
+                await session.scalars(select(Product).order_by(*ordering).offset(depth).limit(args.page_size))
+
+            async def keyset_page():
+                await get_products_page(session, args.page_size, cursor)
+
+            offset_ms = await timed(offset_page)
+            keyset_ms = await timed(keyset_page)
+        print(f"{depth:>10} {offset_ms:>10.2f} {keyset_ms:>10.2f}")
+    await engine.dispose()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,82 @@
+"""/refresh latency: the old two-SELECT flow vs the joined lookup with rotation.
+
+"before" replays the previous flow: SELECT the token row, SELECT the user,
+then insert a new token. "after" is verify_refresh_token (one joined SELECT)
+plus rotate_refresh_token (revoke + insert in one transaction). Run it against
+MySQL with --url to see round-trip costs; SQLite hides most of them.
+
+    python benchmarks/refresh_flow.py --iterations 500
+"""
+import argparse
+import asyncio
+import os
+import statistics
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault("DATABASE_URL", "sqlite+aiosqlite:////tmp/ecommfastapi-bench.db")
+os.environ.setdefault("JWT_SECRET_KEY", "benchmark")
+os.environ.setdefault("JWT_ALGORITHM", "HS256")
+
+from sqlalchemy import select  # noqa: E402
+from sqlalchemy.ext.asyncio import async_sessionmaker  # noqa: E402
+from app.db.base import Base  # noqa: E402
+from app.db import models  # noqa: E402,F401
+from app.db.config import create_engine_from_settings  # noqa: E402
+from app.settings import get_settings  # noqa: E402
+from app.db.query_counter import count_queries  # noqa: E402
+from app.account.models import User, RefreshToken  # noqa: E402
+from app.account.utils import create_tokens, hash_refresh_token, verify_refresh_token, rotate_refresh_token  # noqa: E402
+
+
+async def legacy_refresh(session, token: str):
+    db_refresh_token = (await session.scalars(select(RefreshToken).where(RefreshToken.token_hash == hash_refresh_token(token)))).first()
+    user = (await session.scalars(select(User).where(User.id == db_refresh_token.user_id))).first()
+    return await create_tokens(session, user)
+
+
+async def new_refresh(session, token: str):
+    user = await verify_refresh_token(session, token)
+    return await rotate_refresh_token(session, token, user)
+
+
+async def run(name, flow, engine, sessionmaker, user_id: int, iterations: int):
+    async with sessionmaker() as session:
+        token = (await create_tokens(session, await session.get(User, user_id)))["refresh_token"]
+    timings = []
+    with count_queries(engine) as counter:
+        for _ in range(iterations):
+            async with sessionmaker() as session:
+                started = time.perf_counter()
+                token = (await flow(session, token))["refresh_token"]
+                timings.append((time.perf_counter() - started) * 1000)
+    timings.sort()
+    p99 = timings[min(len(timings) - 1, int(len(timings) * 0.99))]
+    print(f"{name:>6}: p50={statistics.median(timings):.2f}ms p99={p99:.2f}ms statements/refresh={counter.count / iterations:.1f}")
+
+
+async def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--url", default=get_settings().database_url)
+    parser.add_argument("--iterations", type=int, default=500)
+    args = parser.parse_args()
+
+    engine = create_engine_from_settings(args.url)
+    async with engine.begin() as connection:
+        await connection.run_sync(Base.metadata.drop_all)
+        await connection.run_sync(Base.metadata.create_all)
+    sessionmaker = async_sessionmaker(bind=engine, expire_on_commit=False)
+    async with sessionmaker() as session:
+        user = User(email="bench@example.com", hashed_password="x")
+        session.add(user)
+        await session.commit()
+        user_id = user.id
+
+    await run("before", legacy_refresh, engine, sessionmaker, user_id, args.iterations)
+    await run("after", new_refresh, engine, sessionmaker, user_id, args.iterations)
+    await engine.dispose()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
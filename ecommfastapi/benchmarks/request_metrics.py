@@ -0,0 +1,149 @@
+"""Overhead of RequestMetricsMiddleware and the engine hooks.
+
+Reports absolute costs first, measured against stubs so they don't drown in noise:
+the middleware around an ASGI app that does nothing, and the hooks around a single
+query. It then compares whole FastAPI requests, driven in-process with no HTTP
+server or client, which makes the percentage a worst case.
+
+    python benchmarks/request_metrics.py
+"""
+import argparse
+import asyncio
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault("DATABASE_URL", "sqlite+aiosqlite:////tmp/ecommfastapi-bench.db")
+os.environ.setdefault("JWT_SECRET_KEY", "benchmark")
+os.environ.setdefault("JWT_ALGORITHM", "HS256")
+
+from fastapi import FastAPI  # noqa: E402
+from fastapi.routing import APIRoute  # noqa: E402
+from sqlalchemy import text  # noqa: E402
+from sqlalchemy.ext.asyncio import async_sessionmaker  # noqa: E402
+from app.db.config import create_engine_from_settings  # noqa: E402
+from app.settings import get_settings  # noqa: E402
+from app.instrumentation import RequestMetricsMiddleware, RequestMetrics, RequestStats, instrument_engine, _current_request  # noqa: E402
+
+
+def build_app(url: str, instrumented: bool):
+    engine = create_engine_from_settings(url)
+    sessionmaker = async_sessionmaker(bind=engine, expire_on_commit=False)
+    app = FastAPI()
+
+    @app.get("/ping")
+    async def ping():
+        return {"ok": True}
+
+    @app.get("/items/{item_id}")
+    async def item(item_id: int):
+        async with sessionmaker() as session:
+            return {"id": item_id, "value": (await session.execute(text("SELECT :id"), {"id": item_id})).scalar_one()}
+
+    if instrumented:
+        app.add_middleware(RequestMetricsMiddleware, metrics=RequestMetrics(), server_timing=True)
+        instrument_engine(engine)
+    return app, engine
+
+
+async def call(app, path: str):
+    scope = {
+        "type": "http", "asgi": {"version": "3.0"}, "http_version": "1.1", "method": "GET", "scheme": "http",
+        "path": path, "raw_path": path.encode(), "query_string": b"", "root_path": "", "headers": [],
+        "client": ("127.0.0.1", 50000), "server": ("bench", 80),
+    }
+
+    async def receive():
+        return {"type": "http.request", "body": b"", "more_body": False}
+
+    async def send(message):
+        pass
+
+    await app(scope, receive, send)
+
+
+async def time_requests(app, path: str, count: int) -> float:
+    started = time.perf_counter()
+    for _ in range(count):
+        await call(app, path)
+    return (time.perf_counter() - started) / count
+
+
+async def best_of(rounds: int, *runs) -> list[float]:
+    # Alternate rounds and keep the best of each, so machine noise hits both sides equally.
+    best = [float("inf")] * len(runs)
+    for _ in range(rounds):
+        for i, run in enumerate(runs):
+            best[i] = min(best[i], await run())
+    return best
+
+
+async def middleware_cost(rounds: int, count: int):
+    route = APIRoute("/items/{item_id}", lambda: None)
+    start = {"type": "http.response.start", "status": 200, "headers": [(b"content-type", b"application/json")]}
+    body = {"type": "http.response.body", "body": b"{}"}
+
+    async def stub(scope, receive, send):
+        scope["route"] = route
+        scope["path_params"] = {"item_id": "7"}
+        await send(start)
+        await send(body)
+
+    for server_timing in (False, True):
+        wrapped = RequestMetricsMiddleware(stub, metrics=RequestMetrics(), server_timing=server_timing)
+        bare, instrumented = await best_of(
+            rounds,
+            lambda: time_requests(stub, "/app/items/7", count),
+            lambda: time_requests(wrapped, "/app/items/7", count),
+        )
+        print(f"middleware, server_timing={server_timing!s:<5}: {(instrumented - bare) * 1e6:5.1f}us per request")
+
+
+async def hook_cost(url: str, rounds: int, count: int):
+    plain = create_engine_from_settings(url)
+    hooked = create_engine_from_settings(url)
+    instrument_engine(hooked)
+    token = _current_request.set(RequestStats())
+
+    async def run(engine):
+        async with engine.connect() as connection:
+            started = time.perf_counter()
+            for i in range(count):
+                await connection.execute(text("SELECT :i"), {"i": i})
+            return (time.perf_counter() - started) / count
+
+    base, with_hooks = await best_of(rounds, lambda: run(plain), lambda: run(hooked))
+    _current_request.reset(token)
+    print(f"engine hooks: {(with_hooks - base) * 1e6:5.1f}us per query ({base * 1e6:.0f}us per query without)")
+    await plain.dispose()
+    await hooked.dispose()
+
+
+async def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--url", default=get_settings().database_url)
+    parser.add_argument("--requests", type=int, default=1000)
+    parser.add_argument("--rounds", type=int, default=8)
+    args = parser.parse_args()
+
+    await middleware_cost(args.rounds, args.requests * 10)
+    await hook_cost(args.url, args.rounds, args.requests)
+
+    plain, plain_engine = build_app(args.url, instrumented=False)
+    instrumented, instrumented_engine = build_app(args.url, instrumented=True)
+    for path in ("/ping", "/items/7"):
+        await time_requests(plain, path, 100)
+        await time_requests(instrumented, path, 100)
+        base, with_metrics = await best_of(
+            args.rounds,
+            lambda: time_requests(plain, path, args.requests),
+            lambda: time_requests(instrumented, path, args.requests),
+        )
+        print(f"{path:<10} plain={base * 1e6:7.1f}us instrumented={with_metrics * 1e6:7.1f}us overhead={(with_metrics / base - 1) * 100:+.1f}%")
+    await plain_engine.dispose()
+    await instrumented_engine.dispose()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
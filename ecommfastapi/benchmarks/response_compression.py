@@ -0,0 +1,125 @@
+"""Response compression: ratio and cost per encoding, and what the thread pool buys the event loop.
+
+Builds the category list body (--categories items) and a product page with
+categories (--products items), then for each available encoding reports the
+compressed size and the time to compress. Then serves the category list through
+CompressionMiddleware, --concurrency requests at a time, compressing inline and
+on the pool, and reports request throughput, the worst event loop stall seen by a
+1ms ticker, and the same with the compressed body cache doing the work.
+
+    python benchmarks/response_compression.py --categories 5000
+"""
+import argparse
+import asyncio
+import os
+import sys
+import time
+import timeit
+from datetime import datetime, timedelta, timezone
+from types import SimpleNamespace
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app import compression  # noqa: E402
+from app.compression import _COMPRESSORS, CompressedBodyCache, CompressionMetrics, CompressionMiddleware, _available_encodings  # noqa: E402
+from app.product.schemas import CategoryListItem, ProductPage, ProductWithCategoriesOut  # noqa: E402
+from app.responses import dumps  # noqa: E402
+
+
+def category_list(count: int) -> bytes:
+    items = [CategoryListItem(id=i, name=f"Category {i}", product_count=i * 7 % 1000) for i in range(1, count + 1)]
+    return dumps({"success": True, "status_code": 200, "message": "Successfully get all category", "data": items})
+
+
+def product_page(count: int) -> bytes:
+    created = datetime(2025, 1, 1, tzinfo=timezone.utc)
+    items = [
+        ProductWithCategoriesOut.model_validate(SimpleNamespace(
+            id=i, title=f"Product {i}", slug=f"product-{i}", description="A sturdy everyday item. " * 4,
+            price=9.99 + i, stock_quantity=i % 50, image_url=f"https://cdn.example.com/products/{i}.jpg",
+            created_at=created + timedelta(minutes=i), updated_at=created + timedelta(days=1, minutes=i),
+            categories=[SimpleNamespace(id=c, name=f"Category {c}") for c in (i % 7 + 1, i % 11 + 8)],
+        ))
+        for i in range(1, count + 1)
+    ]
+    return dumps({"success": True, "status_code": 200, "message": "Successfully get products", "data": ProductPage(items=items, next_cursor="abc")})
+
+
+def compare_encodings(name: str, body: bytes, number: int):
+    print(f"{name}: {len(body)} bytes")
+    for encoding in _available_encodings():
+        compress = _COMPRESSORS[encoding]
+        seconds = min(timeit.repeat(lambda: compress(body), number=number, repeat=3)) / number
+        size = len(compress(body))
+        print(f"  {encoding:>5}: {size:8d} bytes ({size / len(body):6.1%})  {seconds * 1000:7.2f}ms  {len(body) / seconds / 1e6:7.1f} MB/s")
+
+
+def body_app(body: bytes, etag: bool):
+    headers = [(b"content-type", b"application/json"), (b"content-length", str(len(body)).encode())]
+    if etag:
+        headers.append((b"etag", b'"category-list-v1"'))
+
+    async def app(scope, receive, send):
+        await send({"type": "http.response.start", "status": 200, "headers": headers})
+        await send({"type": "http.response.body", "body": body})
+    return app
+
+
+async def serve(middleware: CompressionMiddleware, encoding: str, requests: int, concurrency: int) -> tuple[float, float]:
+    scope = {"type": "http", "method": "GET", "path": "/app/product/categories", "query_string": b""}
+    stalls = []
+    done = False
+
+    async def ticker():
+        while not done:
+            started = time.perf_counter()
+            await asyncio.sleep(0.001)
+            stalls.append(time.perf_counter() - started - 0.001)
+
+    async def client(count: int):
+        async def receive():
+            return {"type": "http.request", "body": b""}
+
+        async def send(message):
+            # A socket write yields to the loop; without this, inline clients would never interleave.
+            await asyncio.sleep(0)
+
+        for _ in range(count):
+            await middleware({**scope, "headers": [(b"accept-encoding", encoding.encode())]}, receive, send)
+
+    ticking = asyncio.create_task(ticker())
+    started = time.perf_counter()
+    await asyncio.gather(*(client(requests // concurrency) for _ in range(concurrency)))
+    elapsed = time.perf_counter() - started
+    done = True
+    await ticking
+    return requests / elapsed, max(stalls, default=0.0) * 1000
+
+
+async def compare_serving(body: bytes, args):
+    for encoding in _available_encodings():
+        for label, thread_min_size, etag in (("inline", sys.maxsize, False), ("thread pool", 0, False), ("cached", sys.maxsize, True)):
+            compression.COMPRESSION_THREAD_MIN_SIZE = thread_min_size
+            middleware = CompressionMiddleware(body_app(body, etag), metrics=CompressionMetrics(), cache=CompressedBodyCache(16 * 1024 * 1024))
+            throughput, worst_stall = await serve(middleware, encoding, args.requests, args.concurrency)
+            print(f"  {encoding:>5} {label:<12} {throughput:8.0f} req/s  worst loop stall {worst_stall:6.2f}ms")
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--categories", type=int, default=5000)
+    parser.add_argument("--products", type=int, default=100)
+    parser.add_argument("--number", type=int, default=20)
+    parser.add_argument("--requests", type=int, default=400)
+    parser.add_argument("--concurrency", type=int, default=8)
+    args = parser.parse_args()
+
+    categories = category_list(args.categories)
+    compare_encodings(f"category list, {args.categories} categories", categories, args.number)
+    compare_encodings(f"product page, {args.products} products with categories", product_page(args.products), args.number)
+    print(f"serving the category list, {args.requests} requests, {args.concurrency} at a time, {compression.COMPRESSION_WORKERS} pool threads")
+    asyncio.run(compare_serving(categories, args))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,127 @@
+"""Cold start: import time of app.main and time to the first response, each in a fresh interpreter.
+
+Time to first response covers import, the lifespan startup (engine, password
+context, JWT backend, background workers) and one GET / through the ASGI app.
+Budgets turn it into a regression check: the script exits 1 when the median
+of either number is over budget, or when a module that should load lazily is
+imported by `import app.main`.
+
+    python benchmarks/startup.py --runs 5 --import-budget-ms 1500 --first-response-budget-ms 2500
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Loaded on first use (password hashing, JWT signing, the MySQL driver, SMTP), never at import.
+DEFERRED_MODULES = ["passlib", "jose", "jwt", "cryptography", "argon2", "bcrypt", "aiomysql", "pymysql", "smtplib", "redis"]
+
+CHILD = """
+import asyncio, json, sys, time
+started = time.perf_counter()
+import app.main
+imported = time.perf_counter()
+loaded = sorted(m for m in DEFERRED if m in sys.modules)
+
+async def lifespan(app, messages):
+    queue = asyncio.Queue()
+    await queue.put({"type": "lifespan.startup"})
+    done = asyncio.Event()
+    async def receive():
+        return await queue.get()
+    async def send(message):
+        messages.append(message["type"])
+        done.set()
+    task = asyncio.create_task(app({"type": "lifespan", "asgi": {"version": "3.0"}, "state": {}}, receive, send))
+    await done.wait()
+    return queue, task
+
+async def get(app, path):
+    sent = []
+    async def receive():
+        return {"type": "http.request", "body": b"", "more_body": False}
+    async def send(message):
+        sent.append(message)
+    scope = {"type": "http", "asgi": {"version": "3.0"}, "http_version": "1.1", "method": "GET", "scheme": "http",
+             "path": path, "raw_path": path.encode(), "query_string": b"", "root_path": "", "headers": [],
+             "client": ("127.0.0.1", 1), "server": ("127.0.0.1", 80), "state": {}}
+    await app(scope, receive, send)
+    return sent[0]["status"]
+
+async def main():
+    messages = []
+    queue, task = await lifespan(app.main.app, messages)
+    ready = time.perf_counter()
+    status = await get(app.main.app, "/")
+    first_response = time.perf_counter()
+    await queue.put({"type": "lifespan.shutdown"})
+    await task
+    print(json.dumps({
+        "import_ms": (imported - started) * 1000,
+        "startup_ms": (ready - imported) * 1000,
+        "first_response_ms": (first_response - started) * 1000,
+        "status": status,
+        "lifespan": messages[0],
+        "loaded": loaded,
+    }))
+
+asyncio.run(main())
+"""
+
+
+def run_once(env: dict) -> dict:
+    code = f"DEFERRED = {DEFERRED_MODULES!r}\n{CHILD}"
+    output = subprocess.run([sys.executable, "-c", code], cwd=ROOT, env=env, capture_output=True, text=True)
+    if output.returncode:
+        sys.exit(f"startup run failed:\n{output.stderr}")
+    return json.loads(output.stdout.strip().splitlines()[-1])
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--import-budget-ms", type=float, default=0, help="fail when the median import time exceeds this; 0 = no budget")
+    parser.add_argument("--first-response-budget-ms", type=float, default=0, help="fail when the median time to first response exceeds this; 0 = no budget")
+    args = parser.parse_args()
+
+    env = dict(os.environ)
+    env.setdefault("DATABASE_URL", "sqlite+aiosqlite:////tmp/ecommfastapi-bench.db")
+    env.setdefault("JWT_SECRET_KEY", "benchmark")
+    env.setdefault("JWT_ALGORITHM", "HS256")
+    env.setdefault("PYTHONPATH", ROOT)
+
+    run_once(env)  # warm the bytecode and OS file caches
+    runs = [run_once(env) for _ in range(args.runs)]
+    failures = []
+    for key, label, budget in (
+        ("import_ms", "import app.main", args.import_budget_ms),
+        ("startup_ms", "lifespan startup", 0),
+        ("first_response_ms", "first response", args.first_response_budget_ms),
+    ):
+        values = sorted(run[key] for run in runs)
+        median = statistics.median(values)
+        verdict = ""
+        if budget:
+            verdict = f" budget={budget:.0f}ms " + ("OK" if median <= budget else "OVER")
+            if median > budget:
+                failures.append(f"{label} median {median:.0f}ms is over the {budget:.0f}ms budget")
+        print(f"{label:<17} median={median:7.1f}ms min={values[0]:7.1f}ms max={values[-1]:7.1f}ms{verdict}")
+
+    if any(run["status"] != 200 or run["lifespan"] != "lifespan.startup.complete" for run in runs):
+        failures.append(f"unexpected startup result: {runs[0]['lifespan']}, GET / -> {runs[0]['status']}")
+    loaded = sorted({module for run in runs for module in run["loaded"]})
+    print(f"deferred modules loaded by import: {', '.join(loaded) or 'none'}")
+    if loaded:
+        failures.append(f"imported eagerly: {', '.join(loaded)}")
+
+    for failure in failures:
+        print(f"FAIL: {failure}")
+    sys.exit(1 if failures else 0)
+
+
+if __name__ == "__main__":
+    main()
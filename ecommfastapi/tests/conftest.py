@@ -0,0 +1,51 @@
+import os
+import sys
+import tempfile
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+# One SQLite file per run; set before anything reads the app's settings.
+os.environ.setdefault("DATABASE_URL", f"sqlite+aiosqlite:///{tempfile.mkdtemp(prefix='ecommfastapi-tests-')}/test.db")
+os.environ.setdefault("JWT_SECRET_KEY", "test")
+os.environ.setdefault("JWT_ALGORITHM", "HS256")
+
+import httpx  # noqa: E402
+import pytest  # noqa: E402
+from app.db.base import Base  # noqa: E402
+from app.db import models  # noqa: E402,F401
+from app.db.config import async_session, get_engine  # noqa: E402
+from app.account.cache import user_cache  # noqa: E402
+from app.account.principal import _token_versions  # noqa: E402
+from app.product.cache import category_list_cache  # noqa: E402
+
+
+@pytest.fixture
+def anyio_backend():
+    return "asyncio"
+
+
+@pytest.fixture
+async def engine():
+    """The app's engine over freshly created tables."""
+    engine = get_engine()
+    async with engine.begin() as connection:
+        await connection.run_sync(Base.metadata.drop_all)
+        await connection.run_sync(Base.metadata.create_all)
+    # Fresh tables reuse ids; forget what this process remembers about the old rows.
+    _token_versions.clear()
+    user_cache.clear()
+    category_list_cache.invalidate()
+    yield engine
+    # Each test runs on its own event loop; pooled aiosqlite connections can't follow it.
+    await engine.dispose()
+
+
+@pytest.fixture
+def sessionmaker(engine):
+    return async_session
+
+
+@pytest.fixture
+async def client(engine):
+    from app.main import app
+    async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="https://test") as client:
+        yield client
@@ -0,0 +1,56 @@
+from types import SimpleNamespace
+import pytest
+from sqlalchemy import func, select
+from app.account.dep import require_admin
+from app.product import services
+from app.product.models import Category
+
+pytestmark = pytest.mark.anyio
+
+
+@pytest.fixture
+async def admin_client(client, monkeypatch):
+    from app.main import app
+    monkeypatch.setitem(app.dependency_overrides, require_admin, lambda: SimpleNamespace(is_admin=True))
+    monkeypatch.setattr(services, "CATEGORY_BULK_MAX_ITEMS", 5)
+    monkeypatch.setattr(services, "CATEGORY_BULK_BATCH_SIZE", 2)
+    yield client
+
+
+async def category_names(client) -> list[str]:
+    response = await client.get("/app/product/categories")
+    assert response.status_code == 200, response.text
+    return sorted(item["name"] for item in response.json()["data"])
+
+
+async def test_csv_over_the_cap_reports_and_shows_saved_batches(admin_client):
+    assert await category_names(admin_client) == []
+    csv = "name\n" + "".join(f"Category {i}\n" for i in range(7))
+    response = await admin_client.post("/app/product/categories/bulk", content=csv, headers={"content-type": "text/csv"})
+    assert response.status_code == 413
+    assert "first 4 were saved" in response.json()["detail"]
+    # The cached empty list was dropped along with the error.
+    assert await category_names(admin_client) == [f"Category {i}" for i in range(4)]
+
+
+async def test_json_over_the_cap_writes_nothing(admin_client, sessionmaker):
+    response = await admin_client.post("/app/product/categories/bulk", json=[{"name": f"Category {i}"} for i in range(6)])
+    assert response.status_code == 413
+    assert "saved" not in response.json()["detail"]
+    async with sessionmaker() as session:
+        assert await session.scalar(select(func.count()).select_from(Category)) == 0
+
+
+@pytest.mark.parametrize("dialect, statuses", [
+    ("sqlite", ["created", "created", "created", "created"]),
+    # The unique index on MySQL ignores case and accents, so the second spellings are repeats.
+    ("mysql", ["created", "duplicate", "created", "duplicate"]),
+])
+async def test_repeats_follow_the_name_collation(admin_client, monkeypatch, dialect, statuses):
+    key = services._category_name_key(dialect)
+    monkeypatch.setattr(services, "_category_name_key", lambda _: key)
+    response = await admin_client.post("/app/product/categories/bulk", json=[{"name": name} for name in ["Shoes", "shoes", "Café", "Cafe"]])
+    assert response.status_code == 200, response.text
+    results = response.json()["data"]
+    assert [result["status"] for result in results] == statuses
+    assert all(result["id"] for result in results if result["status"] == "created")
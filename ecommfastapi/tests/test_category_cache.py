@@ -0,0 +1,34 @@
+import asyncio
+import pytest
+from app.product.cache import category_list_cache
+from app.product.routers import category as category_router
+from app.product.schemas import CategoryCreate
+from app.product.services import create_category, get_all_category
+
+pytestmark = pytest.mark.anyio
+
+
+async def test_list_read_before_a_write_is_not_cached(client, sessionmaker, monkeypatch):
+    category_list_cache.invalidate()
+    rows_read = asyncio.Event()
+    write_done = asyncio.Event()
+
+    async def slow_read(session):
+        categories = await get_all_category(session)
+        rows_read.set()
+        await write_done.wait()
+        return categories
+
+    monkeypatch.setattr(category_router, "get_all_category", slow_read)
+    reader = asyncio.create_task(client.get("/app/product/categories"))
+    await rows_read.wait()
+    async with sessionmaker() as session:
+        await create_category(session, CategoryCreate(name="Added meanwhile"))
+    write_done.set()
+    stale = await reader
+    assert stale.json()["data"] == []
+
+    monkeypatch.setattr(category_router, "get_all_category", get_all_category)
+    fresh = await client.get("/app/product/categories")
+    assert [item["name"] for item in fresh.json()["data"]] == ["Added meanwhile"]
+    assert fresh.headers["etag"] != stale.headers["etag"]
@@ -0,0 +1,112 @@
+import asyncio
+import random
+from datetime import timedelta
+import pytest
+from fastapi import HTTPException
+from sqlalchemy import func, select
+from sqlalchemy.ext.asyncio import async_sessionmaker
+from app.account.models import User
+from app.db.config import create_engine_from_settings
+from app.product.inventory import ACTIVE, CONFIRMED, HotStockCounter, confirm_reservation, reserve_stock
+from app.product.models import Product, StockReservation
+
+pytestmark = pytest.mark.anyio
+
+STOCK = 500
+RESERVATIONS = 2000
+TTL = timedelta(minutes=10)
+
+
+@pytest.fixture
+async def shop(engine):
+    # Enough connections that reservations really overlap; SQLite makes writers wait their turn.
+    stock_engine = create_engine_from_settings(str(engine.url), pool_size=20, max_overflow=0, pool_timeout=300, connect_args={"timeout": 60})
+    sessionmaker = async_sessionmaker(bind=stock_engine, expire_on_commit=False)
+    async with sessionmaker() as session:
+        user = User(email="flash-sale@example.com", hashed_password="-")
+        product = Product(title="Flash sale item", price=9.99, stock_quantity=STOCK)
+        session.add_all([user, product])
+        await session.commit()
+    yield sessionmaker, product.id, user.id
+    await stock_engine.dispose()
+
+
+async def reserve_all(sessionmaker, product_id: int, user_id: int, counters: list[HotStockCounter]) -> tuple[int, int]:
+    """Fires every reservation at once and confirms each one that succeeds; returns (confirmed units, sold out)."""
+    quantities = [random.Random(index).randint(1, 3) for index in range(RESERVATIONS)]
+    confirmed_units = sold_out = 0
+    lowest_stock = STOCK
+    done = False
+
+    async def watch_stock():
+        nonlocal lowest_stock
+        async with sessionmaker() as session:
+            while not done:
+                stock = await session.scalar(select(Product.stock_quantity).where(Product.id == product_id).execution_options(populate_existing=True))
+                lowest_stock = min(lowest_stock, stock)
+                await session.rollback()
+                await asyncio.sleep(0.005)
+
+    async def one(index: int, quantity: int):
+        nonlocal confirmed_units, sold_out
+        async with sessionmaker() as session:
+            try:
+                reservation = None
+                if counters:
+                    reservation = await counters[index % len(counters)].reserve(session, product_id, user_id, quantity, TTL)
+                if reservation is None:
+                    reservation = await reserve_stock(session, product_id, user_id, quantity, TTL)
+                await confirm_reservation(session, reservation.id, user_id)
+            except HTTPException as e:
+                assert e.status_code == 409, e.detail
+                sold_out += 1
+                return
+        confirmed_units += quantity
+
+    watcher = asyncio.create_task(watch_stock())
+    await asyncio.gather(*(one(index, quantity) for index, quantity in enumerate(quantities)))
+    for counter in counters:
+        await counter.flush(force=True)
+    done = True
+    await watcher
+    assert lowest_stock >= 0
+    return confirmed_units, sold_out
+
+
+async def check_books(sessionmaker, product_id: int, confirmed_units: int, sold_out: int):
+    async with sessionmaker() as session:
+        stock = await session.scalar(select(Product.stock_quantity).where(Product.id == product_id))
+        confirmed_rows = await session.scalar(
+            select(func.coalesce(func.sum(StockReservation.quantity), 0))
+            .where(StockReservation.product_id == product_id, StockReservation.status == CONFIRMED, StockReservation.user_id.is_not(None))
+        )
+        leased = await session.scalar(
+            select(func.coalesce(func.sum(StockReservation.quantity), 0))
+            .where(StockReservation.product_id == product_id, StockReservation.status == ACTIVE, StockReservation.user_id.is_(None))
+        )
+    # Demand is about four times the stock, so it must have sold out.
+    assert sold_out > 0
+    assert confirmed_rows == confirmed_units
+    assert confirmed_units <= STOCK
+    assert stock >= 0
+    # Every unit is either sold or back on the product row once the leases are returned.
+    assert leased == 0
+    assert stock + confirmed_units == STOCK
+
+
+async def test_conditional_update_never_oversells(shop):
+    sessionmaker, product_id, user_id = shop
+    confirmed_units, sold_out = await reserve_all(sessionmaker, product_id, user_id, [])
+    await check_books(sessionmaker, product_id, confirmed_units, sold_out)
+
+
+async def test_hot_stock_leases_never_oversell(shop):
+    sessionmaker, product_id, user_id = shop
+    # One counter per simulated worker, each leasing stock off the same product row.
+    counters = [
+        HotStockCounter(sessionmaker, [product_id], shards=4, lease_size=25, lease_seconds=300, idle_seconds=60)
+        for _ in range(4)
+    ]
+    confirmed_units, sold_out = await reserve_all(sessionmaker, product_id, user_id, counters)
+    assert sum(counter.reservations for counter in counters) > 0
+    await check_books(sessionmaker, product_id, confirmed_units, sold_out)
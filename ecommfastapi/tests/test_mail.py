@@ -0,0 +1,13 @@
+import logging
+import pytest
+from app.mail.senders import ConsoleSender, build_message
+
+pytestmark = pytest.mark.anyio
+
+
+async def test_console_sender_shows_the_link_without_logging_setup(capsys):
+    # As under `fastapi dev`: nothing configures logging, so the root logger stays at WARNING.
+    assert logging.getLogger().getEffectiveLevel() > logging.INFO
+    await ConsoleSender().send(build_message("user@example.com", "Verify your email", "https://example.com/verify?token=abc"))
+    out = capsys.readouterr().out
+    assert "user@example.com" in out and "https://example.com/verify?token=abc" in out
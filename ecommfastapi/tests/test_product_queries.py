@@ -0,0 +1,33 @@
+import pytest
+from sqlalchemy import inspect
+from app.db.query_counter import assert_max_queries
+from app.product.models import Category, Product
+from app.product.schemas import ProductWithCategoriesOut
+from app.product.services import get_products_page
+
+pytestmark = pytest.mark.anyio
+
+PAGE_SIZE = 20
+
+
+@pytest.fixture
+async def catalog(sessionmaker):
+    async with sessionmaker() as session:
+        categories = [Category(name=f"Category {n}") for n in range(5)]
+        session.add_all(Product(title=f"Product {n}", price=1.0, categories=[categories[n % 5], categories[(n + 1) % 5]]) for n in range(100))
+        await session.commit()
+        return categories[0].id
+
+
+# selectin: the page, then one IN query for every product's categories. joined: one query.
+@pytest.mark.parametrize("loading, queries", [("selectin", 2), ("joined", 1)])
+@pytest.mark.parametrize("filtered", [False, True])
+async def test_product_page_loads_categories_without_n_plus_one(engine, sessionmaker, catalog, loading, queries, filtered):
+    async with sessionmaker() as session:
+        with assert_max_queries(engine, queries):
+            products, next_cursor = await get_products_page(session, PAGE_SIZE, category_id=catalog if filtered else None, loading=loading)
+            # Serializing touches every product's categories; a lazy load here would be one query per product.
+            items = [ProductWithCategoriesOut.model_validate(product) for product in products]
+    assert len(items) == PAGE_SIZE and next_cursor
+    assert all("categories" not in inspect(product).unloaded for product in products)
+    assert all(len(item.categories) == 2 for item in items)
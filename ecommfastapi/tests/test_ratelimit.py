@@ -0,0 +1,66 @@
+import pytest
+from app import ratelimit
+from app.ratelimit import Limit, MemoryBucketStore
+
+pytestmark = pytest.mark.anyio
+
+
+def test_parse():
+    assert Limit.parse("5/minute") == Limit(5, 5 / 60)
+    assert Limit.parse("10 / hour") == Limit(10, 10 / 3600)
+
+
+@pytest.mark.parametrize("value", ["0/minute", "-1/second", "five/minute", "5/fortnight", "5"])
+def test_parse_rejects_invalid_limits(value):
+    with pytest.raises(ValueError):
+        Limit.parse(value)
+
+
+async def test_bucket_allows_a_burst_then_throttles():
+    store = MemoryBucketStore(max_keys=10)
+    limit = Limit.parse("3/minute")
+    assert [await store.take("ip:1", limit) for _ in range(3)] == [0, 0, 0]
+    assert 0 < await store.take("ip:1", limit) <= 20
+    assert await store.take("ip:2", limit) == 0
+
+
+@pytest.fixture
+def buckets(monkeypatch):
+    store = MemoryBucketStore(max_keys=100)
+    monkeypatch.setattr(ratelimit, "bucket_store", store)
+    return store
+
+
+def login_body(padding: int = 0) -> bytes:
+    return b'{"email": "victim@example.com",' + b" " * padding + b'"password": "guess"}'
+
+
+@pytest.mark.parametrize("padding", [0, 20_000])
+async def test_padded_body_does_not_skip_the_email_limit(client, buckets, padding):
+    codes = [
+        (await client.post("/app/account/login", content=login_body(padding), headers={"content-type": "application/json"})).status_code
+        for _ in range(6)
+    ]
+    # The per-email limit is 5/minute; a body over the cap never reaches the login.
+    assert codes == ([400] * 5 + [429] if not padding else [413] * 6)
+
+
+async def test_chunked_body_is_capped_while_streaming(client, buckets):
+    streamed = 0
+
+    async def chunks():
+        nonlocal streamed
+        for _ in range(100):
+            streamed += 1
+            yield b" " * 1024
+
+    response = await client.post("/app/account/login", content=chunks(), headers={"content-type": "application/json"})
+    assert response.status_code == 413
+    # Stopped shortly after the 16 KiB cap rather than reading all 100 KiB.
+    assert streamed < 20
+
+
+@pytest.mark.parametrize("body", [b"not json", b"[]", b'{"password": "guess"}'])
+async def test_body_without_an_email_is_rejected(client, buckets, body):
+    response = await client.post("/app/account/login", content=body, headers={"content-type": "application/json"})
+    assert response.status_code == 422
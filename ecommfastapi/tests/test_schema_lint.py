@@ -0,0 +1,14 @@
+import pytest
+from app.db.schema_lint import database_indexes, lint, metadata_indexes
+
+pytestmark = pytest.mark.anyio
+
+
+def test_models_back_every_lookup_with_an_index():
+    findings = lint(metadata_indexes())
+    assert not findings, "\n".join(map(str, findings))
+
+
+async def test_created_schema_matches_the_models(engine):
+    findings = lint(await database_indexes(str(engine.url)))
+    assert not findings, "\n".join(map(str, findings))
@@ -0,0 +1,50 @@
+from app.product import search
+from app.product.search import InvertedIndex
+
+
+def test_idf_counts_live_products_only(monkeypatch):
+    index = InvertedIndex()
+    for product_id in range(1, 101):
+        index.add(product_id, f"Product {product_id}", "red wool scarf" if product_id % 10 == 0 else "blue cotton shirt")
+    for product_id in range(1, 51):
+        # Each update tombstones the old slot until compact().
+        index.add(product_id, f"Product {product_id}", "green linen shirt")
+    assert len(index) == 100 and index.dead == 50
+
+    seen = []
+    score = index._score
+    monkeypatch.setattr(index, "_score", lambda terms, scores, documents: seen.append(documents) or score(terms, scores, documents))
+    results = index.search("wool scarf", 20)
+    assert seen and set(seen) == {100}
+    assert sorted(results) == [60, 70, 80, 90, 100]
+
+
+def test_updated_text_is_searchable_and_old_text_is_not():
+    index = InvertedIndex()
+    index.add(1, "Wool scarf", None)
+    index.add(2, "Cotton shirt", None)
+    index.add(1, "Linen scarf", None)
+    assert index.search("wool", 10) == []
+    assert index.search("linen", 10) == [1]
+    index.compact()
+    assert index.search("scarf", 10) == [1]
+
+
+def test_common_word_scores_only_its_newest_postings(monkeypatch):
+    monkeypatch.setattr(search, "SEARCH_MAX_TERM_POSTINGS", 10)
+    index = InvertedIndex()
+    for product_id in range(1, 101):
+        index.add(product_id, f"Product {product_id}", "plain cotton shirt")
+    # Updating product 5 moves it into the newest slots.
+    index.add(5, "Product 5", "plain linen shirt")
+    assert sorted(index.search("shirt", 100)) == [5, *range(92, 101)]
+
+
+def test_prepare_leaves_no_upkeep_to_the_next_query():
+    index = InvertedIndex()
+    for product_id in range(1, 101):
+        index.add(product_id, f"Product {product_id}", "plain cotton shirt" * (product_id % 3 + 1))
+    index.prepare()
+    norms, terms = index._norms, index._sorted_terms
+    assert index.search("shi", 10)
+    assert index._norms is norms and index._sorted_terms is terms
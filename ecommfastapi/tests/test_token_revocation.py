@@ -0,0 +1,51 @@
+import pytest
+from app.account import dep
+from app.account.utils import create_email_verification_token, decode_token
+
+pytestmark = pytest.mark.anyio
+
+PASSWORD = "Passw0rdX"
+
+
+@pytest.fixture(params=["database", "user_cache", "stateless"])
+def auth_mode(request, monkeypatch):
+    monkeypatch.setattr(dep, "USER_CACHE_ENABLED", request.param == "user_cache")
+    monkeypatch.setattr(dep, "JWT_STATELESS_AUTH", request.param == "stateless")
+    return request.param
+
+
+async def login(client, email: str) -> str:
+    response = await client.post("/app/account/register", json={"email": email, "password": PASSWORD})
+    assert response.status_code == 201, response.text
+    response = await client.post("/app/account/login", json={"email": email, "password": PASSWORD})
+    assert response.status_code == 200, response.text
+    return client.cookies["access_token"]
+
+
+async def me(client, access_token: str) -> int:
+    client.cookies.clear()
+    client.cookies.set("access_token", access_token)
+    return (await client.get("/app/account/me")).status_code
+
+
+async def test_logout_all_revokes_access_tokens(client, auth_mode):
+    token = await login(client, f"logout-all-{auth_mode}@example.com")
+    assert await me(client, token) == 200
+    assert (await client.post("/app/account/logout-all")).status_code == 200
+    assert await me(client, token) == 401
+
+
+async def test_password_change_revokes_access_tokens(client, auth_mode):
+    token = await login(client, f"change-password-{auth_mode}@example.com")
+    response = await client.post("/app/account/change-password", json={"old_password": PASSWORD, "new_password": "NewPassw0rd"})
+    assert response.status_code == 200, response.text
+    assert await me(client, token) == 401
+
+
+async def test_email_verification_replaces_stale_claims(client, auth_mode):
+    token = await login(client, f"verify-{auth_mode}@example.com")
+    user_id = int(decode_token(token)["sub"])
+    response = await client.get("/app/account/verify-email", params={"token": create_email_verification_token(user_id)})
+    assert response.status_code == 200, response.text
+    # A stateless token would otherwise keep vrf=False until it expires.
+    assert await me(client, token) == 401